@@ -0,0 +1,925 @@
+"""
+Benchmark script for the bot server
+
+Measures message throughput of a running server.
+
+Usage:
+    python benchmark.py batch [--url URL] [--messages N] [--prefix P]
+        Send N chat lines through /process_messages in batches of 1 to 64
+        lines and report messages per second for each batch size, next to
+        the one-request-per-line /process_message baseline.
+
+    Commands are sent with the command_prefix from config.toml; pass
+    --prefix when the server runs with a different configuration.
+
+    python benchmark.py overload [--url URL] [--duration S] [--flooders N] [--prefix P]
+        Flood the server with expensive commands (sellall, open) from N
+        closed-loop threads while probes send cheap commands (help, bal),
+        then report accepted/shed counts and latency percentiles per class.
+        With admission control the cheap p99 should stay flat and rejected
+        requests should come back immediately.
+
+    python benchmark.py metrics [--observations N] [--threads N]
+        Measure the cost of recording one histogram observation and one
+        counter increment with the metrics recorder, single-threaded and
+        from N threads at once. Runs in-process; no server is needed.
+
+    python benchmark.py logging [--messages N]
+        Measure the logging cost per processed message: the old synchronous
+        file and console handlers with three f-string INFO lines per message,
+        against the queue-based pipeline with one lazily formatted line.
+        Runs in-process; log files go to a temporary directory.
+
+    python benchmark.py load [--rate R | --concurrency C] [--duration S] [--output FILE]
+        Drive /process_message with synthetic chat traffic: a configurable
+        mix of cast, sell, sack, bal, top, buy, open, daily and plain chatter
+        (--mix cast=30,bal=10,...) from many players (--players N). With
+        --rate messages arrive at a fixed Poisson rate (open loop); otherwise
+        --concurrency senders each wait for their previous reply (closed
+        loop). Reports throughput, error rate and p50/p95/p99 latency per
+        command and writes them as JSON with --output. Runs against --url,
+        or against a server started in this process with --in-process
+        (add --storage memory to run without a database). Traffic is
+        reproducible for a given --seed.
+
+    python benchmark.py storage [--backends postgres,sqlite,memory] [--threads N] [--operations N]
+        Replay the storage calls each command makes (bal, top, sack, inv,
+        cast, sell, buy) directly against each backend from N threads and
+        report per-command p50/p95/p99 latency. SQLite uses a temporary
+        file; Postgres uses the configured database, so point it at a
+        scratch database. Unreachable backends are skipped.
+
+    python benchmark.py inserts [--backends postgres,sqlite,memory] [--threads N] [--fish N]
+        Insert caught fish from N threads straight into each backend and
+        through the write-behind buffer (util/storage/write_behind.py),
+        and report durable inserts/s (the final flush is included).
+
+    python benchmark.py startup [--runs N]
+        Time loading the game data catalogs from the JSON files and from a
+        compiled snapshot (compile_catalog.py): in a fresh interpreter per
+        run (cold start, imports included) and in-process (catalog only).
+        The snapshot goes to a temporary file.
+
+    python benchmark.py imports [--runs N] [--output FILE]
+        Start the server in a fresh interpreter per run, eagerly and with
+        [server] lazy_loading, and report the time until it is ready and
+        the import time of each command and module file (the same report
+        the server logs at startup). --output writes it as JSON, so two
+        commits can be compared for startup regressions.
+
+    python benchmark.py compare BASELINE.json CANDIDATE.json [--threshold PCT]
+        Compare two load reports, e.g. from two commits, and exit with
+        status 1 if p99 latency or throughput regressed by more than PCT
+        percent or the error rate went up.
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from util.async_logging import SAMPLED, setup_logger, stop_logging
+from util.config import load_config
+from util.metrics import MetricsRegistry
+from util.storage import BACKENDS, create_storage
+from util.storage.write_behind import WriteBehindStorage
+
+
+BATCH_SIZES = [1, 2, 4, 8, 16, 32, 64]
+
+
+def configured_prefix():
+    """Return the command prefix in config.toml, which the server parses commands with."""
+    return load_config().get("command_prefix", "@")
+
+
+def make_messages(count, prefix, players=16):
+    """Build a list of chat lines (commands and chatter) spread over a number of players."""
+    commands = [f"{prefix}bal", f"{prefix}sack", f"{prefix}help", "hello there", f"{prefix}top"]
+    return [
+        {
+            "is_team": i % 2 == 0,
+            "playername": f"BenchPlayer{i % players}",
+            "chattext": commands[i % len(commands)],
+            "platform": "cs2",
+        }
+        for i in range(count)
+    ]
+
+
+def run_single(url, messages):
+    """Send every message in its own /process_message request. Return messages per second."""
+    session = requests.Session()
+    start = time.perf_counter()
+    for message in messages:
+        response = session.post(f"{url}/process_message", json=message, timeout=30)
+        response.raise_for_status()
+    return len(messages) / (time.perf_counter() - start)
+
+
+def run_batched(url, messages, batch_size):
+    """Send the messages through /process_messages in batches. Return messages per second."""
+    session = requests.Session()
+    start = time.perf_counter()
+    for i in range(0, len(messages), batch_size):
+        response = session.post(
+            f"{url}/process_messages",
+            json={"messages": messages[i:i + batch_size]},
+            timeout=30,
+        )
+        response.raise_for_status()
+    return len(messages) / (time.perf_counter() - start)
+
+
+def benchmark_batch(args):
+    """Compare throughput across batch sizes."""
+    messages = make_messages(args.messages, args.prefix or configured_prefix())
+
+    print(f"Sending {len(messages)} messages to {args.url}")
+    baseline = run_single(args.url, messages)
+    print(f"{'/process_message':>20}: {baseline:8.1f} msg/s")
+
+    for batch_size in BATCH_SIZES:
+        throughput = run_batched(args.url, messages, batch_size)
+        print(f"{f'batch size {batch_size}':>20}: {throughput:8.1f} msg/s ({throughput / baseline:.2f}x)")
+
+
+def percentile(values, pct):
+    """Return the pct-th percentile of a list of numbers (nearest rank)."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(pct / 100 * len(values))) - 1))
+    return values[index]
+
+
+def benchmark_overload(args):
+    """Drive the server past its admission limits and report per-class latency."""
+    stop = threading.Event()
+    lock = threading.Lock()
+    latencies = defaultdict(list)  # (class, status) -> seconds
+    prefix = args.prefix or configured_prefix()
+    expensive = [f"{prefix}sellall", f"{prefix}open"]
+    cheap = [f"{prefix}help", f"{prefix}bal"]
+
+    def record(kind, status, elapsed):
+        with lock:
+            latencies[(kind, status)].append(elapsed)
+
+    def send(session, kind, playername, chattext):
+        start = time.perf_counter()
+        try:
+            response = session.post(
+                f"{args.url}/process_message",
+                json={"is_team": False, "playername": playername, "chattext": chattext, "platform": "cs2"},
+                timeout=10,
+            )
+            status = response.status_code
+        except requests.exceptions.RequestException:
+            status = "timeout"
+        record(kind, status, time.perf_counter() - start)
+
+    def flooder(seed):
+        rng = random.Random(seed)
+        session = requests.Session()
+        while not stop.is_set():
+            send(session, "expensive", f"Flood{rng.randrange(args.players)}", rng.choice(expensive))
+
+    def probe(seed):
+        rng = random.Random(seed)
+        session = requests.Session()
+        while not stop.is_set():
+            send(session, "cheap", f"Probe{rng.randrange(args.players)}", rng.choice(cheap))
+            stop.wait(1 / args.probe_rate)
+
+    threads = [threading.Thread(target=flooder, args=(i,), daemon=True) for i in range(args.flooders)]
+    threads += [threading.Thread(target=probe, args=(-i - 1,), daemon=True) for i in range(args.probes)]
+    print(f"Overloading {args.url} for {args.duration}s with {args.flooders} flooders and {args.probes} probes")
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=15)
+
+    print(f"{'class':>10} {'status':>8} {'count':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for (kind, status), values in sorted(latencies.items(), key=lambda item: (item[0][0], str(item[0][1]))):
+        print(f"{kind:>10} {status!s:>8} {len(values):>7} "
+              f"{percentile(values, 50) * 1000:8.1f} {percentile(values, 95) * 1000:8.1f} {percentile(values, 99) * 1000:8.1f}")
+
+
+def benchmark_metrics(args):
+    """Measure the per-observation cost of the metrics recorder."""
+    registry = MetricsRegistry()
+    histogram = registry.histogram("bench_seconds", "Benchmark histogram.", ["command"])
+    counter = registry.counter("bench_total", "Benchmark counter.", ["command"])
+    labels = ["bal", "sack", "cast", "sellall"]
+
+    def observe_loop(count):
+        observe = histogram.observe
+        for i in range(count):
+            observe(0.003, labels[i & 3])
+
+    def inc_loop(count):
+        inc = counter.inc
+        for i in range(count):
+            inc(labels[i & 3])
+
+    def empty_loop(count):
+        for i in range(count):
+            labels[i & 3]
+
+    def timed(fn, count):
+        start = time.perf_counter()
+        fn(count)
+        return time.perf_counter() - start
+
+    count = args.observations
+    overhead = timed(empty_loop, count)
+    for name, fn in (("histogram.observe", observe_loop), ("counter.inc", inc_loop)):
+        elapsed = timed(fn, count) - overhead
+        print(f"{name:>20}: {elapsed / count * 1e9:8.1f} ns/op (1 thread)")
+
+        # Aggregate cost per operation with every thread recording at once
+        threads = [threading.Thread(target=fn, args=(count,)) for _ in range(args.threads)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start - overhead * args.threads
+        print(f"{name:>20}: {elapsed / (count * args.threads) * 1e9:8.1f} ns/op ({args.threads} threads)")
+
+    start = time.perf_counter()
+    text = registry.render()
+    print(f"{'render':>20}: {(time.perf_counter() - start) * 1000:8.2f} ms ({len(text.splitlines())} lines)")
+
+
+def benchmark_logging(args):
+    """Compare per-message logging overhead of synchronous and queued handlers."""
+    directory = tempfile.mkdtemp()
+    console = open(os.devnull, "w")
+
+    # Before: synchronous file and console handlers, as the server used to set up
+    sync_logger = logging.getLogger("benchmark.sync")
+    sync_logger.propagate = False
+    sync_logger.setLevel(logging.INFO)
+    for handler in (logging.FileHandler(os.path.join(directory, "sync.log")), logging.StreamHandler(console)):
+        handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+        sync_logger.addHandler(handler)
+
+    def before(i):
+        command_name, command_args = "sell", f"fish {i}"
+        sync_logger.info(f"Executing command: {command_name} with args: {command_args}")
+        sync_logger.info(f"Command execution took {0.0123:.4f}s")
+        sync_logger.info(f"Total processing time: {0.0150:.4f}s (modules: {0.0011:.4f}s)")
+
+    # After: queue-based pipeline, one lazily formatted line per message
+    queued_logger = setup_logger("benchmark.queued", os.path.join(directory, "queued.log"),
+                                 stream=console, queue_size=args.messages + 1)
+    queued_logger.propagate = False
+
+    def after(i):
+        queued_logger.info("Executing command: %s with args: %s", "sell", f"fish {i}", extra=SAMPLED)
+
+    sampled_logger = setup_logger("benchmark.sampled", os.path.join(directory, "sampled.log"),
+                                  stream=console, sample_every=10, queue_size=args.messages + 1)
+    sampled_logger.propagate = False
+
+    def sampled(i):
+        sampled_logger.info("Executing command: %s with args: %s", "sell", f"fish {i}", extra=SAMPLED)
+
+    for name, fn in (("sync, 3 lines", before), ("queued, 1 line", after), ("queued, sampled 1/10", sampled)):
+        start = time.perf_counter()
+        for i in range(args.messages):
+            fn(i)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>22}: {elapsed / args.messages * 1e6:8.2f} us/message on the caller's thread")
+
+    # Wait for the background writers before closing the console stream
+    start = time.perf_counter()
+    stop_logging()
+    print(f"{'drain':>22}: {(time.perf_counter() - start) * 1000:8.1f} ms for the queued records")
+    console.close()
+
+
+# Default traffic mix: relative weight of each kind of chat line
+DEFAULT_MIX = {
+    "cast": 30, "sell": 8, "sack": 10, "bal": 10, "top": 4,
+    "buy": 4, "open": 4, "daily": 5, "chatter": 25,
+}
+
+# Chat lines sent for each kind of traffic; {prefix} is the server's command prefix
+TRAFFIC_LINES = {
+    "cast": ["{prefix}cast"],
+    "sell": ["{prefix}sell all", "{prefix}sell"],
+    "sack": ["{prefix}sack"],
+    "bal": ["{prefix}bal"],
+    "top": ["{prefix}top"],
+    "buy": ["{prefix}buy Coffee", "{prefix}buy Marlboro Red", "{prefix}buy Busch Apple 2"],
+    "open": ["{prefix}open Bravo Case"],
+    "daily": ["{prefix}daily"],
+    "chatter": ["gg", "nice shot", "rush b", "anyone fishing?", "lol", "eco round", "wp"],
+}
+
+
+def parse_mix(text):
+    """Parse a traffic mix such as "cast=30,bal=10,chatter=20"."""
+    mix = {}
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in TRAFFIC_LINES:
+            raise argparse.ArgumentTypeError(f"unknown traffic kind '{kind}' (choose from {', '.join(TRAFFIC_LINES)})")
+        try:
+            mix[kind] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"weight for '{kind}' must be a number")
+    return mix
+
+
+class TrafficGenerator:
+    """
+    Deterministic stream of chat messages for a given traffic mix and seed.
+
+    Players are drawn from a Zipf-like distribution, so a few players chat a lot
+    and most chat rarely, as on a real server.
+    """
+
+    def __init__(self, mix, players, seed, prefix, skew=1.1):
+        self.rng = random.Random(seed)
+        self.lines = {kind: [line.format(prefix=prefix) for line in lines] for kind, lines in TRAFFIC_LINES.items()}
+        self.kinds = list(mix)
+        self.kind_weights = list(itertools.accumulate(mix[kind] for kind in self.kinds))
+        self.players = [f"LoadPlayer{i}" for i in range(players)]
+        self.player_weights = list(itertools.accumulate(1 / (rank + 1) ** skew for rank in range(players)))
+
+    def next(self):
+        """Return (kind, message) for the next chat line."""
+        kind = self.rng.choices(self.kinds, cum_weights=self.kind_weights)[0]
+        message = {
+            "is_team": self.rng.random() < 0.3,
+            "playername": self.rng.choices(self.players, cum_weights=self.player_weights)[0],
+            "chattext": self.rng.choice(self.lines[kind]),
+            "platform": "cs2",
+        }
+        return kind, message
+
+
+class HttpTarget:
+    """Send messages to a running server over HTTP."""
+
+    def __init__(self, url, prefix=None):
+        """
+        :param prefix: Command prefix the server uses, or None for the one in config.toml.
+        """
+        self.url = url
+        self.prefix = prefix or configured_prefix()
+        self.description = url
+        self._local = threading.local()
+
+    def send(self, message):
+        """Send one message and return its HTTP status code."""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session.post(f"{self.url}/process_message", json=message, timeout=30).status_code
+
+
+class InProcessTarget:
+    """Run the bot server in this process and call it through Flask's test client, without sockets."""
+
+    def __init__(self, storage=None):
+        """
+        :param storage: Storage backend name, or None for the one in config.toml.
+        """
+        import server.server as server_module
+        server_module.bot_server = server_module.BotServer(storage=create_storage(storage) if storage else None)
+        self.app = server_module.app
+        self.prefix = server_module.bot_server.prefix
+        self.description = f"in-process ({server_module.bot_server.storage.name} storage)"
+        self._local = threading.local()
+
+    def send(self, message):
+        """Send one message and return its HTTP status code."""
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        return client.post("/process_message", json=message).status_code
+
+
+def run_open_loop(target, generator, rate, duration, max_outstanding):
+    """
+    Send messages at a fixed Poisson arrival rate, regardless of how fast the server answers.
+
+    Latency is measured from each message's scheduled arrival time, so time spent
+    waiting for a free sender counts against the server (no coordinated omission).
+
+    :return: List of (kind, status, latency seconds, seconds since start).
+    """
+    results = []
+    lock = threading.Lock()
+
+    def send(kind, message, scheduled, start):
+        try:
+            status = target.send(message)
+        except Exception as e:
+            status = type(e).__name__
+        now = time.perf_counter()
+        with lock:
+            results.append((kind, status, now - scheduled, scheduled - start))
+
+    with ThreadPoolExecutor(max_workers=max_outstanding) as pool:
+        start = time.perf_counter()
+        scheduled = start
+        while scheduled - start < duration:
+            scheduled += generator.rng.expovariate(rate)
+            kind, message = generator.next()
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, kind, message, scheduled, start)
+    return results
+
+
+def run_closed_loop(target, mix, players, seed, concurrency, duration):
+    """
+    Keep `concurrency` senders busy, each sending its next message as soon as the previous one is answered.
+
+    :return: List of (kind, status, latency seconds, seconds since start).
+    """
+    results = []
+    lock = threading.Lock()
+    start = time.perf_counter()
+
+    def sender(index):
+        generator = TrafficGenerator(mix, players, seed + index, target.prefix)
+        local = []
+        while True:
+            sent = time.perf_counter()
+            if sent - start >= duration:
+                break
+            kind, message = generator.next()
+            try:
+                status = target.send(message)
+            except Exception as e:
+                status = type(e).__name__
+            local.append((kind, status, time.perf_counter() - sent, sent - start))
+        with lock:
+            results.extend(local)
+
+    threads = [threading.Thread(target=sender, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def summarize(records, seconds):
+    """Summarize (status, latency) records into throughput, error rate and latency percentiles."""
+    latencies = [latency for _, latency in records]
+    statuses = defaultdict(int)
+    for status, _ in records:
+        statuses[str(status)] += 1
+    errors = sum(count for status, count in statuses.items() if status != "200")
+    return {
+        "requests": len(records),
+        "throughput_rps": round(len(records) / seconds, 2) if seconds else 0.0,
+        "error_rate": round(errors / len(records), 4) if records else 0.0,
+        "statuses": dict(sorted(statuses.items())),
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50) * 1000, 3),
+            "p95": round(percentile(latencies, 95) * 1000, 3),
+            "p99": round(percentile(latencies, 99) * 1000, 3),
+            "max": round(max(latencies, default=0.0) * 1000, 3),
+        },
+    }
+
+
+def git_commit():
+    """Return the current commit hash, or None outside a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_summary_row(name, summary):
+    latency = summary["latency_ms"]
+    print(f"{name:>10} {summary['requests']:>8} {summary['throughput_rps']:>9.1f} {summary['error_rate'] * 100:>6.2f}% "
+          f"{latency['p50']:>8.1f} {latency['p95']:>8.1f} {latency['p99']:>8.1f}")
+
+
+def benchmark_load(args):
+    """Drive the server with synthetic chat traffic and write a machine-readable report."""
+    mix = args.mix or DEFAULT_MIX
+    target = InProcessTarget(args.storage) if args.in_process else HttpTarget(args.url, args.prefix)
+    total = args.duration + args.warmup
+
+    if args.rate:
+        print(f"Open loop: {args.rate} msg/s for {args.duration}s (+{args.warmup}s warmup) against {target.description}")
+        generator = TrafficGenerator(mix, args.players, args.seed, target.prefix)
+        results = run_open_loop(target, generator, args.rate, total, args.max_outstanding)
+    else:
+        print(f"Closed loop: {args.concurrency} senders for {args.duration}s (+{args.warmup}s warmup) against {target.description}")
+        results = run_closed_loop(target, mix, args.players, args.seed, args.concurrency, total)
+
+    # Drop the warmup period
+    results = [result for result in results if result[3] >= args.warmup]
+    by_kind = defaultdict(list)
+    for kind, status, latency, _ in results:
+        by_kind[kind].append((status, latency))
+
+    report = {
+        "harness_version": 1,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": git_commit(),
+        "target": target.description,
+        "config": {
+            "mode": "open" if args.rate else "closed",
+            "rate": args.rate,
+            "concurrency": None if args.rate else args.concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "players": args.players,
+            "seed": args.seed,
+            "mix": mix,
+            "prefix": target.prefix,
+        },
+        "summary": summarize([(status, latency) for _, status, latency, _ in results], args.duration),
+        "commands": {kind: summarize(records, args.duration) for kind, records in sorted(by_kind.items())},
+    }
+
+    print(f"{'kind':>10} {'requests':>8} {'req/s':>9} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for kind, summary in report["commands"].items():
+        print_summary_row(kind, summary)
+    print_summary_row("total", report["summary"])
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+def _storage_cast(storage, user):
+    """Storage calls of !cast: sack size, gear, effects, bait, autosell, then the catch."""
+    if storage.count_fish(user) >= 5:
+        storage.sell_all_fish(user)
+    storage.get_inventory(user)
+    storage.get_inventory(user)
+    storage.get_effects(user)
+    storage.get_bait(user)
+    storage.get_effects(user)
+    storage.get_autosell(user)
+    storage.add_fish(user, "Bass", 2.5, 12.5)
+
+
+def _storage_sell(storage, user):
+    """Storage calls of !sell: find, remove and pay for one fish."""
+    with storage.transaction():
+        fish = storage.find_fish(user)
+        if fish:
+            storage.remove_fish(user, fish["id"])
+            storage.add_balance(user, fish["price"])
+
+
+def _storage_buy(storage, user):
+    """Storage calls of !buy: pay and add the item in one purchase."""
+    storage.purchase(user, "Bait Bucket", 1)
+
+
+STORAGE_COMMANDS = {
+    "bal": lambda storage, user: storage.get_balance(user),
+    "top": lambda storage, user: storage.get_top_balances(5),
+    "sack": lambda storage, user: storage.get_fish(user),
+    "inv": lambda storage, user: storage.get_inventory(user),
+    "cast": _storage_cast,
+    "sell": _storage_sell,
+    "buy": _storage_buy,
+}
+
+
+def benchmark_storage(args):
+    """Compare per-command storage latency across backends."""
+    backends = [backend.strip() for backend in args.backends.split(",") if backend.strip()]
+    players = [f"storage-bench-{i}" for i in range(args.players)]
+    commands = list(STORAGE_COMMANDS)
+    print(f"{'backend':>9} {'command':>8} {'ops/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+
+    for backend in backends:
+        with tempfile.TemporaryDirectory() as tmp:
+            try:
+                kwargs = {"path": os.path.join(tmp, "bench.db")} if backend == "sqlite" else {}
+                storage = create_storage(backend, **kwargs)
+                # Seed every player so sell and buy have something to work with
+                for player in players:
+                    storage.add_balance(player, 1000)
+                    storage.add_fish(player, "Bass", 2.5, 12.5)
+            except Exception as e:
+                print(f"{backend:>9}  skipped: {e}")
+                continue
+
+            latencies = defaultdict(list)
+
+            def worker(seed):
+                rng = random.Random(seed)
+                local = defaultdict(list)
+                for _ in range(args.operations):
+                    command = commands[rng.randrange(len(commands))]
+                    start = time.perf_counter()
+                    STORAGE_COMMANDS[command](storage, players[rng.randrange(len(players))])
+                    local[command].append(time.perf_counter() - start)
+                return local
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.threads) as pool:
+                for local in pool.map(worker, range(args.threads)):
+                    for command, values in local.items():
+                        latencies[command].extend(values)
+            elapsed = time.perf_counter() - start
+
+            for command in commands:
+                values = latencies[command]
+                print(f"{backend:>9} {command:>8} {len(values) / elapsed:9.1f} "
+                      f"{percentile(values, 50) * 1000:8.3f} {percentile(values, 95) * 1000:8.3f} "
+                      f"{percentile(values, 99) * 1000:8.3f}")
+
+            for player in players:
+                storage.clear_fish(player)
+            storage.close()
+
+
+def benchmark_inserts(args):
+    """Compare fish insert throughput with and without the write-behind buffer."""
+    backends = [backend.strip() for backend in args.backends.split(",") if backend.strip()]
+    print(f"{'backend':>9} {'mode':>13} {'fish':>7} {'fish/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+
+    for backend in backends:
+        for write_behind in (False, True):
+            mode = "write-behind" if write_behind else "direct"
+            with tempfile.TemporaryDirectory() as tmp:
+                try:
+                    kwargs = {"path": os.path.join(tmp, "bench.db")} if backend == "sqlite" else {}
+                    storage = create_storage(backend, **kwargs)
+                    storage.count_fish("storage-bench-0")
+                except Exception as e:
+                    print(f"{backend:>9} {mode:>13}  skipped: {e}")
+                    break
+                if write_behind:
+                    storage = WriteBehindStorage(storage, args.flush_interval, args.flush_size)
+
+                def worker(thread):
+                    user = f"storage-bench-{thread}"
+                    latencies = []
+                    for _ in range(args.fish):
+                        start = time.perf_counter()
+                        storage.add_fish(user, "Bass", 2.5, 12.5)
+                        latencies.append(time.perf_counter() - start)
+                    return latencies
+
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=args.threads) as pool:
+                    latencies = [value for values in pool.map(worker, range(args.threads)) for value in values]
+                if write_behind:
+                    # Count the time it takes for the last fish to reach the backend
+                    storage.flush()
+                elapsed = time.perf_counter() - start
+
+                stored = sum(storage.count_fish(f"storage-bench-{thread}") for thread in range(args.threads))
+                for thread in range(args.threads):
+                    storage.clear_fish(f"storage-bench-{thread}")
+                storage.close()
+                print(f"{backend:>9} {mode:>13} {stored:7d} {len(latencies) / elapsed:10.1f} "
+                      f"{percentile(latencies, 50) * 1000:8.3f} {percentile(latencies, 99) * 1000:8.3f}")
+
+
+STARTUP_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+from modules.catalog import Catalog
+class SnapshotCatalog(Catalog):
+    def snapshot_path(self):
+        return sys.argv[1]
+SnapshotCatalog()
+print(time.perf_counter() - start)
+"""
+
+
+def benchmark_startup(args):
+    """Compare catalog load times with and without a compiled snapshot."""
+    from modules.catalog import Catalog
+
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_path = os.path.join(tmp, "catalog.snapshot")
+
+        class SnapshotCatalog(Catalog):
+            def snapshot_path(self):
+                return snapshot_path
+
+        sources = {"json": os.path.join(tmp, "missing.snapshot"), "snapshot": snapshot_path}
+        SnapshotCatalog().compile()
+        print(f"{'source':>9} {'cold p50 ms':>12} {'cold min ms':>12} {'load p50 ms':>12} {'load min ms':>12}")
+        for source, path in sources.items():
+            cold = []
+            for _ in range(args.runs):
+                output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT, path], capture_output=True,
+                                        text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+                cold.append(float(output.stdout.strip().splitlines()[-1]))
+
+            catalog = SnapshotCatalog()
+            catalog.snapshot_path = lambda: path
+            load = []
+            for _ in range(args.runs * 10):
+                start = time.perf_counter()
+                catalog.read()
+                load.append(time.perf_counter() - start)
+            print(f"{source:>9} {percentile(cold, 50) * 1000:12.2f} {min(cold) * 1000:12.2f} "
+                  f"{percentile(load, 50) * 1000:12.3f} {min(load) * 1000:12.3f}")
+
+
+IMPORTS_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import server.server as server_module
+from util.storage import create_storage
+load_config = server_module.load_config
+def config():
+    config = load_config()
+    config.setdefault("server", {}).update(lazy_loading=sys.argv[1] == "lazy", catalog_reload_interval=0)
+    return config
+server_module.load_config = config
+server = server_module.BotServer(storage=create_storage("memory"))
+ready = time.perf_counter() - start
+print(json.dumps({"ready": ready, "imports": dict(server.import_report())}))
+"""
+
+
+def benchmark_imports(args):
+    """Report server startup time and per-file import times, eager and lazy."""
+    root = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    for mode in ("eager", "lazy"):
+        runs = []
+        for _ in range(args.runs):
+            with tempfile.TemporaryDirectory() as tmp:
+                # Run in a scratch directory so the server log does not land in the repo
+                output = subprocess.run([sys.executable, "-c", f"import sys; sys.path.insert(0, {root!r})\n" + IMPORTS_SCRIPT, mode],
+                                        capture_output=True, text=True, check=True, cwd=tmp)
+            runs.append(json.loads(output.stdout.strip().splitlines()[-1]))
+        files = sorted({path for run in runs for path in run["imports"]})
+        results[mode] = {
+            "ready_ms": percentile([run["ready"] for run in runs], 50) * 1000,
+            "imports_ms": {path: percentile([run["imports"].get(path, 0) for run in runs], 50) * 1000 for path in files},
+        }
+
+    print(f"{'mode':>6} {'ready p50 ms':>13} {'files':>6} {'imports ms':>11}")
+    for mode, result in results.items():
+        print(f"{mode:>6} {result['ready_ms']:13.1f} {len(result['imports_ms']):6d} {sum(result['imports_ms'].values()):11.1f}")
+    print("\nSlowest imports (eager):")
+    for path, ms in sorted(results["eager"]["imports_ms"].items(), key=lambda entry: entry[1], reverse=True)[:args.top]:
+        print(f"  {ms:8.2f} ms  {path}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"config": {"runs": args.runs}, "results": results}, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+
+def benchmark_compare(args):
+    """Compare two load reports and exit with status 1 if the new one regressed."""
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = json.load(f)
+    if baseline["config"] != candidate["config"]:
+        print("Warning: the reports were produced with different settings.")
+
+    def change(old, new):
+        return (new - old) / old * 100 if old else 0.0
+
+    regressed = []
+    print(f"{'kind':>10} {'req/s':>16} {'p50 ms':>18} {'p99 ms':>18} {'errors':>16}")
+    rows = [("total", baseline["summary"], candidate["summary"])]
+    rows += [(kind, baseline["commands"][kind], candidate["commands"][kind])
+             for kind in candidate["commands"] if kind in baseline["commands"]]
+    for kind, old, new in rows:
+        throughput = change(old["throughput_rps"], new["throughput_rps"])
+        p50 = change(old["latency_ms"]["p50"], new["latency_ms"]["p50"])
+        p99 = change(old["latency_ms"]["p99"], new["latency_ms"]["p99"])
+        print(f"{kind:>10} {new['throughput_rps']:>8.1f} ({throughput:+5.1f}%) "
+              f"{new['latency_ms']['p50']:>8.1f} ({p50:+6.1f}%) {new['latency_ms']['p99']:>8.1f} ({p99:+6.1f}%) "
+              f"{new['error_rate'] * 100:>6.2f}% ({(new['error_rate'] - old['error_rate']) * 100:+.2f})")
+        if p99 > args.threshold or throughput < -args.threshold or new["error_rate"] > old["error_rate"] + 0.01:
+            regressed.append(kind)
+
+    if regressed:
+        print(f"Regressed beyond {args.threshold}%: {', '.join(regressed)}")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the bot server.")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    batch_parser = subparsers.add_parser("batch", help="throughput of /process_messages by batch size")
+    batch_parser.add_argument("--url", default="http://127.0.0.1:8080")
+    batch_parser.add_argument("--messages", type=int, default=256)
+    batch_parser.add_argument("--prefix", help="command prefix (default: command_prefix in config.toml)")
+    batch_parser.set_defaults(func=benchmark_batch)
+
+    overload_parser = subparsers.add_parser("overload", help="latency of cheap commands during an expensive flood")
+    overload_parser.add_argument("--url", default="http://127.0.0.1:8080")
+    overload_parser.add_argument("--duration", type=float, default=20)
+    overload_parser.add_argument("--flooders", type=int, default=64)
+    overload_parser.add_argument("--probes", type=int, default=4)
+    overload_parser.add_argument("--probe-rate", type=float, default=5, help="requests per second per probe")
+    overload_parser.add_argument("--players", type=int, default=500)
+    overload_parser.add_argument("--prefix", help="command prefix (default: command_prefix in config.toml)")
+    overload_parser.set_defaults(func=benchmark_overload)
+
+    metrics_parser = subparsers.add_parser("metrics", help="overhead of the metrics recorder (no server needed)")
+    metrics_parser.add_argument("--observations", type=int, default=1_000_000)
+    metrics_parser.add_argument("--threads", type=int, default=8)
+    metrics_parser.set_defaults(func=benchmark_metrics, offline=True)
+
+    logging_parser = subparsers.add_parser("logging", help="per-message logging overhead (no server needed)")
+    logging_parser.add_argument("--messages", type=int, default=50_000)
+    logging_parser.set_defaults(func=benchmark_logging, offline=True)
+
+    load_parser = subparsers.add_parser("load", help="synthetic traffic with per-command latency report")
+    load_parser.add_argument("--url", default="http://127.0.0.1:8080")
+    load_parser.add_argument("--in-process", action="store_true", help="start the server in this process instead of using --url")
+    load_parser.add_argument("--storage", choices=BACKENDS, help="--in-process: storage backend (default: config.toml)")
+    pacing = load_parser.add_mutually_exclusive_group()
+    pacing.add_argument("--rate", type=float, help="open loop: messages per second")
+    pacing.add_argument("--concurrency", type=int, default=16, help="closed loop: concurrent senders")
+    load_parser.add_argument("--duration", type=float, default=30)
+    load_parser.add_argument("--warmup", type=float, default=5, help="seconds excluded from the report")
+    load_parser.add_argument("--players", type=int, default=500)
+    load_parser.add_argument("--mix", type=parse_mix, help="traffic weights, e.g. cast=30,bal=10,chatter=20")
+    load_parser.add_argument("--seed", type=int, default=1)
+    load_parser.add_argument("--prefix", help="command prefix of the --url server (default: command_prefix in config.toml)")
+    load_parser.add_argument("--max-outstanding", type=int, default=256, help="open loop: maximum requests in flight")
+    load_parser.add_argument("--output", help="write the report to this JSON file")
+    load_parser.set_defaults(func=benchmark_load)
+
+    storage_parser = subparsers.add_parser("storage", help="per-command latency of each storage backend")
+    storage_parser.add_argument("--backends", default="postgres,sqlite,memory", help="comma-separated backends")
+    storage_parser.add_argument("--threads", type=int, default=8)
+    storage_parser.add_argument("--operations", type=int, default=2000, help="commands per thread")
+    storage_parser.add_argument("--players", type=int, default=200)
+    storage_parser.set_defaults(func=benchmark_storage, offline=True)
+
+    inserts_parser = subparsers.add_parser("inserts", help="fish insert throughput with and without write-behind")
+    inserts_parser.add_argument("--backends", default="postgres,sqlite,memory", help="comma-separated backends")
+    inserts_parser.add_argument("--threads", type=int, default=8)
+    inserts_parser.add_argument("--fish", type=int, default=2000, help="fish inserted per thread")
+    inserts_parser.add_argument("--flush-interval", type=float, default=0.5)
+    inserts_parser.add_argument("--flush-size", type=int, default=100)
+    inserts_parser.set_defaults(func=benchmark_inserts, offline=True)
+
+    startup_parser = subparsers.add_parser("startup", help="catalog load time from JSON and from the snapshot")
+    startup_parser.add_argument("--runs", type=int, default=20)
+    startup_parser.set_defaults(func=benchmark_startup, offline=True)
+
+    imports_parser = subparsers.add_parser("imports", help="server startup and per-file import times")
+    imports_parser.add_argument("--runs", type=int, default=5)
+    imports_parser.add_argument("--top", type=int, default=10, help="slowest files to list")
+    imports_parser.add_argument("--output", help="write the report as JSON")
+    imports_parser.set_defaults(func=benchmark_imports, offline=True)
+
+    compare_parser = subparsers.add_parser("compare", help="compare two load reports")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=10, help="allowed regression in percent")
+    compare_parser.set_defaults(func=benchmark_compare, offline=True)
+
+    args = parser.parse_args()
+    if getattr(args, "in_process", False):
+        args.offline = True
+    if getattr(args, "offline", False):
+        args.func(args)
+        return
+    try:
+        requests.get(f"{args.url}/health", timeout=2).raise_for_status()
+    except requests.exceptions.RequestException as e:
+        print(f"Cannot reach server at {args.url}: {e}")
+        print("Start it with: python launcher.py server")
+        sys.exit(1)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
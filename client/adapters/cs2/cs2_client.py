@@ -1,15 +1,16 @@
 import os
-import logging
 import sys
 import threading
 import win32gui
 import keyboard
 import requests
-from time import sleep
 from typing import Optional, Tuple
 
 from util.config import load_config
+from util.async_logging import SAMPLED, setup_logger, logging_settings
 from util.chat_utils import write_chat_to_cfg, load_chat, send_chat
+from util.chat_queue import ChatQueue
+from util.chat_scheduler import ChatScheduler, scheduler_settings
 import util.keys as keys
 
 
@@ -22,50 +23,58 @@ class CS2Client:
         self.server_url = server_url.rstrip('/')
         self.state = "Initializing..."
         
-        # Set up logging
-        self.logger = logging.getLogger(__name__)
-        self.logger.setLevel(logging.INFO)
-        
-        # File handler for logging to a file
-        file_handler = logging.FileHandler("cs2_client.log")
-        file_handler.setLevel(logging.INFO)
-        file_formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-        file_handler.setFormatter(file_formatter)
-        
-        # Stream handler for logging to the console
-        console_handler = logging.StreamHandler(stream=open(sys.stdout.fileno(), mode='w', encoding='utf-8', buffering=1))
-        console_handler.setLevel(logging.INFO)
-        console_formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-        console_handler.setFormatter(console_formatter)
-        
-        # Add both handlers to the logger
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(console_handler)
-        
         # Load configuration
         self.config = load_config()
+        
+        # Set up logging; file and console writes happen on a background thread
+        self.logger = setup_logger(
+            __name__, "cs2_client.log",
+            stream=open(sys.stdout.fileno(), mode='w', encoding='utf-8', buffering=1),
+            **logging_settings(self.config)
+        )
+        
         self.load_chat_key = self.config.get("load_chat_key", "kp_1")
         self.load_chat_key_win32 = keys.KEYS[self.load_chat_key]
         self.send_chat_key = self.config.get("send_chat_key", "kp_2")
         self.send_chat_key_win32 = keys.KEYS[self.send_chat_key]
         self.console_log_path = self.config.get("console_log_path")
         self.exec_path = self.config.get("exec_path")
+        self.max_batch_size = self.config.get("max_batch_size", 64)
+        self.batch_endpoint_available = True
         
         # Chat queue for outgoing messages
-        self.chat_queue = []
-        self.chat_queue_lock = threading.Lock()
+        self.chat_queue = ChatQueue(
+            max_size=self.config.get("chat_queue_max_size", 50),
+            drop_policy=self.config.get("chat_queue_drop_policy", "oldest"),
+        )
         self.chat_queue_thread = threading.Thread(target=self._chat_queue_worker, daemon=True)
         
         # Control flags
         self.paused = False
+        self.pause_condition = threading.Condition()
         self.running = True
         self.stop_event = threading.Event()
         
+        # Scheduler that packs queued replies and pushes them into the game
+        self.chat_scheduler = ChatScheduler(
+            self.chat_queue,
+            write_chat=lambda is_team, chattext: write_chat_to_cfg(self.exec_path, self.send_chat_key, is_team, chattext),
+            load_chat=lambda: load_chat(self.load_chat_key_win32),
+            send_chat=lambda: send_chat(self.send_chat_key_win32),
+            sleep=self._interruptible_sleep,
+            wait_until_resumed=self._wait_until_resumed,
+            logger=self.logger,
+            **scheduler_settings(self.config),
+        )
+        
     def stop(self):
         """Stop the client and clean up resources."""
         self.logger.info("Stopping CS2 client...")
         self.stop_event.set()
         self.running = False
+        self.chat_queue.close()
+        with self.pause_condition:
+            self.pause_condition.notify_all()
         keyboard.unhook_all_hotkeys()
         self.logger.info("CS2 client stopped.")
         
@@ -83,60 +92,28 @@ class CS2Client:
             win32gui.SetForegroundWindow(cs2_hwnd)
             self.logger.info("Connected to Counter-Strike 2 window.")
         
-    def add_to_chat_queue(self, is_team: bool, chattext: str) -> None:
+    def add_to_chat_queue(self, is_team: bool, chattext: str, playername: Optional[str] = None) -> None:
         """Add a message to the chat queue."""
         # Clean message
         chattext = chattext.replace(";", ";").replace("/", "/​").replace("'", "ʹ").replace("\"", "ʺ").strip()
         if not chattext:
             return
             
-        # Check if a duplicate message is already in the queue
-        with self.chat_queue_lock:
-            for queued_is_team, queued_chattext in self.chat_queue:
-                if queued_chattext == chattext and queued_is_team == is_team:
-                    self.logger.debug(f"Duplicate message found in queue: {chattext} (team: {is_team})")
-                    return
-                    
-        self.logger.debug(f"Adding message to chat queue: {chattext} (team: {is_team})")
-        self.chat_queue.append((is_team, chattext))
-        self.logger.info(f"{len(self.chat_queue)} messages in queue.")
+        if not self.chat_queue.put(is_team, chattext, playername):
+            self.logger.debug("Message not queued (duplicate or queue full): %s (team: %s)", chattext, is_team)
+            return
+            
+        self.logger.info("%d messages in queue.", len(self.chat_queue), extra=SAMPLED)
         
     def _chat_queue_worker(self) -> None:
         """Process the chat queue and send messages to CS2."""
-        while True:
-            while not self.chat_queue and not self.stop_event.is_set():
-                self._interruptible_sleep(0.1)
-                
-            if not self.chat_queue:
-                continue
-                
-            is_team, chattext = self.chat_queue.pop(0)
-            self.logger.info(f"Processing chat message: {chattext} (team: {is_team})")
-            
-            try:
-                # Write the message to the chat configuration file
-                write_chat_to_cfg(self.exec_path, self.send_chat_key, is_team, chattext)
-                self._interruptible_sleep(0.5)
-                
-                # Load the chat message into the game
-                while self.paused and not self.stop_event.is_set():
-                    self._interruptible_sleep(0.1)
-                    
-                load_chat(self.load_chat_key_win32)
-                self._interruptible_sleep(0.5)
-                
-                # Send the chat message
-                while self.paused and not self.stop_event.is_set():
-                    self._interruptible_sleep(0.1)
-                    
-                send_chat(self.send_chat_key_win32)
-                self._interruptible_sleep(0.5)
-            except Exception as e:
-                self.logger.error(f"Error processing chat message: {e}")
+        self.chat_scheduler.run(self.stop_event.is_set)
                 
     def set_paused(self, paused: bool) -> None:
         """Set the paused state of the client."""
-        self.paused = paused
+        with self.pause_condition:
+            self.paused = paused
+            self.pause_condition.notify_all()
         self.state = "Paused" if paused else "Ready"
         self.logger.info(f"CS2 client {self.state.lower()}.")
         
@@ -168,8 +145,7 @@ class CS2Client:
         
         try:
             url = f"{self.server_url}/process_message"
-            self.logger.info(f"Sending POST to: {url}")
-            self.logger.info(f"Payload: is_team={is_team}, playername={playername}, chattext={chattext}")
+            self.logger.debug("Sending POST to: %s", url)
             
             request_start = time()
             response = requests.post(
@@ -184,12 +160,12 @@ class CS2Client:
             )
             request_time = time() - request_start
             
-            self.logger.info(f"Response status: {response.status_code} (request took {request_time:.4f}s)")
+            self.logger.info("Response status: %s (request took %.4fs)", response.status_code, request_time, extra=SAMPLED)
             
             if response.status_code == 200:
                 data = response.json()
                 total_time = time() - start_time
-                self.logger.info(f"Total send_to_server time: {total_time:.4f}s")
+                self.logger.debug("Total send_to_server time: %.4fs", total_time)
                 return data.get("responses", [])
             else:
                 self.logger.error(f"Server returned status code: {response.status_code}, URL was: {url}")
@@ -198,6 +174,58 @@ class CS2Client:
             self.logger.error(f"Failed to communicate with server: {e}, URL was: {url}")
             return None
             
+    def send_batch_to_server(self, batch: list) -> list:
+        """
+        Send several chat lines to the server in one request.
+
+        :param batch: List of (is_team, playername, chattext) tuples in log order.
+        :return: List with the responses (or None) for each line, in the same order.
+        """
+        from time import time
+        
+        if not self.batch_endpoint_available:
+            return [self.send_to_server(*message) for message in batch]
+        
+        url = f"{self.server_url}/process_messages"
+        try:
+            self.logger.debug("Sending batch of %d messages to: %s", len(batch), url)
+            
+            request_start = time()
+            response = requests.post(
+                url,
+                json={
+                    "messages": [
+                        {
+                            "is_team": is_team,
+                            "playername": playername,
+                            "chattext": chattext,
+                            "platform": "cs2"
+                        }
+                        for is_team, playername, chattext in batch
+                    ]
+                },
+                timeout=5
+            )
+            request_time = time() - request_start
+            
+            self.logger.info("Response status: %s (batch request took %.4fs)", response.status_code, request_time, extra=SAMPLED)
+            
+            if response.status_code == 404:
+                # Older server without the batch endpoint, fall back to one request per line
+                self.logger.warning("Server does not support batched messages, sending one at a time.")
+                self.batch_endpoint_available = False
+                return [self.send_to_server(*message) for message in batch]
+            
+            if response.status_code == 200:
+                results = response.json().get("results", [])
+                return [result.get("responses") if result else None for result in results]
+            
+            self.logger.error(f"Server returned status code: {response.status_code}, URL was: {url}")
+            return [None] * len(batch)
+        except requests.exceptions.RequestException as e:
+            self.logger.error(f"Failed to communicate with server: {e}, URL was: {url}")
+            return [None] * len(batch)
+            
     def run(self):
         """Main loop to monitor the console log and process messages."""
         if not os.path.exists(self.console_log_path):
@@ -247,36 +275,46 @@ class CS2Client:
         
         self.logger.info("Starting CS2 client main loop...")
         while self.running:
+            # Collect every line available in this read of the log tail
+            batch = []
             line = log_file.readline()
-            if not line:
-                continue
+            while line:
+                # Parse the line
+                is_team, playername, chattext = self.parse_chat_line(line)
+                if playername and chattext:
+                    self.logger.info("Parsed chat: [%s] %s (team: %s)", playername, chattext, is_team)
+                    batch.append((is_team, playername, chattext))
+                if len(batch) >= self.max_batch_size:
+                    break
+                line = log_file.readline()
                 
-            # Parse the line
-            is_team, playername, chattext = self.parse_chat_line(line)
-            if not playername or not chattext:
+            if not batch:
+                self._interruptible_sleep(0.05)
                 continue
-            
-            self.logger.info(f"Parsed chat: [{playername}] {chattext} (team: {is_team})")
                 
             # Send to server for processing
-            responses = self.send_to_server(is_team, playername, chattext)
+            if len(batch) == 1:
+                results = [self.send_to_server(*batch[0])]
+            else:
+                results = self.send_batch_to_server(batch)
             
             # Queue responses for sending to CS2
-            if responses:
+            for (is_team, playername, _), responses in zip(batch, results):
+                if not responses:
+                    continue
                 for response in responses:
                     response_is_team = response.get("is_team", is_team)
                     response_text = response.get("text", "")
                     if response_text:
-                        self.add_to_chat_queue(response_is_team, response_text)
+                        self.add_to_chat_queue(response_is_team, response_text, playername)
                         
         self.logger.info("CS2 client main loop exited.")
         
+    def _wait_until_resumed(self) -> None:
+        """Block while the client is paused, waking up immediately on resume or stop."""
+        with self.pause_condition:
+            self.pause_condition.wait_for(lambda: not self.paused or self.stop_event.is_set())
+            
     def _interruptible_sleep(self, duration: float) -> None:
         """Sleep for the specified duration, but wake up if stop_event is set."""
-        interval = 0.1
-        elapsed = 0
-        while elapsed < duration:
-            if self.stop_event.is_set():
-                break
-            sleep(interval)
-            elapsed += interval
+        self.stop_event.wait(duration)
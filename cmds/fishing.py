@@ -16,7 +16,13 @@ def cast_command(bot, is_team: bool, playername: str, chattext: str) -> None:
     if fishing_module:
         result = fishing_module.fish(playername)
         if result:
-            if result.get("type") == "fish":
+            if result.get("type") == "fish" and result.get("autosold"):
+                # Fish on the autosell list are sold instead of going into the sack
+                bot.add_to_chat_queue(
+                    is_team,
+                    f"{playername} caught a {result['name']} weighing {result['weight']} lbs and autosold it for ${result['price']}! New balance: ${result['balance']:.2f}"
+                )
+            elif result.get("type") == "fish":
                 # If a fish is caught, display its details
                 bot.add_to_chat_queue(
                     is_team,
@@ -44,20 +44,26 @@ def open_command(bot, is_team: bool, playername: str, chattext: str) -> None:
     :param bot: The Bot instance.
     :param is_team: Whether the message is for the team chat.
     :param playername: The name of the player.
-    :param chattext: The name of the case to open.
-    :help open: Open a case from your inventory. (alias: case)
+    :param chattext: The name of the case to open and an optional count (e.g., "Bravo Case 5").
+    :help open: Open a case from your inventory, or several at once with a count. (alias: case)
     """
     inventory_module: InventoryModule = bot.modules.get_module("inventory")
     if inventory_module:
+        # Parse the case name and count
         case_name = chattext.strip()
+        parts = case_name.rsplit(" ", 1)
+        count = 1
+        if parts[-1].isdigit():
+            count = int(parts[-1])
+            case_name = parts[0] if len(parts) > 1 else ""
         if not case_name:
-            result = inventory_module.open_case(playername, None)
+            result = inventory_module.open_case(playername, None, count)
             if not result:
                 bot.add_to_chat_queue(is_team, f"{playername}: You have no cases to open.")
                 return
             bot.add_to_chat_queue(is_team, f"{playername}: {result}")
         else:
-            result = inventory_module.open_case(playername, case_name)
+            result = inventory_module.open_case(playername, case_name, count)
             bot.add_to_chat_queue(is_team, f"{playername}: {result}")
     else:
         bot.add_to_chat_queue(is_team, f"{playername}: Inventory module not found.")
@@ -24,7 +24,7 @@ def daily_command(bot, is_team: bool, playername: str, chattext: str) -> None:
         return
     
     # Show current daily quest
-    quest = quest_module.get_daily_quest(playername)
+    quest, time_remaining = quest_module.get_daily_quest_status(playername)
     
     if not quest:
         # Check when next quest is available
@@ -42,7 +42,6 @@ def daily_command(bot, is_team: bool, playername: str, chattext: str) -> None:
     
     req_text = ", ".join([f"{r['quantity']}x {r['name']}" for r in quest['requirements']])
     
-    time_remaining = quest_module.get_time_until_daily_reset(playername)
     reset_text = f" | Resets in {_format_time_remaining(time_remaining)}" if time_remaining else ""
 
     if not has_items:
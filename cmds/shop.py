@@ -18,32 +18,12 @@ def shop_command(bot, is_team: bool, playername: str, chattext: str) -> None:
         if not category:
             bot.add_to_chat_queue(is_team, f"{playername}: Available categories: {', '.join(shop_module.get_categories())}")
             return
-        result = shop_module.get_shop_items(playername, category.lower())
+        result = shop_module.get_shop_listing(playername, category)
 
         if "error" in result:
             bot.add_to_chat_queue(is_team, f"{playername}: {result['error']}")
         else:
-            items = result["items"]
-            if not items:
-                bot.add_to_chat_queue(is_team, f"{playername}: No items available in the shop.")
-                return
-
-            if type(items) is dict and "error" in items:
-                return bot.add_to_chat_queue(is_team, f"{playername}: {items['error']}")
-            # Format the item list for display
-            item_list = []
-            for item in items:
-                item_name = item["name"]
-                item_price = item["price"]
-                item_max = item.get("max", 1)
-                if item_max > 1:
-                    item_list.append(f"{item_name} (${item_price:.2f}, max: {item_max})")
-                else:
-                    item_list.append(f"{item_name} (${item_price:.2f})")
-
-            # Join the item list into a single string
-            item_list_str = ", ".join(item_list)
-            bot.add_to_chat_queue(is_team, f"{playername}: Available shop items: {item_list_str}")
+            bot.add_to_chat_queue(is_team, f"{playername}: Available shop items: {result['text']}")
     else:
         bot.add_to_chat_queue(is_team, f"{playername}: Shop module not found.")
 
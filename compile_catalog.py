@@ -0,0 +1,29 @@
+"""
+Compile the game data catalogs into a binary snapshot.
+
+Validates fish.json, shop.json, cases.json, status_effects.json and quests.json
+and stores them in catalog.snapshot next to the data files. The server loads the
+snapshot instead of parsing and validating the JSON for as long as the files
+match it; after an edit it falls back to the JSON until this is run again.
+Run it before bundling so the snapshot ships with the build.
+
+Usage: python compile_catalog.py
+"""
+import sys
+
+from modules.catalog import Catalog
+
+
+def main():
+    """Compile the snapshot."""
+    try:
+        catalog = Catalog()
+        path = catalog.compile()
+    except Exception as e:
+        print(f"Error compiling the catalog: {e}")
+        sys.exit(1)
+    print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -101,6 +101,16 @@ CREATE TABLE IF NOT EXISTS quest_completions (
 -- Create index on user_id and quest_id for tracking
 CREATE INDEX IF NOT EXISTS idx_quest_completions_user_quest ON quest_completions(user_id, quest_id);
 
+-- Autosell preferences (fish sold as soon as they are caught)
+CREATE TABLE IF NOT EXISTS autosell_fish (
+    user_id TEXT NOT NULL,
+    fish_name TEXT NOT NULL,
+    PRIMARY KEY (user_id, fish_name)
+);
+
+-- Create index on user_id for faster lookups
+CREATE INDEX IF NOT EXISTS idx_autosell_fish_user_id ON autosell_fish(user_id);
+
 -- Grant permissions (if needed)
 GRANT ALL PRIVILEGES ON ALL TABLES IN SCHEMA public TO bot_user;
 GRANT USAGE, SELECT ON ALL SEQUENCES IN SCHEMA public TO bot_user;
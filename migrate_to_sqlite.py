@@ -0,0 +1,108 @@
+"""
+Migration script to copy the PostgreSQL database into a SQLite file.
+The reverse of migrate_to_postgres.py: run it once to move a server
+deployment to the embedded SQLite backend ([storage] backend = "sqlite").
+
+Usage: python migrate_to_sqlite.py [path/to/bot.db]
+"""
+import os
+import sqlite3
+import sys
+from datetime import datetime
+from decimal import Decimal
+
+import psycopg2
+
+from util.storage.sqlite import SCHEMA, default_path
+
+# PostgreSQL connection details
+PG_CONFIG = {
+    'host': os.getenv('POSTGRES_HOST', 'localhost'),
+    'port': int(os.getenv('POSTGRES_PORT', '5432')),
+    'database': os.getenv('POSTGRES_DB', 'fishing_bot'),
+    'user': os.getenv('POSTGRES_USER', 'bot_user'),
+    'password': os.getenv('POSTGRES_PASSWORD', 'bot_password')
+}
+
+# Tables and columns copied as-is; IDs are kept so trophies and quests stay in order
+TABLES = {
+    'user_balances': ['user_id', 'balance'],
+    'caught_fish': ['id', 'user_id', 'name', 'weight', 'price', 'bait'],
+    'trophy_fish': ['id', 'user_id', 'name', 'weight', 'price', 'added_at'],
+    'user_inventory': ['user_id', 'item_name', 'item_data', 'quantity'],
+    'status_effects': ['user_id', 'effect_name', 'expiration_time'],
+    'account_links': ['account_id', 'platform', 'identifier', 'created_at'],
+    'link_codes': ['code', 'platform', 'identifier', 'created_at', 'expires_at'],
+    'daily_quests': ['id', 'user_id', 'quest_id', 'assigned_at', 'completed', 'completed_at'],
+    'quest_completions': ['id', 'user_id', 'quest_id', 'completed_at'],
+    'autosell_fish': ['user_id', 'fish_name'],
+}
+
+
+def convert(value):
+    """Convert a PostgreSQL value to what the SQLite schema stores."""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+def migrate_table(pg_conn, sqlite_conn, table, columns):
+    """Copy one table, replacing rows with the same key."""
+    print(f"Migrating {table}...")
+
+    pg_cursor = pg_conn.cursor()
+    try:
+        pg_cursor.execute(f"SELECT {', '.join(columns)} FROM {table}")
+    except psycopg2.Error as e:
+        pg_conn.rollback()
+        print(f"  Skipping {table}: {str(e).strip()}")
+        return
+    rows = [tuple(convert(value) for value in row) for row in pg_cursor.fetchall()]
+
+    placeholders = ', '.join('?' for _ in columns)
+    sqlite_conn.executemany(
+        f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+        rows
+    )
+    print(f"Migrated {len(rows)} {table} records")
+
+
+def main():
+    """Main migration function."""
+    sqlite_path = sys.argv[1] if len(sys.argv) > 1 else default_path()
+    print("Starting database migration from PostgreSQL to SQLite...")
+    print(f"Source: {PG_CONFIG['host']}:{PG_CONFIG['port']}/{PG_CONFIG['database']}")
+    print(f"Target: {sqlite_path}")
+
+    # Connect to PostgreSQL
+    try:
+        pg_conn = psycopg2.connect(**PG_CONFIG)
+        print("Connected to PostgreSQL")
+    except Exception as e:
+        print(f"Error connecting to PostgreSQL: {e}")
+        sys.exit(1)
+
+    sqlite_conn = sqlite3.connect(sqlite_path)
+    sqlite_conn.executescript(SCHEMA)
+
+    # Copy everything in one SQLite transaction so a failed run leaves the file unchanged
+    try:
+        with sqlite_conn:
+            for table, columns in TABLES.items():
+                migrate_table(pg_conn, sqlite_conn, table, columns)
+    except Exception as e:
+        print(f"Error during migration, nothing was written: {e}")
+        sys.exit(1)
+    finally:
+        sqlite_conn.close()
+        pg_conn.close()
+
+    print("\nMigration complete!")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,17 +4,20 @@ Account linking module for cross-platform user identification.
 import random
 import string
 from datetime import datetime, timedelta
-from util.database import DatabaseConnection
 from util.module_registry import module_registry
+from util.storage import get_storage
 
 
 class AccountLinking:
     """Manage account linking across platforms."""
+    load_after = ["inventory"]  # Load after the inventory module
     
     def __init__(self):
         """Initialize the account linking module."""
         self.code_length = 6
         self.code_expiry_minutes = 10
+        self.storage = get_storage()
+        self.inventory = module_registry.get_module("inventory")
     
     def generate_code(self, platform: str, identifier: str) -> str:
         """
@@ -30,18 +33,8 @@ class AccountLinking:
         # Calculate expiration time
         expires_at = datetime.now() + timedelta(minutes=self.code_expiry_minutes)
         
-        with DatabaseConnection() as cursor:
-            # Remove any existing codes for this user
-            cursor.execute("""
-                DELETE FROM link_codes
-                WHERE platform = %s AND identifier = %s
-            """, (platform, identifier))
-            
-            # Insert the new code
-            cursor.execute("""
-                INSERT INTO link_codes (code, platform, identifier, expires_at)
-                VALUES (%s, %s, %s, %s)
-            """, (code, platform, identifier, expires_at))
+        # Replace any existing code for this user
+        self.storage.replace_link_code(code, platform, identifier, expires_at)
         
         return code
     
@@ -54,15 +47,9 @@ class AccountLinking:
         :param target_identifier: The identifier on that platform
         :return: Dictionary with success/error information
         """
-        with DatabaseConnection() as cursor:
-            # Find the code
-            cursor.execute("""
-                SELECT platform, identifier, expires_at
-                FROM link_codes
-                WHERE code = %s
-            """, (code,))
-            
-            result = cursor.fetchone()
+        # Link, consume the code and migrate data atomically
+        with self.storage.transaction():
+            result = self.storage.get_link_code(code)
             
             if not result:
                 return {"error": "Invalid code. Please check and try again."}
@@ -71,7 +58,7 @@ class AccountLinking:
             
             # Check if expired
             if datetime.now() > expires_at:
-                cursor.execute("DELETE FROM link_codes WHERE code = %s", (code,))
+                self.storage.delete_link_code(code)
                 return {"error": "Code has expired. Please generate a new one."}
             
             # Check if trying to link the same account
@@ -79,100 +66,28 @@ class AccountLinking:
                 return {"error": "Cannot link an account to itself."}
             
             # Check if either account is already linked
-            cursor.execute("""
-                SELECT account_id FROM account_links
-                WHERE (platform = %s AND identifier = %s)
-                   OR (platform = %s AND identifier = %s)
-            """, (source_platform, source_identifier, target_platform, target_identifier))
+            source_account = self.storage.get_account_id(source_platform, source_identifier)
+            target_account = self.storage.get_account_id(target_platform, target_identifier)
+            account_ids = {account for account in (source_account, target_account) if account is not None}
+            
+            if len(account_ids) > 1:
+                return {"error": "Cannot link accounts that are already linked to different account IDs."}
             
-            existing_links = cursor.fetchall()
+            # Reuse the existing account_id, or create a new one (max + 1)
+            account_id = account_ids.pop() if account_ids else self.storage.next_account_id()
             
-            if existing_links:
-                # Both accounts should share the same account_id
-                account_ids = set(link[0] for link in existing_links)
-                
-                if len(account_ids) > 1:
-                    return {"error": "Cannot link accounts that are already linked to different account IDs."}
-                
-                account_id = account_ids.pop()
-                
-                # Add the missing link(s)
-                existing_platforms = {}
-                cursor.execute("""
-                    SELECT platform, identifier FROM account_links
-                    WHERE account_id = %s
-                """, (account_id,))
-                for plat, ident in cursor.fetchall():
-                    existing_platforms[plat] = ident
-                
-                # Add source if not exists
-                if source_platform not in existing_platforms:
-                    # Check if this (platform, identifier) already exists
-                    cursor.execute("""
-                        SELECT account_id FROM account_links
-                        WHERE platform = %s AND identifier = %s
-                    """, (source_platform, source_identifier))
-                    existing = cursor.fetchone()
-                    if not existing:
-                        cursor.execute("""
-                            INSERT INTO account_links (account_id, platform, identifier)
-                            VALUES (%s, %s, %s)
-                        """, (account_id, source_platform, source_identifier))
-                
-                # Add target if not exists
-                if target_platform not in existing_platforms:
-                    # Check if this (platform, identifier) already exists
-                    cursor.execute("""
-                        SELECT account_id FROM account_links
-                        WHERE platform = %s AND identifier = %s
-                    """, (target_platform, target_identifier))
-                    existing = cursor.fetchone()
-                    if not existing:
-                        cursor.execute("""
-                            INSERT INTO account_links (account_id, platform, identifier)
-                            VALUES (%s, %s, %s)
-                        """, (account_id, target_platform, target_identifier))
-            else:
-                # Neither account is linked, create new account_id
-                # Check if source already exists
-                cursor.execute("""
-                    SELECT account_id FROM account_links
-                    WHERE platform = %s AND identifier = %s
-                """, (source_platform, source_identifier))
-                existing_source = cursor.fetchone()
-                
-                if existing_source:
-                    account_id = existing_source[0]
-                else:
-                    # Generate a new account_id (get max + 1)
-                    cursor.execute("SELECT COALESCE(MAX(account_id), 0) + 1 FROM account_links")
-                    account_id = cursor.fetchone()[0]
-                    
-                    # Insert source account
-                    cursor.execute("""
-                        INSERT INTO account_links (account_id, platform, identifier)
-                        VALUES (%s, %s, %s)
-                    """, (account_id, source_platform, source_identifier))
-                
-                # Check if target already exists
-                cursor.execute("""
-                    SELECT account_id FROM account_links
-                    WHERE platform = %s AND identifier = %s
-                """, (target_platform, target_identifier))
-                existing_target = cursor.fetchone()
-                
-                if not existing_target:
-                    # Link the target account with the same account_id
-                    cursor.execute("""
-                        INSERT INTO account_links (account_id, platform, identifier)
-                        VALUES (%s, %s, %s)
-                    """, (account_id, target_platform, target_identifier))
+            # Add the missing link(s)
+            existing_platforms = dict(self.storage.get_account_links(account_id))
+            if source_platform not in existing_platforms and source_account is None:
+                self.storage.add_link(account_id, source_platform, source_identifier)
+            if target_platform not in existing_platforms and target_account is None:
+                self.storage.add_link(account_id, target_platform, target_identifier)
             
             # Delete the used code
-            cursor.execute("DELETE FROM link_codes WHERE code = %s", (code,))
+            self.storage.delete_link_code(code)
             
             # Migrate fishing data if needed
-            self._migrate_fishing_data(cursor, source_platform, source_identifier, 
+            self._migrate_fishing_data(source_platform, source_identifier,
                                        target_platform, target_identifier)
         
         return {
@@ -181,12 +96,11 @@ class AccountLinking:
             "account_id": account_id
         }
     
-    def _migrate_fishing_data(self, cursor, source_platform: str, source_identifier: str,
+    def _migrate_fishing_data(self, source_platform: str, source_identifier: str,
                              target_platform: str, target_identifier: str):
         """
         Migrate fishing data from CS2 to Discord if Discord account is empty.
         
-        :param cursor: Database cursor
         :param source_platform: Platform where code was generated
         :param source_identifier: User identifier on source platform
         :param target_platform: Platform where code was used
@@ -211,96 +125,10 @@ class AccountLinking:
         if not cs2_user or not discord_user:
             return
         
-        # Check if Discord account has any fishing data
-        cursor.execute("""
-            SELECT COUNT(*) FROM caught_fish WHERE user_id = %s
-        """, (discord_user,))
-        discord_fish_count = cursor.fetchone()[0]
-        
-        cursor.execute("""
-            SELECT COUNT(*) FROM user_inventory WHERE user_id = %s
-        """, (discord_user,))
-        discord_inventory_count = cursor.fetchone()[0]
-        
-        # If Discord account is empty, migrate from CS2; otherwise merge
-        if discord_fish_count == 0 and discord_inventory_count == 0:
-            # Simple migration - just update user_id from CS2 to Discord
-            cursor.execute("""
-                UPDATE caught_fish
-                SET user_id = %s
-                WHERE user_id = %s
-            """, (discord_user, cs2_user))
-            
-            cursor.execute("""
-                UPDATE user_inventory
-                SET user_id = %s
-                WHERE user_id = %s
-            """, (discord_user, cs2_user))
-            
-            cursor.execute("""
-                UPDATE user_balances
-                SET user_id = %s
-                WHERE user_id = %s
-            """, (discord_user, cs2_user))
-            
-            cursor.execute("""
-                UPDATE status_effects
-                SET user_id = %s
-                WHERE user_id = %s
-            """, (discord_user, cs2_user))
-        else:
-            # Merge data from both accounts
-            # Merge caught fish - just update user_id
-            cursor.execute("""
-                UPDATE caught_fish
-                SET user_id = %s
-                WHERE user_id = %s
-            """, (discord_user, cs2_user))
-            
-            # Merge inventory - combine quantities for same items
-            cursor.execute("""
-                INSERT INTO user_inventory (user_id, item_name, item_data, quantity)
-                SELECT %s, item_name, item_data, quantity
-                FROM user_inventory
-                WHERE user_id = %s
-                ON CONFLICT (user_id, item_name) 
-                DO UPDATE SET quantity = user_inventory.quantity + EXCLUDED.quantity
-            """, (discord_user, cs2_user))
-            
-            # Delete old CS2 inventory entries
-            cursor.execute("""
-                DELETE FROM user_inventory WHERE user_id = %s
-            """, (cs2_user,))
-            
-            # Merge balance - add CS2 balance to Discord balance
-            cursor.execute("""
-                INSERT INTO user_balances (user_id, balance)
-                SELECT %s, balance
-                FROM user_balances
-                WHERE user_id = %s
-                ON CONFLICT (user_id)
-                DO UPDATE SET balance = user_balances.balance + EXCLUDED.balance
-            """, (discord_user, cs2_user))
-            
-            # Delete old CS2 balance
-            cursor.execute("""
-                DELETE FROM user_balances WHERE user_id = %s
-            """, (cs2_user,))
-            
-            # Merge status effects - keep longest duration ones
-            cursor.execute("""
-                INSERT INTO status_effects (user_id, effect_type, expires_at)
-                SELECT %s, effect_type, expires_at
-                FROM status_effects
-                WHERE user_id = %s
-                ON CONFLICT (user_id, effect_type)
-                DO UPDATE SET expires_at = GREATEST(status_effects.expires_at, EXCLUDED.expires_at)
-            """, (discord_user, cs2_user))
-            
-            # Delete old CS2 status effects
-            cursor.execute("""
-                DELETE FROM status_effects WHERE user_id = %s
-            """, (cs2_user,))
+        # Move the CS2 user's data to Discord; quantities, balances and effects are
+        # combined with whatever the Discord account already has
+        self.storage.merge_user(cs2_user, discord_user)
+        self.inventory.invalidate(cs2_user, discord_user)
     
     def get_linked_accounts(self, platform: str, identifier: str) -> list:
         """
@@ -310,28 +138,12 @@ class AccountLinking:
         :param identifier: The user identifier
         :return: List of (platform, identifier) tuples
         """
-        with DatabaseConnection() as cursor:
-            # Find the account_id
-            cursor.execute("""
-                SELECT account_id FROM account_links
-                WHERE platform = %s AND identifier = %s
-            """, (platform, identifier))
-            
-            result = cursor.fetchone()
-            
-            if not result:
-                return []
-            
-            account_id = result[0]
-            
-            # Get all linked accounts
-            cursor.execute("""
-                SELECT platform, identifier
-                FROM account_links
-                WHERE account_id = %s
-            """, (account_id,))
-            
-            return cursor.fetchall()
+        account_id = self.storage.get_account_id(platform, identifier)
+        
+        if account_id is None:
+            return []
+        
+        return self.storage.get_account_links(account_id)
     
     def get_unified_user_id(self, platform: str, identifier: str) -> str:
         """
@@ -342,18 +154,12 @@ class AccountLinking:
         :param identifier: The user identifier
         :return: The unified user ID (account_id) or original identifier
         """
-        with DatabaseConnection() as cursor:
-            cursor.execute("""
-                SELECT account_id FROM account_links
-                WHERE platform = %s AND identifier = %s
-            """, (platform, identifier))
-            
-            result = cursor.fetchone()
-            
-            if result:
-                return f"account_{result[0]}"
-            
-            return identifier
+        account_id = self.storage.get_account_id(platform, identifier)
+        
+        if account_id is not None:
+            return f"account_{account_id}"
+        
+        return identifier
     
     def get_preferred_identifier(self, platform: str, identifier: str) -> str:
         """
@@ -364,43 +170,29 @@ class AccountLinking:
         :param identifier: The user identifier
         :return: The preferred identifier (Discord username if linked, otherwise original)
         """
-        with DatabaseConnection() as cursor:
-            # Find the account_id for this user
-            cursor.execute("""
-                SELECT account_id FROM account_links
-                WHERE platform = %s AND identifier = %s
-            """, (platform, identifier))
-            
-            result = cursor.fetchone()
-            
-            if not result:
-                # No linked account, return original identifier
-                return identifier
-            
-            account_id = result[0]
-            
-            # Look for a Discord account in this link group
-            cursor.execute("""
-                SELECT identifier FROM account_links
-                WHERE account_id = %s AND platform = 'discord'
-            """, (account_id,))
-            
-            discord_result = cursor.fetchone()
-            
-            if discord_result:
-                # Return Discord identifier if it exists
-                return discord_result[0]
-            
-            # No Discord account linked, return original identifier
-            return identifier
-    
+        # Discord identifier if the user is linked to one, otherwise the original identifier
+        preferred = self.storage.get_preferred_identifiers([(platform, identifier)])
+        return preferred.get((platform, identifier)) or identifier
+
+    def get_preferred_identifiers(self, users: list) -> dict:
+        """
+        Resolve the preferred identifier for many users with a single query.
+
+        :param users: List of (platform, identifier) tuples
+        :return: Dictionary mapping each (platform, identifier) to its preferred identifier
+        """
+        users = list(dict.fromkeys(users))
+        if not users:
+            return {}
+
+        linked = self.storage.get_preferred_identifiers(users)
+
+        # Unlinked users and links without a Discord account keep their original identifier
+        return {user: linked.get(user) or user[1] for user in users}
+
     def cleanup_expired_codes(self):
         """Remove expired linking codes."""
-        with DatabaseConnection() as cursor:
-            cursor.execute("""
-                DELETE FROM link_codes
-                WHERE expires_at < NOW()
-            """)
+        self.storage.delete_expired_link_codes(datetime.now())
 
 
 # Register the module
@@ -1,31 +1,21 @@
-import json
-import os
-import sys
 from thefuzz import process, fuzz
 
-from util.config import get_config_path
 from util.module_registry import module_registry
+from modules.catalog import Catalog
 from modules.inventory import Inventory
 from modules.status_effects import StatusEffects
 
 class Beer:
-    load_after = ["inventory"]
+    load_after = ["catalog", "inventory", "status_effects"]
     def __init__(self):
-        self.beer_data = self.load_beer_data()
+        self.catalog: Catalog = module_registry.get_module("catalog")
         self.inventory: Inventory = module_registry.get_module("inventory")
         self.status_effects: StatusEffects = module_registry.get_module("status_effects")
     
-    def load_beer_data(self):
-        """
-        Load drinking data from the configuration file.
-        """
-        appdata_dir = os.path.dirname(get_config_path())
-        beer_json_path = os.path.join(appdata_dir, "shop.json") if hasattr(sys, '_MEIPASS') else os.path.join("modules", "data", "shop.json")
-        try:
-            with open(beer_json_path, 'r', encoding='utf-8') as file:
-                return json.load(file)['Beer']
-        except FileNotFoundError:
-            return []
+    @property
+    def beer_data(self):
+        """Beer from the shop catalog (follows catalog reloads)."""
+        return self.catalog.shop.get("Beer", ())
 
     def find_beer(self, beer_name):
         """
@@ -34,13 +24,11 @@ class Beer:
         if self.beer_data is None:
             return None
         
-        # fuzz the beer name
-        beer_names = [beer["name"].lower() for beer in self.beer_data]
-        best_match = process.extractOne(beer_name.lower(), beer_names, scorer=fuzz.ratio)
+        # fuzz the beer name against the catalog's lowercase names
+        beer_by_name = self.catalog.by_lowercase_name.get("Beer", {})
+        best_match = process.extractOne(beer_name.lower(), beer_by_name.keys(), scorer=fuzz.ratio)
         if best_match and best_match[1] >= 80:
-            for beer in self.beer_data:
-                if beer["name"].lower() == best_match[0]:
-                    return beer
+            return beer_by_name[best_match[0]]
         
         return None
 
@@ -30,11 +30,7 @@ class Casino:
 
         # Perform the coin flip
         # Get cutoff from status effects
-        status_effects = self.status_effects.get_effects(user_id)
-        cutoff = 0.5
-        for effect in status_effects:
-            if effect["effect_id"] == "luck":
-                cutoff *= effect["mult"]
+        cutoff = self.win_chance(self.status_effects.get_effects(user_id))
         outcome = "heads" if random.random() < cutoff else "tails"
         if outcome == "heads":
             # User wins, double the amount
@@ -43,4 +39,16 @@ class Casino:
         else:
             # User loses, deduct the amount
             self.economy.deduct_balance(user_id, amount)
-            return f"You flipped tails and lost ${amount:.2f}. Your new balance is ${self.economy.get_balance(user_id):.2f}."
\ No newline at end of file
+            return f"You flipped tails and lost ${amount:.2f}. Your new balance is ${self.economy.get_balance(user_id):.2f}."
+
+    @staticmethod
+    def win_chance(status_effects):
+        """
+        Return the chance of flipping heads with these status effects; the economy
+        simulator (simulate_economy.py) uses it too.
+        """
+        cutoff = 0.5
+        for effect in status_effects:
+            if effect["effect_id"] == "luck":
+                cutoff *= effect["mult"]
+        return cutoff
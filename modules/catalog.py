@@ -0,0 +1,195 @@
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager
+
+from util.config import get_config_path
+from util.game_data import CatalogData, fingerprint, read_snapshot, write_snapshot
+from util.module_registry import module_registry
+
+
+class Catalog:
+    """
+    Static game data (fish, shop, cases, quests and status effects), loaded once and shared.
+
+    Every module reads its data from here instead of parsing the JSON files itself, e.g.
+    `catalog.fish` or `catalog.items`. Attribute reads are served by the current
+    CatalogData version; see CatalogData for what is available. The data is read-only;
+    copy an entry before changing it.
+
+    `reload()` reads and validates the files into a new version and swaps it in with one
+    assignment; invalid files are rejected and the old version stays. `watch()` does that
+    whenever a file's mtime changes. Code that must see one version throughout (a chat
+    message) wraps itself in `pinned()`.
+
+    `compile()` (python compile_catalog.py) stores the validated data in a binary
+    snapshot next to the data files. While the files still match it, loading unpickles
+    the snapshot instead of parsing and validating the JSON; once any file changes, the
+    JSON is read again.
+    """
+    defaults = {"fish": [], "shop": {}, "cases": [], "status_effects": {}, "quests": []}
+
+    def __init__(self):
+        self._local = threading.local()
+        self._reload_lock = threading.Lock()
+        self._stop_watching = threading.Event()
+        self._watcher = None
+        self.version = 1
+        self._current = self.read()
+        self._seen_mtimes = self._current.mtimes
+
+    def data_path(self, filename):
+        """Return the path of a data file; bundled builds read it from the app data directory."""
+        appdata_dir = os.path.dirname(get_config_path())
+        return os.path.join(appdata_dir, filename) if hasattr(sys, '_MEIPASS') else os.path.join("modules", "data", filename)
+
+    def paths(self):
+        """Return {catalog: path} for every data file."""
+        return {
+            "fish": self.data_path("fish.json"),
+            "shop": self.data_path("shop.json"),
+            "cases": self.data_path("cases.json"),
+            "status_effects": self.data_path("status_effects.json"),
+            # Quests always ship next to this module
+            "quests": os.path.join(os.path.dirname(__file__), "data", "quests.json"),
+        }
+
+    def mtimes(self):
+        """Return {path: mtime} for every data file (None if missing)."""
+        mtimes = {}
+        for path in self.paths().values():
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                mtimes[path] = None
+        return mtimes
+
+    def snapshot_path(self):
+        """Return the path of the compiled snapshot."""
+        return self.data_path("catalog.snapshot")
+
+    def read_files(self):
+        """Return {catalog: file content as bytes}, None for a missing file."""
+        contents = {}
+        for name, path in self.paths().items():
+            try:
+                with open(path, mode="rb") as file:
+                    contents[name] = file.read()
+            except FileNotFoundError:
+                contents[name] = None
+        return contents
+
+    def parse(self, contents):
+        """Parse the file contents into {catalog: data}, using the defaults for missing files."""
+        sources = {}
+        for name, default in self.defaults.items():
+            if contents[name] is None:
+                sources[name] = default
+                continue
+            try:
+                sources[name] = json.loads(contents[name])
+            except Exception as e:
+                raise Exception(f"Error loading {os.path.basename(self.paths()[name])}: {e}")
+        return sources
+
+    def read(self):
+        """
+        Read, validate and index the data files into a new version; from the snapshot if
+        it was compiled from the current files.
+
+        :raises Exception: If a file cannot be parsed or the data is invalid.
+        """
+        # Take the mtimes first, so a write during the read triggers another reload
+        mtimes = self.mtimes()
+        contents = self.read_files()
+        fingerprints = {name: fingerprint(content) for name, content in contents.items()}
+        sources = read_snapshot(self.snapshot_path(), fingerprints)
+        if sources is not None:
+            return CatalogData(mtimes=mtimes, validate=False, **sources)
+        return CatalogData(mtimes=mtimes, **self.parse(contents))
+
+    def compile(self):
+        """
+        Validate the data files and write them to the snapshot.
+
+        :return: The path of the snapshot.
+        :raises Exception: If a file cannot be parsed or the data is invalid.
+        """
+        contents = self.read_files()
+        sources = self.parse(contents)
+        CatalogData(**sources)
+        path = self.snapshot_path()
+        write_snapshot(path, {name: fingerprint(content) for name, content in contents.items()}, sources)
+        return path
+
+    @property
+    def data(self):
+        """The version pinned by this thread, or the current one."""
+        return getattr(self._local, "pinned", None) or self._current
+
+    def __getattr__(self, name):
+        # Only called for attributes Catalog itself lacks: serve them from the data
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.data, name)
+
+    @contextmanager
+    def pinned(self):
+        """Keep reading the same version in this thread until the block ends, even across reloads."""
+        previous = getattr(self._local, "pinned", None)
+        self._local.pinned = previous or self._current
+        try:
+            yield self._local.pinned
+        finally:
+            self._local.pinned = previous
+
+    def reload(self):
+        """
+        Re-read the data files and swap the new version in if it is valid.
+
+        :return: True if a new version was installed.
+        """
+        with self._reload_lock:
+            self._seen_mtimes = self.mtimes()
+            try:
+                data = self.read()
+            except Exception as e:
+                module_registry.logger.error(f"Catalog reload rejected, keeping version {self.version}: {e}")
+                return False
+            self._current = data
+            self.version += 1
+            module_registry.logger.info(f"Catalog reloaded (version {self.version})")
+            return True
+
+    def changed(self):
+        """Return whether a data file changed since the last (attempted) load."""
+        return self.mtimes() != self._seen_mtimes
+
+    def watch(self, interval=2.0):
+        """
+        Reload in a background thread whenever a data file changes.
+
+        :param interval: Seconds between mtime checks.
+        """
+        if self._watcher is not None:
+            return
+        self._stop_watching.clear()
+
+        def poll():
+            while not self._stop_watching.wait(interval):
+                if self.changed():
+                    self.reload()
+
+        self._watcher = threading.Thread(target=poll, name="catalog-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        """Stop the background reload thread."""
+        if self._watcher is not None:
+            self._stop_watching.set()
+            self._watcher.join()
+            self._watcher = None
+
+
+module_registry.register("catalog", Catalog)
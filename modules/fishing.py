@@ -1,81 +1,146 @@
+import bisect
+import itertools
 import random
-import json
-import os
-import sys
 
-from util.database import DatabaseConnection
-from util.config import get_config_path
 from util.module_registry import module_registry
+from util.game_data import RARITIES
+from util.storage import get_storage
+from modules.catalog import Catalog
 from modules.inventory import Inventory as InventoryModule
 from modules.status_effects import StatusEffects as StatusEffectsModule
 
 class Fishing:
-    load_after = ["inventory", "economy"]  # Load after the inventory and economy modules
+    load_after = ["catalog", "inventory", "economy", "status_effects"]  # Load after the modules used below
+    base_miss_chance = 0.3  # Chance of a miss without a rod or effects
+    default_sack_size = 5  # Sack size without a sack
+
     def __init__(self):
-        self.fish_data = self.load_fish_data()
+        self.catalog: Catalog = module_registry.get_module("catalog")
         self.inventory: InventoryModule = module_registry.get_module("inventory")  # Retrieve the Inventory module from the module registry
         self.status_effects: StatusEffectsModule = module_registry.get_module("status_effects")  # Retrieve the StatusEffects module from the module registry
+        self.storage = get_storage()
 
-    def load_fish_data(self):
-        """Load fish data from a JSON file."""
-        appdata_dir = os.path.dirname(get_config_path())  # Get the app data directory
-        fish_json_path = os.path.join(appdata_dir, "fish.json") if hasattr(sys, '_MEIPASS') else os.path.join("modules", "data", "fish.json")
-        try:
-            with open(fish_json_path, mode='r', encoding='utf-8') as file:
-                return json.load(file)
-        except FileNotFoundError:
-            return []
+    @property
+    def fish_data(self):
+        """Fish and items from the catalog (follows catalog reloads)."""
+        return self.catalog.fish
+
+    def get_rod(self, playername):
+        """
+        Get the player's equipped rod: the one with the lowest miss rate multiplier.
+
+        :param playername: The name of the player.
+        :return: The rod's catalog data, or None if the player has no rod.
+        """
+        rod = self.inventory.get_best_item_by_type(playername, "rod", "fish_none_rate_multiplier", highest=False)
+        return rod[1] if rod else None
 
     def calculate_miss_chance(self, playername):
         """
         Calculate the chance of missing a fish based on the player's stats.
         """
-        miss_chance = 0.3  # Base miss chance
-
-        # Check player's inventory for fishing gear
-        rod = self.inventory.get_item_by_type(playername, "rod")
-        if rod:
-            # Assuming the rod has a miss chance attribute
-            rod = rod[0][1]
-            attributes = rod.get("attributes", {})
-            if "fish_none_rate_multiplier" in attributes:
-                miss_chance = miss_chance * attributes["fish_none_rate_multiplier"]
-        
-        # Check player's status effects
-        effects = self.status_effects.get_effects(playername)
-        for effect in effects:
-            if effect.get("module_id") == "fishing" and effect.get("effect_id").startswith("miss_rate"):
-                miss_chance = miss_chance * effect.get("mult", 1)
-        
-        return miss_chance
+        return self.miss_chance_for(self.get_rod(playername), self.status_effects.get_effects(playername))
             
     def calculate_sack_size(self, playername):
         """
         Calculate the sack size based on the player's stats.
         """
         # Check player's inventory for fishing gear
-        sack = self.inventory.get_item_by_type(playername, "sack")
-        if sack:
-            sack = sack[0][1]
-            # Assuming the sack has a size attribute
-            attributes = sack.get("attributes", {})
-            if "fish_capacity" in attributes:
-                return attributes["fish_capacity"]
-        return 5 # Default sack size if no sack is found
+        sack = self.inventory.get_best_item_by_type(playername, "sack", "fish_capacity")
+        return self.sack_size_for(sack[1] if sack else None)
         
     def get_minimum_rarity(self, playername):
         """
         Get the minimum rarity of fish that can be caught based on the player's stats.
         """
-        # Check player's inventory for fishing gear
-        rod = self.inventory.get_item_by_type(playername, "rod")
-        if rod:
-            # Assuming the rod has a rarity attribute
-            rod = rod[0][1]
-            attributes = rod.get("attributes", {})
-            if "fish_minimum_rarity" in attributes:
-                return attributes["fish_minimum_rarity"]
-        return "Common"
+        return self.minimum_rarity_for(self.get_rod(playername))
+
+    # The rules of a cast, without storage; the economy simulator (simulate_economy.py) uses them too
+
+    @classmethod
+    def miss_chance_for(cls, rod, effects):
+        """
+        :param rod: The rod's catalog data, or None.
+        :param effects: Active status effects, as returned by StatusEffects.get_effects.
+        :return: The chance of missing a fish.
+        """
+        miss_chance = cls.base_miss_chance
+        attributes = rod.get("attributes", {}) if rod else {}
+        if "fish_none_rate_multiplier" in attributes:
+            miss_chance = miss_chance * attributes["fish_none_rate_multiplier"]
+        for effect in effects:
+            if effect.get("module_id") == "fishing" and effect.get("effect_id").startswith("miss_rate"):
+                miss_chance = miss_chance * effect.get("mult", 1)
+        return miss_chance
+
+    @classmethod
+    def sack_size_for(cls, sack):
+        """Return the number of fish a sack holds (the default without a sack)."""
+        attributes = sack.get("attributes", {}) if sack else {}
+        return attributes.get("fish_capacity", cls.default_sack_size)
+
+    @staticmethod
+    def minimum_rarity_for(rod):
+        """Return the lowest rarity a rod catches."""
+        attributes = rod.get("attributes", {}) if rod else {}
+        return attributes.get("fish_minimum_rarity", "Common")
+
+    @staticmethod
+    def apply_bait(minimum_rarity, miss_chance, bait_rarity):
+        """
+        A bait raises the minimum rarity to its own, at the cost of 10% miss chance per
+        rarity it raises it by.
+
+        :return: (minimum_rarity, miss_chance) with the bait.
+        """
+        bait_rarity_index = RARITIES.index(bait_rarity)
+        minimum_rarity_index = RARITIES.index(minimum_rarity)
+        # If the bait rarity is higher than the minimum rarity, set the minimum rarity to the bait's rarity
+        if bait_rarity_index > minimum_rarity_index:
+            minimum_rarity = bait_rarity
+        # Increase the miss chance
+        return minimum_rarity, 0.1 * (bait_rarity_index - minimum_rarity_index) + miss_chance
+
+    @staticmethod
+    def catch_table(catalog, minimum_rarity, effects):
+        """
+        :param catalog: The catalog (or a CatalogData version).
+        :param minimum_rarity: The lowest rarity that can be caught.
+        :param effects: Active status effects.
+        :return: (fish around, running totals of their catch rates) with the rate effects applied.
+        """
+        fish_around, cumulative_rates = catalog.catch_tables[minimum_rarity]
+        
+        # alter catch rate based on status effects; copies, so the shared catalog doesn't change
+        rate_effects = [effect for effect in effects if effect.get("module_id") == "fishing"
+                        and effect.get("effect_id").startswith(("legendary_rate", "catch_rate", "case_rate"))]
+        if rate_effects:
+            fish_around = [dict(item) for item in fish_around]
+            for effect in rate_effects:
+                # legendary_rate effect
+                if effect.get("effect_id").startswith("legendary_rate"):
+                    for item in fish_around:
+                        if item["rarity"] == "Legendary":
+                            item["catch_rate"] *= effect.get("mult", 1)
+                # catch_rate effect
+                if effect.get("effect_id").startswith("catch_rate"):
+                    for item in fish_around:
+                        item["catch_rate"] *= effect.get("mult", 1)
+                # case_rate effect
+                if effect.get("effect_id").startswith("case_rate"):
+                    for item in fish_around:
+                        if item["type"] == "item":
+                            item["catch_rate"] *= effect.get("mult", 1)
+            cumulative_rates = list(itertools.accumulate(item["catch_rate"] for item in fish_around))
+        return fish_around, cumulative_rates
+
+    @staticmethod
+    def apply_price_effects(price, effects):
+        """Return a fish's price with the price effects applied (works on arrays too)."""
+        for effect in effects:
+            if effect.get("module_id") == "fishing" and effect.get("effect_id").startswith("price"):
+                price = price * effect.get("mult", 1)
+        return price
     
     def fish(self, user_id):
         """Simulate fishing and store the result in the database or inventory."""
@@ -83,16 +148,7 @@ class Fishing:
             return None
 
         # Check the current number of fish in the user's sack
-        with DatabaseConnection() as cursor:
-            cursor.execute("""
-                SELECT COUNT(*)
-                FROM caught_fish
-                WHERE user_id = %s
-            """, (user_id,))
-            fish_count = cursor.fetchone()
-
-        # Convert fish_count to an integer
-        fish_count = int(fish_count[0]) if fish_count else 0
+        fish_count = self.storage.count_fish(user_id)
 
         # Enforce fish limit
         sack_size = self.calculate_sack_size(user_id)  # Get the sack size
@@ -100,7 +156,6 @@ class Fishing:
             return {"type": "error", "message": f"Your sack can only hold {sack_size} fish."}
 
         # Randomly select a fish or item based on catch rate
-        rarities = ["Common", "Uncommon", "Rare", "Epic", "Legendary", "Mythical"] # Rarities increasing in value
         minimum_rarity = self.get_minimum_rarity(user_id)  # Get the minimum rarity
         miss_chance = self.calculate_miss_chance(user_id)  # Calculate the miss chance
 
@@ -109,102 +164,57 @@ class Fishing:
         if bait:
             # Remove the bait from the sack
             self.remove_fish_from_sack(user_id, bait["id"])
-            # Remove the bait from the database
-            with DatabaseConnection() as cursor:
-                cursor.execute("""
-                    DELETE FROM caught_fish
-                    WHERE id = %s
-                """, (bait["id"],))
 
             # Check the rarity of the bait
-            bait_rarity = bait.get("rarity", "Common")
-            bait_rarity_index = rarities.index(bait_rarity)
-            minimum_rarity_index = rarities.index(minimum_rarity)
-            
-            # If the bait rarity is higher than the minimum rarity, set the minimum rarity to the bait's rarity
-            if bait_rarity_index > minimum_rarity_index:
-                minimum_rarity = bait_rarity
-
-            # Increase the miss chance
-            miss_chance = 0.1 * (bait_rarity_index - minimum_rarity_index) + miss_chance
-        
-        # get fish around
-        fish_around = []
-        for item in self.fish_data:
-            if item["rarity"] == minimum_rarity or item["rarity"] in rarities[rarities.index(minimum_rarity):]:
-                fish_around.append(item)
+            minimum_rarity, miss_chance = self.apply_bait(minimum_rarity, miss_chance, bait.get("rarity", "Common"))
         
-        # alter catch rate based on status effects
+        # get fish around and the running totals of their catch rates, with the rate effects
         effects = self.status_effects.get_effects(user_id)
-        for effect in effects:
-            # legendary_rate effect
-            if effect.get("module_id") == "fishing" and effect.get("effect_id").startswith("legendary_rate"):
-                for item in fish_around:
-                    if item["rarity"] == "Legendary":
-                        item["catch_rate"] *= effect.get("mult", 1)
-            # catch_rate effect
-            if effect.get("module_id") == "fishing" and effect.get("effect_id").startswith("catch_rate"):
-                for item in fish_around:
-                    item["catch_rate"] *= effect.get("mult", 1)
-            # case_rate effect
-            if effect.get("module_id") == "fishing" and effect.get("effect_id").startswith("case_rate"):
-                for item in fish_around:
-                    if item["type"] == "item":
-                        item["catch_rate"] *= effect.get("mult", 1)
-                    
+        fish_around, cumulative_rates = self.catch_table(self.catalog, minimum_rarity, effects)
         
-        fish_catch_rate = sum(item["catch_rate"] for item in fish_around)  # Calculate the total catch rate for the filtered fish
+        fish_catch_rate = cumulative_rates[-1] if cumulative_rates else 0  # The total catch rate for the filtered fish
         total_catch_rate = fish_catch_rate + (fish_catch_rate *  miss_chance)  # Adjust the total catch rate based on miss chance
         random_roll = random.uniform(0, total_catch_rate)
-        cumulative_rate = 0
-
-        for item in fish_around:
-            cumulative_rate += item["catch_rate"]
-            if random_roll <= cumulative_rate:
-                if item["type"] == "fish":
-                    # Randomize the weight of the fish
-                    weight = round(random.uniform(item["min_weight"], item["max_weight"]), 2)
-                    # Calculate the price based on the weight and price multiplier
-                    price = weight * item["price_multiplier"]
-                    # price status effect
-                    for effect in effects:
-                        if effect.get("module_id") == "fishing" and effect.get("effect_id").startswith("price"):
-                            price *= effect.get("mult", 1)
-                    price = round(price, 2)
-                    # Add the fish to the database
-                    self.add_fish_to_db(user_id, item["name"], weight, price)
-                    return {"name": item["name"], "type": "fish", "weight": weight, "price": price}
-                elif item["type"] == "item":
-                    # Add the item to the inventory
-                    self.inventory.add_item(user_id, item["name"], 1)
-                    return {"name": item["name"], "type": "item", "message": f"You found a {item['name']}!"}
+
+        # The first fish whose running total reaches the roll; past the end is a miss
+        index = bisect.bisect_left(cumulative_rates, random_roll)
+        if index == len(fish_around):
+            return None
+        item = fish_around[index]
+        if item["type"] == "fish":
+            # Randomize the weight of the fish
+            weight = round(random.uniform(item["min_weight"], item["max_weight"]), 2)
+            # Calculate the price based on the weight and price multiplier
+            price = weight * item["price_multiplier"]
+            # price status effect
+            price = round(self.apply_price_effects(price, effects), 2)
+            # Sell fish on the autosell list right away instead of adding them to the sack
+            autosell = {name.lower() for name in self.storage.get_autosell(user_id)}
+            if item["name"].lower() in autosell:
+                new_balance = self.storage.add_balance(user_id, price)
+                return {"name": item["name"], "type": "fish", "weight": weight, "price": price,
+                        "autosold": True, "balance": new_balance}
+            # Add the fish to the database
+            self.add_fish_to_db(user_id, item["name"], weight, price)
+            return {"name": item["name"], "type": "fish", "weight": weight, "price": price}
+        elif item["type"] == "item":
+            # Add the item to the inventory
+            self.inventory.add_item(user_id, item["name"], 1)
+            return {"name": item["name"], "type": "item", "message": f"You found a {item['name']}!"}
 
     def add_fish_to_db(self, user_id, name, weight, price):
         """Add a caught fish to the database."""
-        with DatabaseConnection() as cursor:
-
-        # Add the new fish to the database
-            cursor.execute("""
-                INSERT INTO caught_fish (user_id, name, weight, price)
-                VALUES (%s, %s, %s, %s)
-            """, (user_id, name, weight, price))
+        self.storage.add_fish(user_id, name, weight, price)
         return f"You caught a {name} weighing {weight} lbs worth ${price}!"
 
     def get_sack(self, user_id):
         """Retrieve all fish caught by the user."""
-        with DatabaseConnection() as cursor:
-            cursor.execute("""
-                SELECT id, name, weight, price, bait
-                FROM caught_fish
-                WHERE user_id = %s
-            """, (user_id,))
-            result = cursor.fetchall()
-        return [{"id": row[0], "name": row[1], "weight": row[2], "price": row[3], "bait": row[4]} for row in result]
+        return self.storage.get_fish(user_id)
 
     def clear_sack(self, user_id):
         """Remove all fish caught by the user."""
-        with DatabaseConnection() as cursor:
-            cursor.execute("DELETE FROM caught_fish WHERE user_id = %s", (user_id,))
+        self.storage.clear_fish(user_id)
+
     def list_fish(self):
         """List all available fish and items."""
         return self.fish_data
@@ -217,40 +227,20 @@ class Fishing:
         :param name: The name of the fish to eat (optional).
         :return: A description of the fish or an error message if the fish is not found.
         """
-        with DatabaseConnection() as cursor:
-
-            if name:
-                # Sanitize the name input
-                name = name.strip()
+        if name:
+            # Sanitize the name input
+            name = name.strip()
 
-                # Retrieve the first fish matching the name (case-insensitive) from the database
-                cursor.execute("""
-                    SELECT id, name
-                    FROM caught_fish
-                    WHERE user_id = %s AND LOWER(name) = LOWER(%s)
-                    LIMIT 1
-                """, (user_id, name))
-            else:
-                # Retrieve the first fish in the sack if no name is provided
-                cursor.execute("""
-                    SELECT id, name
-                    FROM caught_fish
-                    WHERE user_id = %s
-                    LIMIT 1
-                """, (user_id,))
-            
-            fish = cursor.fetchone()
+        # Retrieve the first fish matching the name (case-insensitive), or the first fish in the sack
+        fish = self.storage.find_fish(user_id, name)
 
         if not fish:
             return "Your sack is empty." if not name else f"There were no '{name}' found in your sack."
 
-        fish_id, name = fish
+        name = fish["name"]
 
-        # Remove the fish from the database
-        cursor.execute("""
-            DELETE FROM caught_fish
-            WHERE id = %s
-        """, (fish_id,))
+        # Remove the fish from the sack
+        self.storage.remove_fish(user_id, fish["id"])
         # Retrieve the fish description from the fish data
         for fish_data in self.fish_data:
             if fish_data["name"].lower() == name.lower():
@@ -273,71 +263,37 @@ class Fishing:
         except ValueError:
             return "Economy module not found."
 
-        with DatabaseConnection() as cursor:
+        if name and name.strip().lower() == "all":
+            # Sell all fish in the sack and pay for them in one transaction
+            with self.storage.transaction():
+                sold, total_earnings = self.storage.sell_all_fish(user_id)
 
-            if name and name.strip().lower() == "all":
-                # Sell all fish in the sack
-                cursor.execute("""
-                    SELECT price
-                    FROM caught_fish
-                    WHERE user_id = %s
-                    AND bait = 0
-                """, (user_id,))
-                fish_prices = cursor.fetchall()
-
-                if not fish_prices:
+                if not sold:
                     return "Your sack is empty. You have no fish to sell."
 
-                total_earnings = float(sum(price[0] for price in fish_prices))
-
-                # Remove all fish from the database
-                cursor.execute("""
-                    DELETE FROM caught_fish
-                    WHERE user_id = %s
-                    AND bait = 0
-                """, (user_id,))
                 # Add the earnings to the user's balance
                 new_balance = economy.add_balance(user_id, total_earnings)
 
-                return f"You sold all your fish for a total of ${total_earnings:.2f}! Your new balance is ${new_balance:.2f}."
-            else:
-                # Sell the first fish in the sack or the first matching fish
-                if name:
-                    # Sanitize the name input
-                    name = name.strip()
-
-                    # Retrieve the first fish matching the name (case-insensitive) from the database
-                    cursor.execute("""
-                        SELECT id, name, price
-                        FROM caught_fish
-                        WHERE user_id = %s AND LOWER(name) = LOWER(%s)
-                        LIMIT 1
-                    """, (user_id, name))
-                else:
-                    # Retrieve the first fish in the sack if no name is provided
-                    cursor.execute("""
-                        SELECT id, name, price
-                        FROM caught_fish
-                        WHERE user_id = %s
-                        LIMIT 1
-                    """, (user_id,))
-
-                fish = cursor.fetchone()
-
-                if not fish:
-                    return "Your sack is empty." if not name else f"There were no '{name}' found in your sack."
-
-                fish_id, name, price = fish
-
-                # Remove the fish from the database
-                cursor.execute("""
-                    DELETE FROM caught_fish
-                    WHERE id = %s
-                """, (fish_id,))
-                # Add the earnings to the user's balance
-                new_balance = economy.add_balance(user_id, float(price))
-                
-                return f"You sold a {name} for ${price:.2f}! Your new balance is ${new_balance:.2f}."
+            return f"You sold all your fish for a total of ${total_earnings:.2f}! Your new balance is ${new_balance:.2f}."
+
+        # Sell the first fish in the sack or the first matching fish
+        if name:
+            # Sanitize the name input
+            name = name.strip()
+
+        with self.storage.transaction():
+            # Retrieve the first fish matching the name (case-insensitive), or the first fish in the sack
+            fish = self.storage.find_fish(user_id, name)
+
+            if not fish:
+                return "Your sack is empty." if not name else f"There were no '{name}' found in your sack."
+
+            # Remove the fish from the sack
+            self.storage.remove_fish(user_id, fish["id"])
+            # Add the earnings to the user's balance
+            new_balance = economy.add_balance(user_id, fish["price"])
+
+        return f"You sold a {fish['name']} for ${fish['price']:.2f}! Your new balance is ${new_balance:.2f}."
 
     def bait(self, playername, bait_name):
         """
@@ -395,21 +351,14 @@ class Fishing:
         :param playername: The name of the player.
         :return: The bait set for the player or None if no bait is set.
         """
-        with DatabaseConnection() as cursor:
-            cursor.execute("""
-                SELECT id, name
-                FROM caught_fish
-                WHERE user_id = %s AND bait = 1
-                LIMIT 1
-            """, (playername,))
-            bait = cursor.fetchone()
+        bait = self.storage.get_bait(playername)
         if bait:
             # Get the corresponding fish data
-            fish_data = next((fish for fish in self.fish_data if fish["name"].lower() == bait[1].lower()), None)
+            fish_data = next((fish for fish in self.fish_data if fish["name"].lower() == bait["name"].lower()), None)
             if fish_data:
                 return {
-                    "id": bait[0],
-                    "name": bait[1],
+                    "id": bait["id"],
+                    "name": bait["name"],
                     "rarity": fish_data.get("rarity", "Common"),
                     "description": fish_data.get("description", "No description available.")
                 }
@@ -422,21 +371,7 @@ class Fishing:
         :param playername: The name of the player.
         :param bait_id: The ID of the bait fish.
         """
-        with DatabaseConnection() as cursor:
-
-            # Unset any existing bait for the player
-            cursor.execute("""
-                UPDATE caught_fish
-                SET bait = 0
-                WHERE user_id = %s AND bait = 1
-            """, (playername,))
-
-            # Set the bait for the player
-            cursor.execute("""
-                UPDATE caught_fish
-                SET bait = 1
-                WHERE id = %s AND user_id = %s
-            """, (bait_id, playername))
+        self.storage.set_bait(playername, bait_id)
         return True
 
     def remove_fish_from_sack(self, user_id, fish_id):
@@ -446,9 +381,55 @@ class Fishing:
         :param user_id: The ID of the user.
         :param fish_id: The ID of the fish to remove.
         """
-        with DatabaseConnection() as cursor:
-            cursor.execute("""
-                DELETE FROM caught_fish
-                WHERE id = %s AND user_id = %s
-            """, (fish_id, user_id))
-    
\ No newline at end of file
+        self.storage.remove_fish(user_id, fish_id)
+
+    def list_autosell_fish(self, user_id):
+        """
+        List the fish the user sells automatically when caught.
+
+        :param user_id: The ID of the user.
+        :return: List of fish names.
+        """
+        return self.storage.get_autosell(user_id)
+
+    def add_autosell_fish(self, user_id, fish_name):
+        """
+        Add a fish to the user's autosell list.
+
+        :param user_id: The ID of the user.
+        :param fish_name: The name of the fish (case-insensitive).
+        :return: (success, message) tuple.
+        """
+        fish_name = fish_name.strip()
+        fish_data = next((fish for fish in self.fish_data
+                          if fish["type"] == "fish" and fish["name"].lower() == fish_name.lower()), None)
+        if not fish_data:
+            return False, f"'{fish_name}' is not a fish."
+        if not self.storage.add_autosell(user_id, fish_data["name"]):
+            return False, f"{fish_data['name']} is already on your autosell list."
+        return True, f"{fish_data['name']} will be sold automatically when caught."
+
+    def remove_autosell_fish(self, user_id, fish_name):
+        """
+        Remove a fish from the user's autosell list.
+
+        :param user_id: The ID of the user.
+        :param fish_name: The name of the fish (case-insensitive).
+        :return: (success, message) tuple.
+        """
+        fish_name = fish_name.strip()
+        if not self.storage.remove_autosell(user_id, fish_name):
+            return False, f"'{fish_name}' is not on your autosell list."
+        return True, f"Removed {fish_name} from your autosell list."
+
+    def clear_autosell_fish(self, user_id):
+        """
+        Empty the user's autosell list.
+
+        :param user_id: The ID of the user.
+        :return: (success, message) tuple.
+        """
+        removed = self.storage.clear_autosell(user_id)
+        if not removed:
+            return False, "Autosell list is already empty."
+        return True, f"Cleared {removed} fish from your autosell list."
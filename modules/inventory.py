@@ -1,190 +1,220 @@
-import os
-import random
-import json
-import sys
+import threading
+from collections import Counter, OrderedDict
 from thefuzz import process, fuzz
 
-from util.database import DatabaseConnection
-from util.config import get_config_path
+from util.game_data import CASE_ODDS
+from util.metrics import cache_requests
 from util.module_registry import module_registry
+from util.storage import get_storage
+from modules.catalog import Catalog
 from modules.economy import Economy
 
 class Inventory:
-    load_after = ["economy"]  # Load after the economy module
+    load_after = ["catalog", "economy"]  # Load after the catalog and economy modules
+    cache_size = 1024  # Number of users whose inventory is kept in memory
     
     def __init__(self):
-        appdata_dir = os.path.dirname(get_config_path())
-        cases_path = os.path.join(appdata_dir, "cases.json") if hasattr(sys, '_MEIPASS') else os.path.join("modules", "data", "cases.json")
-        items_path = os.path.join(appdata_dir, "fish.json") if hasattr(sys, '_MEIPASS') else os.path.join("modules", "data", "fish.json")
-        shop_path = os.path.join(appdata_dir, "shop.json") if hasattr(sys, '_MEIPASS') else os.path.join("modules", "data", "shop.json")
-        try:
-            with open(cases_path, mode="r", encoding="utf-8") as file:
-                case_data = json.load(file)
-                self.case = {}
-                for item in case_data:
-                    self.case[item["name"]] = item
-        except Exception as e:
-            raise Exception(f"Error loading cases: {e}")
-        try:
-            with open(items_path, mode="r", encoding="utf-8") as file:
-                items_data = json.load(file)
-                self.items = {}
-                for item in items_data:
-                    self.items[item["name"]] = item
-        except Exception as e:
-            raise Exception(f"Error loading items: {e}")
-        try:
-            with open(shop_path, mode="r", encoding="utf-8") as file:
-                shop_data = json.load(file)
-                self.shop = {}
-                for category in shop_data.values():
-                    for item in category:
-                        self.shop[item["name"]] = item
-        except Exception as e:
-            raise Exception(f"Error loading shop data: {e}")
+        self.catalog: Catalog = module_registry.get_module("catalog")
         
         self.economy: Economy = module_registry.get_module("economy")
+        self.storage = get_storage()
+
+        # Read-through cache of user -> [(item_name, quantity)], least recently used first
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._invalidations = 0  # Bumped on every invalidation so stale reads are not cached
+
+    # Catalog views; read through the catalog so they follow reloads
+
+    @property
+    def case(self):
+        """Cases by name."""
+        return self.catalog.cases
+
+    @property
+    def items(self):
+        """fish.json entries by name."""
+        return self.catalog.fish_by_name
+
+    @property
+    def shop(self):
+        """Shop items by name."""
+        return self.catalog.shop_items
+
+    def get_item_data(self, item_name):
+        """Return the catalog data for an item name, or None for unknown items."""
+        return self.catalog.get_item_data(item_name)
+
+    def get_inventory(self, user_id):
+        """
+        Get the user's inventory, loading it with one query on a cache miss.
+
+        :param user_id: The ID of the user.
+        :return: List of (item_name, quantity) tuples.
+        """
+        with self._cache_lock:
+            items = self._cache.get(user_id)
+            if items is not None:
+                self._cache.move_to_end(user_id)
+            invalidations = self._invalidations
+        if items is not None:
+            cache_requests.inc("inventory", "hit")
+            return items
+
+        cache_requests.inc("inventory", "miss")
+        items = self.storage.get_inventory(user_id)
+        with self._cache_lock:
+            # Skip caching if an invalidation raced with the read
+            if invalidations == self._invalidations:
+                self._cache[user_id] = items
+                self._cache.move_to_end(user_id)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return items
+
+    def invalidate(self, *user_ids):
+        """
+        Drop cached inventories. Call after changing inventories without this module.
+
+        Inside a storage transaction they are dropped again when it ends, since another
+        thread's cache miss may load the rows from before the commit in the meantime.
+
+        :param user_ids: The IDs of the users whose inventory changed.
+        """
+        self._drop(user_ids)
+        self.storage.after_transaction(lambda: self._drop(user_ids))
+
+    def _drop(self, user_ids):
+        with self._cache_lock:
+            self._invalidations += 1
+            for user_id in user_ids:
+                self._cache.pop(user_id, None)
 
     def add_item(self, user_id, item_name, quantity=1):
         """Add an item to the user's inventory."""
-        with DatabaseConnection() as cursor:
-            cursor.execute("""
-                INSERT INTO user_inventory (user_id, item_name, quantity)
-                VALUES (%s, %s, %s)
-                ON CONFLICT(user_id, item_name) DO UPDATE SET quantity = user_inventory.quantity + %s
-            """, (user_id, item_name, quantity, quantity))
+        try:
+            self.storage.add_item(user_id, item_name, quantity)
+        finally:
+            self.invalidate(user_id)
         return f"Added {quantity} x {item_name} to {user_id}'s inventory."
 
     def remove_item(self, user_id, item_name, quantity=1):
         """Remove an item from the user's inventory."""
-        with DatabaseConnection() as cursor:
-            cursor.execute("""
-                SELECT quantity FROM user_inventory
-                WHERE user_id = %s AND item_name ILIKE %s
-            """, (user_id, item_name))
-            result = cursor.fetchone()
-            if not result or result[0] < quantity:
-                return f"Not enough {item_name} in inventory to remove."
-            
-            cursor.execute("""
-                UPDATE user_inventory
-                SET quantity = quantity - %s
-                WHERE user_id = %s AND item_name = %s
-            """, (quantity, user_id, item_name))
-            cursor.execute("""
-                DELETE FROM user_inventory
-                WHERE user_id = %s AND item_name = %s AND quantity <= 0
-            """, (user_id, item_name))
+        try:
+            removed = self.storage.remove_item(user_id, item_name, quantity)
+        finally:
+            self.invalidate(user_id)
+        if not removed:
+            return f"Not enough {item_name} in inventory to remove."
         return f"Removed {quantity} x {item_name} from {user_id}'s inventory."
 
     def get_item_by_type(self, playername, item_type):
         """Get items of a specific type from the user's inventory."""
-        with DatabaseConnection() as cursor:
-            cursor.execute("""
-                SELECT item_name, quantity FROM user_inventory
-                WHERE user_id = %s
-            """, (playername,))
-            items = cursor.fetchall()
-        if not items:
+        names = self.catalog.names_by_type.get(item_type.lower())
+        if not names:
             return None
-        found_items = []
-        for item in items:
-            item_name = item[0]
-            item_data = self.shop.get(item_name) or (self.items).get(item_name)
-            quantity = item[1]
-            item_type_value = item_data.get("type")
-            if item_type_value and item_type_value.lower() == item_type.lower():
-                found_items.append((item_name, item_data, quantity))
+        # Unknown items (e.g. removed from the catalogs) are not in the index and are skipped
+        found_items = [(item_name, self.catalog.items[item_name]["data"], quantity)
+                       for item_name, quantity in self.get_inventory(playername) if item_name in names]
 
         if not found_items:
             return None
         return found_items
 
+    def get_best_item_by_type(self, playername, item_type, attribute, highest=True):
+        """
+        Get the user's best item of a type, e.g. the equipped rod or sack.
+
+        :param playername: The name of the player.
+        :param item_type: The item type ("rod", "sack", ...).
+        :param attribute: The attribute the items are ranked by.
+        :param highest: Whether a higher attribute value is better.
+        :return: (item_name, item_data, quantity), or None if the user has no such item.
+        """
+        items = [item for item in self.get_item_by_type(playername, item_type) or ()
+                 if attribute in item[1].get("attributes", {})]
+        if not items:
+            return None
+        rank = lambda item: item[1]["attributes"][attribute]
+        return max(items, key=rank) if highest else min(items, key=rank)
+
     def list_inventory(self, user_id):
         """List all items in the user's inventory."""
-        with DatabaseConnection() as cursor:
-            cursor.execute("""
-                SELECT item_name, quantity FROM user_inventory
-                WHERE user_id = %s
-            """, (user_id,))
-            items = cursor.fetchall()
+        items = self.get_inventory(user_id)
         if not items:
             return None
         return [{'name': item[0],'quantity': item[1]} for item in items]
 
-    def open_case(self, user_id, case_name):
-        """Open a case and add a random item to the user's inventory."""
-        if case_name:
-            user_inv = self.list_inventory(user_id)
-
-            # check if has case
-            if not any(case_name.lower() in item['name'].lower() for item in user_inv):
-                return f"You don't have a {case_name} to open."
-            
-            # check if case is valid
-            valid_cases = [case["name"] for case in self.cases]
-            if case_name not in valid_cases:
-                return f"{case_name} is not a valid case."
-            
-            # open the case
-            # get first case whose ["name"] matches case_name
-            case = next((case for case in self.cases if case["name"] == case_name), None)
-
-            # milspec, restricted, classified, covert, and special
-            rarities = [.7995, .15, .042, .006, .0025]
-
-            rarity = random.choices(
-                ["mil-spec", "restricted", "classified", "covert", "exceedingly-rare"],
-                weights=rarities,
-                k=1
-            )[0]
-
-            item = random.choice(case["items"][rarity])
-
-            # remove case from inventory
-            self.remove_item(user_id, case_name, 1)
-            
-            self.economy.add_balance(user_id, item['price'])
-            return f"You opened a {case_name} and got a {item['name']} worth {item['price']}! You sell it and pocket the change."
+    def open_case(self, user_id, case_name, count=1):
+        """
+        Open cases from the user's inventory and sell what they drop.
 
-        else:
-            # open the first case in the inventory
-            user_inv = self.list_inventory(user_id)
+        Drops come from the case's precompiled alias table, and the cases are removed
+        and the payout credited in one transaction.
+
+        :param user_id: The ID of the user.
+        :param case_name: The case to open (case-insensitive), or None for the first case in the inventory.
+        :param count: How many to open.
+        :return: The result message, or None if no case name was given and the user has no cases.
+        """
+        user_inv = self.list_inventory(user_id)
+        if not case_name:
             if not user_inv:
                 return f"Rummaging through your inventory, you find nothing but dust."
-            
-            # find first item that has "Case" in it
-            case_name = next((item['name'] for item in user_inv if "Case" in item['name']), None)
-
+            # open the first case in the inventory
+            case_name = next((item['name'] for item in user_inv if item['name'] in self.case), None)
             if not case_name:
                 return None
-            return self.open_case(user_id, case_name)
+
+        data = self.catalog.aliases.get(case_name.lower())
+        if data is None or data["name"] not in self.case:
+            return f"{case_name} is not a valid case."
+        case_name = data["name"]
+
+        # check if has enough cases
+        owned = next((item['quantity'] for item in user_inv or () if item['name'].lower() == case_name.lower()), 0)
+        if owned == 0:
+            return f"You don't have a {case_name} to open."
+        if count < 1:
+            return "Invalid quantity."
+        if count > owned:
+            return f"You only have {owned} x {case_name}."
+
+        drops = self.catalog.case_tables[case_name].draw_many(count)
+        payout = round(sum(item['price'] for _, item in drops), 2)
+        try:
+            balance = self.storage.redeem_item(user_id, case_name, count, payout)
+        finally:
+            self.invalidate(user_id)
+        if balance is None:
+            return f"You don't have a {case_name} to open."
+
+        if count == 1:
+            item = drops[0][1]
+            return f"You opened a {case_name} and got a {item['name']} worth {item['price']}! You sell it and pocket the change."
+        tiers = Counter(tier for tier, _ in drops)
+        best = max((item for _, item in drops), key=lambda item: item['price'])
+        summary = ", ".join(f"{tiers[tier]} {tier}" for tier in CASE_ODDS if tiers[tier])
+        return (f"You opened {count} x {case_name} and got {summary}, the best a {best['name']} worth {best['price']}! "
+                f"You sell everything for ${payout}.")
 
     def get_item_by_name(self, user_id, item_name):
         """Get an item by its name from the user's inventory."""
-        with DatabaseConnection() as cursor:
-            cursor.execute("""
-                SELECT item_name, quantity FROM user_inventory
-                WHERE user_id = %s AND item_name ILIKE %s
-            """, (user_id, item_name))
-            result = cursor.fetchone()
+        items = self.get_inventory(user_id)
+        # Exact name first, then case-insensitive, like Storage.get_item
+        result = next((item for item in items if item[0] == item_name), None) or \
+            next((item for item in items if item[0].lower() == item_name.lower()), None)
         if not result:
             return None
         return {
             "name": result[0],
-            "data": self.shop.get(result[0]) or self.items.get(result[0]),
+            "data": self.get_item_data(result[0]),
             "quantity": result[1]
         }
 
     def get_item_by_name_fuzzy(self, user_id, item_name):
         """Get an item by its name from the user's inventory using fuzzy matching."""
-        with DatabaseConnection() as cursor:
-            cursor.execute("""
-                SELECT item_name FROM user_inventory
-                WHERE user_id = %s
-            """, (user_id,))
-            items = cursor.fetchall()
-        
+        items = self.get_inventory(user_id)
         if not items:
             return None
         
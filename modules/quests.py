@@ -1,250 +1,155 @@
-import json
-import os
 from datetime import datetime, timedelta
-from psycopg2.extras import RealDictCursor
 import random
-from util.database import get_connection, return_connection
+from util.module_registry import module_registry
+from util.storage import get_storage
 
 class QuestModule:
+    load_after = ["catalog", "inventory"]  # Load after the catalog and inventory modules
+
     def __init__(self):
-        # Load quest data
-        quest_file = os.path.join(os.path.dirname(__file__), 'data', 'quests.json')
-        with open(quest_file, 'r') as f:
-            self.all_quests = json.load(f)
+        self.catalog = module_registry.get_module("catalog")
+        self.storage = get_storage()
+        self.inventory = module_registry.get_module("inventory")  # Inventory reads go through its cache
     
+    @property
+    def all_quests(self):
+        """Quests from the catalog (follows catalog reloads)."""
+        return self.catalog.quests
+
     def get_daily_quest(self, user_id):
         """Get or assign the current daily quest for a user using weighted random selection."""
-        conn = get_connection()
-        try:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                # Check if user has an active daily quest
-                cur.execute("""
-                    SELECT quest_id, assigned_at, completed
-                    FROM daily_quests
-                    WHERE user_id = %s
-                    ORDER BY assigned_at DESC
-                    LIMIT 1
-                """, (user_id,))
-                
-                result = cur.fetchone()
-                
-                # If no quest or quest is expired (>24h) or already completed, assign new one
-                if not result or result['completed'] or \
-                   (datetime.now() - result['assigned_at']) > timedelta(hours=24):
-                    # Pick a weighted random quest
-                    weights = [q['weight'] for q in self.all_quests]
-                    new_quest = random.choices(self.all_quests, weights=weights, k=1)[0]
-                    
-                    cur.execute("""
-                        INSERT INTO daily_quests (user_id, quest_id, assigned_at, completed)
-                        VALUES (%s, %s, %s, FALSE)
-                    """, (user_id, new_quest['id'], datetime.now()))
-                    conn.commit()
-                    
-                    return new_quest
-                else:
-                    # Return existing active quest
-                    quest_id = result['quest_id']
-                    return next((q for q in self.all_quests if q['id'] == quest_id), None)
-        finally:
-            return_connection(conn)
+        return self._current_daily_quest(user_id)[0]
+
+    def get_daily_quest_status(self, user_id):
+        """
+        Get or assign the current daily quest, with the time until it resets.
+
+        :return: (quest or None, time remaining or None), from one read of the quest record.
+        """
+        quest, result = self._current_daily_quest(user_id)
+        return quest, self._time_until_reset(result) if quest else None
+
+    def _current_daily_quest(self, user_id):
+        """
+        Get or assign the current daily quest.
+
+        :return: (quest or None, the user's latest quest record), the record of the new
+                 quest if one was assigned.
+        """
+        # Check if user has an active daily quest
+        result = self.storage.get_latest_daily_quest(user_id)
+        
+        # If no quest or quest is expired (>24h) or already completed, assign new one
+        if not result or result['completed'] or \
+           (datetime.now() - result['assigned_at']) > timedelta(hours=24):
+            # Pick a weighted random quest
+            weights = [q['weight'] for q in self.all_quests]
+            new_quest = random.choices(self.all_quests, weights=weights, k=1)[0]
+            
+            assigned_at = datetime.now()
+            self.storage.assign_daily_quest(user_id, new_quest['id'], assigned_at)
+            
+            return new_quest, {"quest_id": new_quest['id'], "assigned_at": assigned_at, "completed": False}
+        else:
+            # Return existing active quest
+            quest_id = result['quest_id']
+            return next((q for q in self.all_quests if q['id'] == quest_id), None), result
+
+    @staticmethod
+    def _time_until_reset(result):
+        """Time remaining until a quest record's 24h window ends, or None if it has."""
+        time_elapsed = datetime.now() - result['assigned_at']
+        time_remaining = timedelta(hours=24) - time_elapsed
+
+        if time_remaining.total_seconds() <= 0:
+            return None
+
+        return time_remaining
     
     def get_time_until_next_quest(self, user_id):
         """Get time remaining until user can get a new quest."""
-        conn = get_connection()
-        try:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("""
-                    SELECT assigned_at, completed
-                    FROM daily_quests
-                    WHERE user_id = %s
-                    ORDER BY assigned_at DESC
-                    LIMIT 1
-                """, (user_id,))
-                
-                result = cur.fetchone()
-                
-                if not result:
-                    return None  # No previous quest, can get one now
-                
-                if result['completed']:
-                    # Calculate time until 24h from completion
-                    time_elapsed = datetime.now() - result['assigned_at']
-                    time_remaining = timedelta(hours=24) - time_elapsed
-                    
-                    if time_remaining.total_seconds() <= 0:
-                        return None  # Can get new quest now
-                    
-                    return time_remaining
-                
-                return None  # Has active uncompleted quest
-        finally:
-            return_connection(conn)
+        result = self.storage.get_latest_daily_quest(user_id)
+        
+        if not result:
+            return None  # No previous quest, can get one now
+        
+        if result['completed']:
+            # Calculate time until 24h from completion
+            time_elapsed = datetime.now() - result['assigned_at']
+            time_remaining = timedelta(hours=24) - time_elapsed
+            
+            if time_remaining.total_seconds() <= 0:
+                return None  # Can get new quest now
+            
+            return time_remaining
+        
+        return None  # Has active uncompleted quest
 
     def get_time_until_daily_reset(self, user_id):
         """Get time remaining until the current daily quest window resets."""
-        conn = get_connection()
-        try:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("""
-                    SELECT assigned_at
-                    FROM daily_quests
-                    WHERE user_id = %s
-                    ORDER BY assigned_at DESC
-                    LIMIT 1
-                """, (user_id,))
+        result = self.storage.get_latest_daily_quest(user_id)
 
-                result = cur.fetchone()
+        if not result:
+            return None
 
-                if not result:
-                    return None
-
-                time_elapsed = datetime.now() - result['assigned_at']
-                time_remaining = timedelta(hours=24) - time_elapsed
-
-                if time_remaining.total_seconds() <= 0:
-                    return None
-
-                return time_remaining
-        finally:
-            return_connection(conn)
+        return self._time_until_reset(result)
     
     def check_requirements(self, user_id, requirements):
-        """Check if user has all required items/fish."""
-        conn = get_connection()
-        try:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                for req in requirements:
-                    item_name = req['name']
-                    required_qty = req['quantity']
-                    
-                    # Check in caught_fish (sack)
-                    cur.execute("""
-                        SELECT COUNT(*) as count
-                        FROM caught_fish
-                        WHERE user_id = %s AND name = %s
-                    """, (user_id, item_name))
-                    fish_count = cur.fetchone()['count']
-                    
-                    # Check in user_inventory
-                    cur.execute("""
-                        SELECT quantity
-                        FROM user_inventory
-                        WHERE user_id = %s AND item_name = %s
-                    """, (user_id, item_name))
-                    inv_result = cur.fetchone()
-                    inv_count = inv_result['quantity'] if inv_result else 0
-                    
-                    total = fish_count + inv_count
-                    
-                    if total < required_qty:
-                        return False, item_name, total, required_qty
-                
-                return True, None, None, None
-        finally:
-            return_connection(conn)
+        """Check if user has all required items/fish, counting the sack and inventory in one query."""
+        counts = self.storage.count_quest_items(user_id, [req['name'] for req in requirements])
+        for req in requirements:
+            item_name = req['name']
+            required_qty = req['quantity']
+            total = counts[item_name]
+            
+            if total < required_qty:
+                return False, item_name, total, required_qty
+        
+        return True, None, None, None
     
     def remove_items(self, user_id, requirements):
-        """Remove required items from user's inventory/sack."""
-        conn = get_connection()
+        """
+        Remove required items from user's inventory/sack, fish first.
+
+        :return: False, without removing anything, if the user has too few of an item.
+        """
+        quantities = {}
+        for req in requirements:
+            quantities[req['name']] = quantities.get(req['name'], 0) + req['quantity']
         try:
-            with conn.cursor() as cur:
-                for req in requirements:
-                    item_name = req['name']
-                    qty_needed = req['quantity']
-                    
-                    # Remove from caught_fish first
-                    cur.execute("""
-                        DELETE FROM caught_fish
-                        WHERE id IN (
-                            SELECT id FROM caught_fish
-                            WHERE user_id = %s AND name = %s
-                            LIMIT %s
-                        )
-                        RETURNING id
-                    """, (user_id, item_name, qty_needed))
-                    removed_from_fish = len(cur.fetchall())
-                    
-                    qty_remaining = qty_needed - removed_from_fish
-                    
-                    # Remove rest from inventory if needed
-                    if qty_remaining > 0:
-                        cur.execute("""
-                            UPDATE user_inventory
-                            SET quantity = quantity - %s
-                            WHERE user_id = %s AND item_name = %s
-                        """, (qty_remaining, user_id, item_name))
-                        
-                        # Clean up zero quantity items
-                        cur.execute("""
-                            DELETE FROM user_inventory
-                            WHERE user_id = %s AND quantity <= 0
-                        """, (user_id,))
-                
-                conn.commit()
+            return self.storage.take_quest_items(user_id, quantities)
         finally:
-            return_connection(conn)
+            self.inventory.invalidate(user_id)
     
     def claim_daily_quest(self, user_id):
-        """Attempt to claim the daily quest reward."""
-        quest = self.get_daily_quest(user_id)
-        if not quest:
-            return False, "No daily quest available."
-        
-        # Check if already completed
-        conn = get_connection()
-        try:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("""
-                    SELECT completed FROM daily_quests
-                    WHERE user_id = %s AND quest_id = %s
-                    ORDER BY assigned_at DESC
-                    LIMIT 1
-                """, (user_id, quest['id']))
-                result = cur.fetchone()
-                
-                if result and result['completed']:
-                    time_remaining = self.get_time_until_daily_reset(user_id)
-                    if time_remaining:
-                        total_seconds = int(time_remaining.total_seconds())
-                        hours = total_seconds // 3600
-                        minutes = (total_seconds % 3600) // 60
-                        return False, f"Daily quest already completed. New quest in {hours}h {minutes}m."
-                    return False, "Daily quest already completed. New quest available now."
-        finally:
-            return_connection(conn)
-        
-        # Check requirements
-        has_items, missing_item, has_qty, needs_qty = self.check_requirements(
-            user_id, quest['requirements']
-        )
-        
-        if not has_items:
-            return False, f"Missing items: need {needs_qty}x {missing_item}, you have {has_qty}."
-        
-        # Remove items and give reward
-        self.remove_items(user_id, quest['requirements'])
-        
-        conn = get_connection()
-        try:
-            with conn.cursor() as cur:
-                # Give money reward
-                cur.execute("""
-                    INSERT INTO user_balances (user_id, balance)
-                    VALUES (%s, %s)
-                    ON CONFLICT (user_id)
-                    DO UPDATE SET balance = user_balances.balance + %s
-                """, (user_id, quest['reward_money'], quest['reward_money']))
-                
-                # Mark as completed
-                cur.execute("""
-                    UPDATE daily_quests
-                    SET completed = TRUE, completed_at = %s
-                    WHERE user_id = %s AND quest_id = %s
-                """, (datetime.now(), user_id, quest['id']))
-                
-                conn.commit()
-        finally:
-            return_connection(conn)
+        """Attempt to claim the daily quest reward; the whole claim runs in one transaction."""
+        with self.storage.transaction():
+            quest, result = self._current_daily_quest(user_id)
+            if not quest:
+                return False, "No daily quest available."
+            
+            # Check if already completed
+            if result['quest_id'] == quest['id'] and result['completed']:
+                time_remaining = self._time_until_reset(result)
+                if time_remaining:
+                    total_seconds = int(time_remaining.total_seconds())
+                    hours = total_seconds // 3600
+                    minutes = (total_seconds % 3600) // 60
+                    return False, f"Daily quest already completed. New quest in {hours}h {minutes}m."
+                return False, "Daily quest already completed. New quest available now."
+            
+            # Check requirements
+            has_items, missing_item, has_qty, needs_qty = self.check_requirements(
+                user_id, quest['requirements']
+            )
+            
+            if not has_items:
+                return False, f"Missing items: need {needs_qty}x {missing_item}, you have {has_qty}."
+            
+            # Remove items, give reward and mark as completed
+            if not self.remove_items(user_id, quest['requirements']):
+                return False, "Missing items: they were used up before the quest could be claimed."
+            self.storage.add_balance(user_id, quest['reward_money'])
+            self.storage.complete_daily_quest(user_id, quest['id'], datetime.now())
         
         return True, f"Quest completed! Earned ${quest['reward_money']:,}"
@@ -1,38 +1,37 @@
-import os
-import json
-import sys
 from thefuzz import process, fuzz
 
-from util.config import get_config_path
+from util.metrics import cache_requests
 from util.module_registry import module_registry
+from util.storage import get_storage
+from modules.catalog import Catalog
 from modules.economy import Economy
 from modules.inventory import Inventory
 
 class Shop:
-    load_after = ["economy", "inventory"]  # Load after the economy and inventory modules
+    load_after = ["catalog", "economy", "inventory"]  # Load after the catalog, economy and inventory modules
+    listing_cache_size = 4096
     
     def __init__(self):
-        appdata_dir = os.path.dirname(get_config_path())
-        shop_path = os.path.join(appdata_dir, "shop.json") if hasattr(sys, '_MEIPASS') else os.path.join("modules", "data", "shop.json")
-        try:
-            with open(shop_path, mode="r", encoding="utf-8") as file:
-                self.shop = json.load(file)
-        except Exception as e:
-            raise Exception(f"Error loading shop: {e}")
+        self.catalog: Catalog = module_registry.get_module("catalog")
         self.economy: Economy = module_registry.get_module("economy")
         self.inventory: Inventory = module_registry.get_module("inventory")
-
-        self.load_shop_categories()
+        self.storage = get_storage()
+        self._listings = (None, {})  # (catalog version, {(category, owned signature): listing})
 
     def find_category(self, item_name, categories):
         """Find the category of an item by its name."""
+        # Exact names and aliases in one lookup
+        data = self.catalog.aliases.get(item_name.lower())
+        entry = self.catalog.items.get(data["name"]) if data else None
+        if entry and entry["category"] in categories:
+            return entry["category"]
+
         for category, items in categories.items():
-            for item in items:
-                if item["name"].lower() == item_name.lower() or item_name.lower() in [alias.lower() for alias in item.get("aliases", [])]:
-                    return category
-                best_match, score = process.extractOne(item_name.lower(), [i["name"].lower() for i in items], scorer=fuzz.ratio)
-                if best_match and score >= 80:
-                    return category
+            if not items:
+                continue
+            best_match, score = process.extractOne(item_name.lower(), [i["name"].lower() for i in items], scorer=fuzz.ratio)
+            if best_match and score >= 80:
+                return category
 
         return None
 
@@ -79,7 +78,7 @@ class Shop:
             return {"error": "The shopkeeper sighs and says: 'I don't have that item.'"}
 
         allowed_items = self.get_shop_items(playername, category)
-        if type(allowed_items) == dict and "error" in allowed_items.keys():
+        if "error" in allowed_items:
             return allowed_items
 
         # Find the item using the new find_item method
@@ -95,112 +94,123 @@ class Shop:
             if trying_to_buy.get("max") is not None and quantity > trying_to_buy["max"]:
                 return {"error": f"You can only have {trying_to_buy['max']} of this item at a time."}
 
-        # Check if the player has enough money
-        player_money = self.economy.get_balance(playername)
-        if player_money < trying_to_buy["price"] * quantity:
-            return {"error": "The shopkeeper says: 'Isn't that too rich for your blood?'"}
-
-        # Add the item to the player's inventory
+        # Pay, add the item and remove what it replaces in one transaction
+        cost = round(trying_to_buy["price"] * quantity, 2)
+        replaces = trying_to_buy.get("replaces") or []
+        if isinstance(replaces, str):
+            replaces = [replaces]
         try:
-            self.economy.deduct_balance(playername, trying_to_buy["price"] * quantity)
-            money_left = self.economy.get_balance(playername)
-            self.inventory.add_item(playername, trying_to_buy["name"], trying_to_buy, quantity)
-            if trying_to_buy.get("replaces") is not None:
-                # Remove the replaced item from the inventory
-                if isinstance(trying_to_buy["replaces"], str):
-                    trying_to_buy["replaces"] = [trying_to_buy["replaces"]]
-                for replace in trying_to_buy["replaces"]:
-                    self.inventory.remove_item(playername, replace, quantity)
-            return {"success": f"You bought {f'{quantity} x' if quantity > 1 else 'a'} '{trying_to_buy['name']}'. Your new balance is ${money_left}."}
+            money_left = self.storage.purchase(playername, trying_to_buy["name"], cost, quantity,
+                                               replaces, trying_to_buy.get("max"))
         except Exception as e:
             return {"error": f"Error while processing the purchase: {e}"}
-                
-        
+        finally:
+            self.inventory.invalidate(playername)
 
-    def load_shop_categories(self):
-        """Load shop categories and items from the JSON file."""
-        self.categories = {}
-        for category, items in self.shop.items():
-            self.categories[category] = items
+        if money_left is None:
+            if self.economy.get_balance(playername) < cost:
+                return {"error": "The shopkeeper says: 'Isn't that too rich for your blood?'"}
+            return {"error": f"You can only have {trying_to_buy['max']} of this item at a time."}
+        return {"success": f"You bought {f'{quantity} x' if quantity > 1 else 'a'} '{trying_to_buy['name']}'. Your new balance is ${money_left}."}
+
+    @property
+    def shop(self):
+        """Shop items by category, from the catalog (follows catalog reloads)."""
+        return self.catalog.shop
+
+    @property
+    def categories(self):
+        """Shop categories and their items."""
+        return self.catalog.shop
 
     def get_categories(self):
         """Get the available categories in the shop."""
         return self.categories.keys()
 
     def get_shop_items(self, playername, category=None):
-        """Get the items in the shop, optionally filtered by category."""
-        category = category.lower() if category else None
-        chosen_category = None
-        for cat in self.categories.keys():
-            if cat.lower() == category:
-                chosen_category = cat
-                break
+        """Get the items in the shop the player may buy, optionally filtered by category."""
+        listing = self.get_shop_listing(playername, category)
+        if "error" in listing:
+            return listing
+        return {"items": list(listing["items"])}
+
+    def get_shop_listing(self, playername, category):
+        """
+        Get the items of a category the player may buy and the rendered listing.
+
+        Both depend only on the category and on the player's gear that matters to it
+        (see _owned_signature), so they are cached per catalog version under that key
+        and repeated `shop` calls are dictionary lookups.
+
+        :param playername: The name of the player.
+        :param category: The category, in any case.
+        :return: {"items": tuple of items, "text": the listing}, or {"error": message}.
+        """
+        data = self.catalog.data
+        chosen_category = data.shop_categories.get(category.lower()) if category else None
         if not chosen_category:
-            return {"error": "Category not found. Available categories: " + ", ".join(self.categories.keys())}
-        
-        items = self.categories[chosen_category]
-        if not items:
+            return {"error": "Category not found. Available categories: " + ", ".join(data.shop.keys())}
+        if not data.shop[chosen_category]:
             return {"error": "No items available in this category."}
 
-        items = self._add_allowed_count_to_shop(playername, items)
-        return {"items": items}
-
-    def _add_allowed_count_to_shop(self, playername, items):
-        """Add the allowed count to each item in the shop."""
-        inventory = self.inventory.list_inventory(playername)
-        if not inventory:
-            inventory = []
-        
-        # get the item names from the inventory
-        user_has = [item['name'] for item in inventory]
-
-        allowed_shop_items = []
-        stop_at_items = []
-        # see if any of the items replace anything (item["replaces"])
-        if any(item.get("replaces") is not None for item in items):
-            for item in reversed(items):
-                if item.get("name") in user_has:
-                    break
-                if item.get("name") in stop_at_items:
-                    break
-                if item.get("replaces") is not None:
-                    # check if the item is in the inventory
-                    if type(item["replaces"]) == str:
-                        if item["replaces"] in user_has:
-                            allowed_shop_items.append(item)
-                            stop_at_items.append(item["replaces"])
-                            continue
-                    else:
-                        # check if any of the items in the replaces list are in the inventory
-                        for replace in item["replaces"]:
-                            if replace in user_has:
-                                allowed_shop_items.append(item)
-                                stop_at_items.append(replace)
-                                break
-                else:
-                    # if the item is not in the inventory, add it to the allowed shop items
-                    allowed_shop_items.append(item)
+        inventory = self.inventory.get_inventory(playername) or []
+        key = (chosen_category, self._owned_signature(data, chosen_category, inventory))
+        cached_data, listings = self._listings
+        if cached_data is not data:
+            # New catalog version: prices and items may have changed
+            listings = {}
+            self._listings = (data, listings)
+        listing = listings.get(key)
+        if listing is not None:
+            cache_requests.inc("shop_listing", "hit")
+            return listing
+
+        cache_requests.inc("shop_listing", "miss")
+        items = self._allowed_items(data, chosen_category, inventory)
+        if not items:
+            listing = {"error": "The shopkeeper says: 'I don't have anything for you.'"}
         else:
-            # if no items replace anything, check for max count (item["max"])
-            for item in items:
-                if item not in user_has:
-                    allowed_shop_items.append(item)
-                    continue
-                if item.get("max") is not None:
-                    # get the allowed buy count (count_has - max)
-                    # inventory is an array of tuples (item_name, item_type, quantity)
-                    for i in inventory:
-                        if i[0] == item["name"]:
-                            count_has = i[2]
-                            break
-                    if count_has < item["max"]:
-                        allowed_shop_items.append(item)
-                        continue
-                    else:
-                        continue
-                else:
-                    allowed_shop_items.append(item)
-
-        if not allowed_shop_items:
-            return {"error": "The shopkeeper says: 'I don't have anything for you.'"}
-        return allowed_shop_items
\ No newline at end of file
+            listing = {"items": tuple(items), "text": self.render_listing(items)}
+        if len(listings) >= self.listing_cache_size:
+            listings.clear()
+        listings[key] = listing
+        return listing
+
+    def _owned_signature(self, data, category, inventory):
+        """
+        The part of an inventory that decides what a category offers: the owned items
+        in its upgrade graph, or the owned items with a max and whether they are at it.
+        """
+        graph = data.upgrade_graphs.get(category)
+        if graph is not None:
+            return frozenset(name for name, _ in inventory if graph.involves(name))
+        signature = []
+        for name, quantity in inventory:
+            entry = data.items.get(name)
+            if entry and entry["category"] == category and entry["data"].get("max") is not None:
+                signature.append((name, quantity >= entry["data"]["max"]))
+        return frozenset(signature)
+
+    def _allowed_items(self, data, category, inventory):
+        """The items of a category the player may buy."""
+        graph = data.upgrade_graphs.get(category)
+        if graph is not None:
+            return graph.allowed([name for name, _ in inventory])
+
+        # No upgrades: everything, except items the player already has the max of
+        owned = dict(inventory)
+        return [item for item in data.shop[category]
+                if item.get("max") is None or owned.get(item["name"], 0) < item["max"]]
+
+    def render_listing(self, items):
+        """Format shop items for chat."""
+        item_list = []
+        for item in items:
+            item_name = item["name"]
+            item_price = item["price"]
+            item_max = item.get("max", 1)
+            if item_max > 1:
+                item_list.append(f"{item_name} (${item_price:.2f}, max: {item_max})")
+            else:
+                item_list.append(f"{item_name} (${item_price:.2f})")
+        return ", ".join(item_list)
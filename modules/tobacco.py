@@ -1,31 +1,21 @@
-import json
-import os
-import sys
 from thefuzz import process, fuzz
 
-from util.config import get_config_path
 from util.module_registry import module_registry
+from modules.catalog import Catalog
 from modules.inventory import Inventory
 from modules.status_effects import StatusEffects
 
 class Tobacco:
-    load_after = ["inventory"]
+    load_after = ["catalog", "inventory", "status_effects"]
     def __init__(self):
-        self.tobacco_data = self.load_tobacco_data()
+        self.catalog: Catalog = module_registry.get_module("catalog")
         self.inventory: Inventory = module_registry.get_module("inventory")
         self.status_effects: StatusEffects = module_registry.get_module("status_effects")
     
-    def load_tobacco_data(self):
-        """
-        Load tobacco data from the configuration file.
-        """
-        appdata_dir = os.path.dirname(get_config_path())
-        tobacco_json_path = os.path.join(appdata_dir, "shop.json") if hasattr(sys, '_MEIPASS') else os.path.join("modules", "data", "shop.json")
-        try:
-            with open(tobacco_json_path, 'r', encoding='utf-8') as file:
-                return json.load(file)['Tobacco']
-        except FileNotFoundError:
-            return []
+    @property
+    def tobacco_data(self):
+        """Tobacco from the shop catalog (follows catalog reloads)."""
+        return self.catalog.shop.get("Tobacco", ())
 
     def find_tobacco(self, tobacco_name):
         """
@@ -34,13 +24,11 @@ class Tobacco:
         if self.tobacco_data is None:
             return None
         
-        # fuzz the tobacco name
-        tobacco_names = [tobacco["name"].lower() for tobacco in self.tobacco_data]
-        best_match = process.extractOne(tobacco_name.lower(), tobacco_names, scorer=fuzz.ratio)
+        # fuzz the tobacco name against the catalog's lowercase names
+        tobacco_by_name = self.catalog.by_lowercase_name.get("Tobacco", {})
+        best_match = process.extractOne(tobacco_name.lower(), tobacco_by_name.keys(), scorer=fuzz.ratio)
         if best_match and best_match[1] >= 80:
-            for tobacco in self.tobacco_data:
-                if tobacco["name"].lower() == best_match[0]:
-                    return tobacco
+            return tobacco_by_name[best_match[0]]
         
         return None
 
@@ -1,8 +1,8 @@
 """
 Trophy case module for displaying prized fish.
 """
-from util.database import DatabaseConnection
 from util.module_registry import module_registry
+from util.storage import get_storage
 
 
 class Trophy:
@@ -10,6 +10,10 @@ class Trophy:
     
     MAX_TROPHIES = 5
     
+    def __init__(self):
+        """Initialize the trophy module."""
+        self.storage = get_storage()
+    
     def add_trophy(self, user_id: str, fish_name: str) -> dict:
         """
         Add a fish to the trophy case from caught fish.
@@ -18,30 +22,16 @@ class Trophy:
         :param fish_name: The name of the fish to add
         :return: Result dictionary with success status and message
         """
-        with DatabaseConnection() as cursor:
-            # Check trophy count
-            cursor.execute("""
-                SELECT COUNT(*) FROM trophy_fish WHERE user_id = %s
-            """, (user_id,))
-            
-            trophy_count = cursor.fetchone()[0]
-            
-            if trophy_count >= self.MAX_TROPHIES:
+        # Check, move and delete in one transaction so the fish cannot be moved twice
+        with self.storage.transaction():
+            if self.storage.count_trophies(user_id) >= self.MAX_TROPHIES:
                 return {
                     "success": False,
                     "message": f"Trophy case is full! Remove a trophy first (max {self.MAX_TROPHIES})."
                 }
             
-            # Find the fish in caught_fish by name (case-insensitive, partial match)
-            cursor.execute("""
-                SELECT id, name, weight, price
-                FROM caught_fish
-                WHERE user_id = %s AND LOWER(name) LIKE LOWER(%s)
-                ORDER BY weight DESC
-                LIMIT 1
-            """, (user_id, f"%{fish_name}%"))
-            
-            fish = cursor.fetchone()
+            # Find the heaviest fish whose name matches (case-insensitive, partial match)
+            fish = self.storage.find_heaviest_fish(user_id, fish_name)
             
             if not fish:
                 return {
@@ -49,22 +39,13 @@ class Trophy:
                     "message": f"No fish matching '{fish_name}' found in your sack."
                 }
             
-            fish_id, name, weight, price = fish
-            
             # Move fish to trophy case
-            cursor.execute("""
-                INSERT INTO trophy_fish (user_id, name, weight, price)
-                VALUES (%s, %s, %s, %s)
-            """, (user_id, name, weight, price))
-            
-            # Remove from caught_fish
-            cursor.execute("""
-                DELETE FROM caught_fish WHERE id = %s
-            """, (fish_id,))
+            self.storage.add_trophy(user_id, fish["name"], fish["weight"], fish["price"])
+            self.storage.remove_fish(user_id, fish["id"])
             
             return {
                 "success": True,
-                "message": f"Added {name} ({weight:.2f} lbs) to your trophy case!"
+                "message": f"Added {fish['name']} ({fish['weight']:.2f} lbs) to your trophy case!"
             }
     
     def remove_trophy(self, user_id: str, trophy_number: int) -> dict:
@@ -75,16 +56,8 @@ class Trophy:
         :param trophy_number: The trophy number (1-5)
         :return: Result dictionary with success status and message
         """
-        with DatabaseConnection() as cursor:
-            # Get all trophies for the user
-            cursor.execute("""
-                SELECT id, name, weight, price
-                FROM trophy_fish
-                WHERE user_id = %s
-                ORDER BY added_at ASC
-            """, (user_id,))
-            
-            trophies = cursor.fetchall()
+        with self.storage.transaction():
+            trophies = self.storage.get_trophies(user_id)
             
             if not trophies:
                 return {
@@ -100,22 +73,14 @@ class Trophy:
             
             # Get the trophy to remove (0-indexed)
             trophy = trophies[trophy_number - 1]
-            trophy_id, name, weight, price = trophy
             
-            # Return fish to caught_fish
-            cursor.execute("""
-                INSERT INTO caught_fish (user_id, name, weight, price, bait)
-                VALUES (%s, %s, %s, %s, 0)
-            """, (user_id, name, weight, price))
-            
-            # Remove from trophy case
-            cursor.execute("""
-                DELETE FROM trophy_fish WHERE id = %s
-            """, (trophy_id,))
+            # Return fish to the sack and remove it from the trophy case
+            self.storage.add_fish(user_id, trophy["name"], trophy["weight"], trophy["price"])
+            self.storage.remove_trophy(user_id, trophy["id"])
             
             return {
                 "success": True,
-                "message": f"Removed {name} ({weight:.2f} lbs) from your trophy case."
+                "message": f"Removed {trophy['name']} ({trophy['weight']:.2f} lbs) from your trophy case."
             }
     
     def get_trophies(self, user_id: str) -> list:
@@ -125,15 +90,7 @@ class Trophy:
         :param user_id: The user's identifier
         :return: List of trophy fish tuples (name, weight, price)
         """
-        with DatabaseConnection() as cursor:
-            cursor.execute("""
-                SELECT name, weight, price
-                FROM trophy_fish
-                WHERE user_id = %s
-                ORDER BY added_at ASC
-            """, (user_id,))
-            
-            return cursor.fetchall()
+        return [(trophy["name"], trophy["weight"], trophy["price"]) for trophy in self.storage.get_trophies(user_id)]
 
 
 # Register the module
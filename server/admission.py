@@ -0,0 +1,162 @@
+"""Admission control and load shedding for incoming chat messages."""
+import threading
+import time
+from typing import Dict, Hashable, Iterable, Optional
+
+
+class TokenBucket:
+    """Token bucket holding up to `burst` tokens, refilled at `rate` tokens per second."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated_at")
+
+    def __init__(self, rate: float, burst: float, now: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = now
+
+    def take(self, now: float, cost: float = 1.0) -> float:
+        """
+        Try to take `cost` tokens.
+
+        :return: 0 if the tokens were taken, otherwise the seconds until enough tokens are available.
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def is_full(self, now: float) -> bool:
+        """Whether the bucket would be full at `now` (and can be forgotten)."""
+        return self.tokens + (now - self.updated_at) * self.rate >= self.burst
+
+
+class AdmissionController:
+    """
+    Decide whether a message may be processed before any database work happens.
+
+    Two checks are applied, both failing fast instead of queueing:
+
+    - a per-player token bucket limits how many commands each player may send;
+    - a bounded number of requests may be in flight at once. Expensive commands may
+      only use `max_in_flight - reserved_cheap` of the slots, so a flood of
+      `@sellall`/`@open` cannot starve cheap commands such as `@help` or `@bal`.
+    """
+
+    PRUNE_EVERY = 1024
+
+    def __init__(self, prefix: str = "@", max_in_flight: int = 32, reserved_cheap: int = 8,
+                 rate: float = 1.0, burst: float = 5.0, cheap_commands: Optional[Iterable[str]] = None,
+                 clock=time.monotonic) -> None:
+        """
+        Initialize the controller.
+
+        :param prefix: Command prefix; chat lines without it are never rate limited.
+        :param max_in_flight: Maximum number of messages processed at once.
+        :param reserved_cheap: Slots only available to cheap messages.
+        :param rate: Commands per second each player earns.
+        :param burst: Commands a player may send at once.
+        :param cheap_commands: Command names (and aliases) that are cheap to serve.
+        :param clock: Monotonic clock.
+        """
+        if rate <= 0:
+            raise ValueError("rate must be greater than 0.")
+        if burst < 1:
+            raise ValueError("burst must be at least 1.")
+        self.prefix = prefix
+        self.max_in_flight = max_in_flight
+        self.reserved_cheap = min(reserved_cheap, max_in_flight)
+        self.rate = rate
+        self.burst = burst
+        self.cheap_commands = {name.lower() for name in (cheap_commands or ())}
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._buckets: Dict[Hashable, TokenBucket] = {}
+        self._checks = 0
+        self.in_flight = 0
+        self.expensive_in_flight = 0
+        self.admitted = 0
+        self.rate_limited = 0
+        self.overloaded = 0
+
+    def is_command(self, chattext: str) -> bool:
+        """Whether the chat line is a command."""
+        return chattext.startswith(self.prefix)
+
+    def is_cheap(self, chattext: str) -> bool:
+        """Whether the chat line is cheap to serve (chatter or a cheap command)."""
+        if not self.is_command(chattext):
+            return True
+        command_name = chattext[len(self.prefix):].split(" ")[0].lower()
+        return command_name in self.cheap_commands
+
+    def check_rate(self, key: Hashable, chattext: str) -> float:
+        """
+        Apply the player's token bucket to a chat line.
+
+        :return: 0 if allowed, otherwise the number of seconds to wait before retrying.
+        """
+        if not self.is_command(chattext):
+            return 0.0
+        now = self.clock()
+        with self._lock:
+            self._checks += 1
+            if self._checks % self.PRUNE_EVERY == 0:
+                self._prune(now)
+
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, now)
+            retry_after = bucket.take(now)
+            if retry_after:
+                self.rate_limited += 1
+            return retry_after
+
+    def try_acquire(self, cheap: bool, count: int = 1) -> bool:
+        """
+        Reserve in-flight slots without waiting.
+
+        :param cheap: Whether the work is cheap and may use the reserved slots.
+        :param count: Number of slots (messages) to reserve.
+        :return: True if the slots were reserved; release them with `release`.
+        """
+        with self._lock:
+            if self.in_flight + count > self.max_in_flight:
+                self.overloaded += 1
+                return False
+            if not cheap and self.expensive_in_flight + count > self.max_in_flight - self.reserved_cheap:
+                self.overloaded += 1
+                return False
+            self.in_flight += count
+            if not cheap:
+                self.expensive_in_flight += count
+            self.admitted += count
+            return True
+
+    def release(self, cheap: bool, count: int = 1) -> None:
+        """Release slots reserved with `try_acquire`."""
+        with self._lock:
+            self.in_flight -= count
+            if not cheap:
+                self.expensive_in_flight -= count
+
+    def metrics(self) -> Dict[str, int]:
+        """Return admission counters."""
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "expensive_in_flight": self.expensive_in_flight,
+                "max_in_flight": self.max_in_flight,
+                "admitted": self.admitted,
+                "rate_limited": self.rate_limited,
+                "overloaded": self.overloaded,
+                "tracked_players": len(self._buckets),
+            }
+
+    def _prune(self, now: float) -> None:
+        """Forget buckets that have refilled completely. Caller must hold the lock."""
+        for key in [key for key, bucket in self._buckets.items() if bucket.is_full(now)]:
+            del self._buckets[key]
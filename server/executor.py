@@ -0,0 +1,119 @@
+"""Keyed executor that serializes work per player while running different players in parallel."""
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Hashable, Tuple
+
+_Task = Tuple[Future, Callable, tuple, dict, bool]
+
+
+class KeyedExecutor:
+    """
+    Run tasks submitted under the same key one at a time, in submission order,
+    while tasks for different keys run in parallel on a shared worker pool.
+
+    Each key gets a lane (a FIFO of pending tasks). A lane is scheduled on the
+    pool while it has work; after each task it goes to the back of the ready
+    queue, so a player with a long backlog cannot monopolize the workers.
+    Lanes whose next task is urgent are picked before all other ready lanes.
+    """
+
+    def __init__(self, max_workers: int = 8) -> None:
+        """
+        Initialize the executor.
+
+        :param max_workers: Number of worker threads shared by all lanes.
+        """
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="lane")
+        self._lock = threading.Lock()
+        self._lanes: Dict[Hashable, Deque[_Task]] = {}
+        self._ready: Deque[Hashable] = deque()
+        self._ready_urgent: Deque[Hashable] = deque()
+        self._peak_depths: Dict[Hashable, int] = {}
+        self.submitted = 0
+        self.completed = 0
+        self.peak_depth = 0
+
+    def submit(self, key: Hashable, fn: Callable[..., Any], *args, urgent: bool = False, **kwargs) -> Future:
+        """
+        Queue fn(*args, **kwargs) on the lane for key.
+
+        :param key: Lane key, e.g. the resolved player identifier.
+        :param urgent: Run ahead of non-urgent work from other lanes once this task reaches the head of its lane.
+        :return: A Future for the task's result.
+        """
+        future = Future()
+        with self._lock:
+            lane = self._lanes.get(key)
+            start_lane = lane is None
+            if start_lane:
+                lane = self._lanes[key] = deque()
+            lane.append((future, fn, args, kwargs, urgent))
+            self.submitted += 1
+
+            depth = len(lane)
+            if depth > self._peak_depths.get(key, 0):
+                self._peak_depths[key] = depth
+            self.peak_depth = max(self.peak_depth, depth)
+
+            if start_lane:
+                self._schedule(key)
+        return future
+
+    def _schedule(self, key: Hashable) -> None:
+        """Mark a lane as ready and hand one unit of work to the pool. Caller must hold the lock."""
+        if self._lanes[key][0][4]:
+            self._ready_urgent.append(key)
+        else:
+            self._ready.append(key)
+        self._pool.submit(self._run_next)
+
+    def _run_next(self) -> None:
+        """Run the oldest task of the next ready lane, then reschedule the lane if it has more work."""
+        with self._lock:
+            key = self._ready_urgent.popleft() if self._ready_urgent else self._ready.popleft()
+            future, fn, args, kwargs, _ = self._lanes[key][0]
+
+        if future.set_running_or_notify_cancel():
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+        with self._lock:
+            lane = self._lanes[key]
+            lane.popleft()
+            self.completed += 1
+            if lane:
+                self._schedule(key)
+            else:
+                del self._lanes[key]
+                self._peak_depths.pop(key, None)
+
+    def lane_depths(self) -> Dict[Hashable, int]:
+        """Return the number of queued or running tasks per active lane."""
+        with self._lock:
+            return {key: len(lane) for key, lane in self._lanes.items()}
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return queue-depth metrics for the executor and each active lane."""
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "active_lanes": len(self._lanes),
+                "queued": sum(len(lane) for lane in self._lanes.values()),
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "peak_depth": self.peak_depth,
+                "lanes": {
+                    str(key): {"depth": len(lane), "peak_depth": self._peak_depths.get(key, 0)}
+                    for key, lane in self._lanes.items()
+                },
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting work and release the worker threads."""
+        self._pool.shutdown(wait=wait)
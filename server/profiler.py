@@ -0,0 +1,115 @@
+"""Statistical sampling profiler and per-call cProfile helper for the running server."""
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Tuple
+
+# Leaf frames of threads that are parked waiting for work
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("socketserver.py", "serve_forever"),
+    ("socket.py", "accept"),
+    ("handlers.py", "dequeue"),
+}
+
+
+class ProfilerBusy(Exception):
+    """Raised when a profile is requested while another one is running."""
+
+
+class SamplingProfiler:
+    """
+    Sample the stacks of every thread at a fixed interval and count collapsed stacks.
+
+    Samples are taken on the thread that calls `run` by reading
+    `sys._current_frames()`, so the profiled threads are not instrumented and
+    only give up the GIL briefly every `interval` seconds. This works the same
+    for Flask worker threads, execution lanes or an event loop thread. The
+    output is in the collapsed format read by flamegraph.pl and speedscope:
+    one `thread;outer;...;inner count` line per stack.
+
+    Only one profile runs at a time across all instances.
+    """
+
+    _running = threading.Lock()
+
+    def __init__(self, interval: float = 0.005, include_idle: bool = False) -> None:
+        """
+        Initialize the profiler.
+
+        :param interval: Seconds between samples.
+        :param include_idle: Also count threads parked in waits (idle workers, the accept loop).
+        """
+        self.interval = interval
+        self.include_idle = include_idle
+
+    @staticmethod
+    def _frame_label(frame) -> str:
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def _is_idle(self, frame) -> bool:
+        code = frame.f_code
+        return (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES
+
+    def sample(self, stacks: Counter, thread_names: Dict[int, str]) -> None:
+        """Take one sample of every other thread into `stacks`."""
+        own_id = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id or (not self.include_idle and self._is_idle(frame)):
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(self._frame_label(frame))
+                frame = frame.f_back
+            labels.append(thread_names.get(thread_id, str(thread_id)))
+            stacks[";".join(reversed(labels))] += 1
+
+    def run(self, duration: float) -> Tuple[Counter, int]:
+        """
+        Sample for `duration` seconds.
+
+        :return: (collapsed stack counts, number of samples taken).
+        :raises ProfilerBusy: If another profile is running.
+        """
+        if not self._running.acquire(blocking=False):
+            raise ProfilerBusy("A profile is already running.")
+        try:
+            stacks = Counter()
+            samples = 0
+            deadline = time.monotonic() + duration
+            while time.monotonic() < deadline:
+                # Thread names are looked up per sample so threads started mid-profile are named
+                thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+                self.sample(stacks, thread_names)
+                samples += 1
+                time.sleep(self.interval)
+            return stacks, samples
+        finally:
+            self._running.release()
+
+
+def collapsed(stacks: Counter) -> str:
+    """Render stack counts in the collapsed (folded) format, heaviest first."""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def profile_call(fn: Callable[..., Any], *args, sort: str = "cumulative", limit: int = 30, **kwargs) -> Tuple[Any, str]:
+    """
+    Run fn under cProfile.
+
+    :return: (fn's result, pstats report of the `limit` most expensive functions).
+    """
+    profiler = cProfile.Profile()
+    result = profiler.runcall(fn, *args, **kwargs)
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats(sort).print_stats(limit)
+    return result, output.getvalue()
@@ -1,16 +1,43 @@
 import os
 import sys
-import logging
-from flask import Flask, request, jsonify
-from typing import Dict, List
+import hmac
+import math
+import signal
+import time
+import threading
+from contextlib import nullcontext
+from flask import Flask, Response, g, request, jsonify
+from typing import Dict, List, Tuple
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from util.config import load_config, copy_files_to_appdata
+from util.async_logging import SAMPLED, setup_logger, logging_settings, stop_logging
 from util.commands import command_registry
 from util.module_registry import module_registry
-from util.database import initialize_pool, close_pool
+from util.database import initialize_pool, configure_instrumentation
+from util.storage import Storage, storage_from_config, set_storage
+from server.executor import KeyedExecutor
+from server.admission import AdmissionController
+from server.profiler import SamplingProfiler, ProfilerBusy, collapsed, profile_call
+from util.metrics import (
+    metrics_registry, request_duration, requests_total, message_duration,
+    command_duration, command_errors, module_duration, module_errors,
+)
+from util.request_context import command_context, track_queries
+
+# Maximum number of chat lines accepted by /process_messages in one request
+MAX_BATCH_SIZE = 64
+
+# Commands that are cheap to serve and get reserved capacity under load
+DEFAULT_CHEAP_COMMANDS = [
+    "help", "commands", "cmds",
+    "balance", "bal", "money",
+    "top", "leaderboard", "topplayers",
+    "inventory", "inv",
+    "sack", "bag",
+]
 
 
 def resource_path(relative_path):
@@ -23,40 +50,47 @@ def resource_path(relative_path):
 class BotServer:
     """Server that handles bot command and module processing."""
     
-    def __init__(self):
-        """Initialize the bot server."""
-        # Set up logging
-        self.logger = logging.getLogger(__name__)
-        self.logger.setLevel(logging.INFO)
-        
-        # File handler for logging to a file
-        file_handler = logging.FileHandler("bot_server.log")
-        file_handler.setLevel(logging.INFO)
-        file_formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-        file_handler.setFormatter(file_formatter)
-        
-        # Stream handler for logging to the console
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.INFO)
-        console_formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-        console_handler.setFormatter(console_formatter)
-        
-        # Add both handlers to the logger
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(console_handler)
+    def __init__(self, storage: Storage = None):
+        """
+        Initialize the bot server.
         
+        :param storage: Storage backend for game state; defaults to the [storage] backend in config.toml.
+        """
         # Load configuration
         self.config = load_config()
+        
+        # Set up logging; file and console writes happen on a background thread
+        self.logger = setup_logger(__name__, "bot_server.log", **logging_settings(self.config))
+        
         self.prefix = self.config.get("command_prefix", "@")
+        server_config = self.config.get("server", {})
+        workers = server_config.get("workers", 8)
         
-        # Initialize database connection pool
-        self.logger.info("Initializing database connection pool...")
+        # Initialize the storage backend, sizing the connection pool for the workers
+        if storage is None:
+            storage = storage_from_config(self.config)
+        self.storage = storage
+        set_storage(storage)
+        if storage.name == "postgres":
+            self.logger.info("Initializing database connection pool...")
+            try:
+                initialize_pool(maxconn=max(10, workers + 4))
+                self.logger.info("Database connection pool initialized successfully")
+            except Exception as e:
+                self.logger.error(f"Failed to initialize database pool: {e}")
+                raise
+        else:
+            self.logger.info(f"Using {storage.name} storage")
+        # Databases created by an older release lack the newer tables (e.g. autosell_fish)
         try:
-            initialize_pool()
-            self.logger.info("Database connection pool initialized successfully")
+            storage.migrate()
         except Exception as e:
-            self.logger.error(f"Failed to initialize database pool: {e}")
+            self.logger.error(f"Failed to migrate the {storage.name} database: {e}")
             raise
+        configure_instrumentation(
+            slow_query_ms=server_config.get("slow_query_ms", 100),
+            n_plus_one_threshold=server_config.get("n_plus_one_threshold", 5),
+        )
         
         # Initialize command and module registries
         self.commands = command_registry
@@ -64,20 +98,59 @@ class BotServer:
         self.modules = module_registry
         self.modules.set_logger(self.logger)
         
-        # Response queue for collecting responses during command execution
-        self._response_queue = []
+        # Per-thread request state (response queue, platform), since messages
+        # for different players are processed concurrently
+        self._request_state = threading.local()
+        
+        # Messages for the same player run in order on one lane, different players in parallel
+        self.executor = KeyedExecutor(max_workers=workers)
+        
+        # Admission control: bounded in-flight work and per-player rate limits
+        self.admission = AdmissionController(
+            prefix=self.prefix,
+            max_in_flight=server_config.get("max_in_flight", 32),
+            reserved_cheap=server_config.get("reserved_cheap", 8),
+            rate=server_config.get("rate_per_second", 1.0),
+            burst=server_config.get("rate_burst", 5),
+            cheap_commands=server_config.get("cheap_commands", DEFAULT_CHEAP_COMMANDS),
+        )
+        self._register_gauges()
+        
+        # Token required by /admin endpoints and request profiling; empty disables them
+        self.admin_token = server_config.get("admin_token", "")
         
         # Load commands and modules
         if hasattr(sys, '_MEIPASS'):
             copy_files_to_appdata()
             
+        # With lazy loading, commands and modules are imported on first use
+        self.lazy_loading = server_config.get("lazy_loading", False)
+        self.module_init_workers = server_config.get("module_init_workers", 1)
+        load_start = time.perf_counter()
         self.load_commands()
         self.load_modules()
+        self.log_import_report(time.perf_counter() - load_start)
+        
+        # Pick up edits to the game data files without a restart
+        self.catalog = self.modules.get_module("catalog") if "catalog" in self.modules.module_paths else None
+        reload_interval = server_config.get("catalog_reload_interval", 2.0)
+        if self.catalog is not None and reload_interval > 0:
+            self.catalog.watch(reload_interval)
+        
+    def shutdown(self):
+        """Finish the queued messages, close the storage and flush the log queues."""
+        self.logger.info("Shutting down bot server")
+        try:
+            self.executor.shutdown(wait=True)
+            self.storage.close()
+        finally:
+            # Last, so the shutdown itself is logged
+            stop_logging()
         
     def load_commands(self):
         """Load commands from the 'cmds' directory."""
         commands_dir = resource_path("cmds")
-        self.commands.load_commands(commands_dir)
+        self.commands.load_commands(commands_dir, lazy=self.lazy_loading)
         self.logger.info(f"Loaded {len(self.commands)} commands from {commands_dir}")
         
     def load_modules(self):
@@ -85,21 +158,94 @@ class BotServer:
         modules_dir = resource_path("modules")
         if not os.path.exists(modules_dir):
             return
-        self.modules.load_modules(modules_dir)
+        self.modules.load_modules(modules_dir, lazy=self.lazy_loading, workers=self.module_init_workers)
         self.logger.info(f"Loaded {len(self.modules)} modules from {modules_dir}")
         
-    def process_message(self, is_team: bool, playername: str, chattext: str) -> List[Dict]:
+    def import_report(self) -> List[Tuple[str, float]]:
+        """Return (file, seconds) for every command and module file imported so far, slowest first."""
+        base = resource_path("")
+        times = {**self.commands.import_times, **self.modules.import_times}
+        return sorted(((os.path.relpath(path, base), seconds) for path, seconds in times.items()),
+                      key=lambda entry: entry[1], reverse=True)
+        
+    def log_import_report(self, elapsed: float):
+        """Log how long loading took and the import and init time of each file, to catch startup regressions."""
+        report = self.import_report()
+        lines = "\n".join(f"  {seconds * 1000:8.1f} ms  {path}" for path, seconds in report)
+        self.logger.info(
+            "Loaded commands and modules in %.1f ms (%s); imported %d files in %.1f ms:\n%s",
+            elapsed * 1000, "lazy" if self.lazy_loading else "eager", len(report),
+            sum(seconds for _, seconds in report) * 1000, lines,
+        )
+        init_times = sorted(self.modules.init_times.items(), key=lambda entry: entry[1], reverse=True)
+        self.logger.info(
+            "Initialized %d modules (%d workers):\n%s", len(init_times), self.module_init_workers,
+            "\n".join(f"  {seconds * 1000:8.1f} ms  {name}" for name, seconds in init_times),
+        )
+        
+    def _register_gauges(self):
+        """Expose executor and admission state on /metrics."""
+        metrics_registry.gauge(
+            "bot_executor_tasks", "Execution lane tasks by state.", ["state"],
+            callback=lambda: {
+                (state,): value for state, value in self.executor.metrics().items() if state != "lanes"
+            },
+        )
+        metrics_registry.gauge(
+            "bot_admission", "Admission control counters and in-flight messages.", ["state"],
+            callback=lambda: {(state,): value for state, value in self.admission.metrics().items()},
+        )
+        
+    @property
+    def platform(self) -> str:
+        """Platform of the message being processed on the current thread."""
+        return getattr(self._request_state, "platform", "cs2")
+        
+    @platform.setter
+    def platform(self, platform: str) -> None:
+        self._request_state.platform = platform
+        
+    @property
+    def _response_queue(self) -> List[Dict]:
+        """Responses collected for the message being processed on the current thread."""
+        if not hasattr(self._request_state, "responses"):
+            self._request_state.responses = []
+        return self._request_state.responses
+        
+    @_response_queue.setter
+    def _response_queue(self, responses: List[Dict]) -> None:
+        self._request_state.responses = responses
+        
+    def submit_message(self, is_team: bool, playername: str, chattext: str, platform: str = "unknown", urgent: bool = False):
+        """Queue a message on its player's lane and return a Future for its (responses, query summary)."""
+        return self.executor.submit(playername, self.process_message_with_queries, is_team, playername, chattext, platform, urgent=urgent)
+        
+    def process_message(self, is_team: bool, playername: str, chattext: str, platform: str = None) -> List[Dict]:
         """Process a message and return list of responses."""
-        import time
-        start_time = time.time()
+        return self.process_message_with_queries(is_team, playername, chattext, platform)[0]
+        
+    def process_message_with_queries(self, is_team: bool, playername: str, chattext: str, platform: str = None) -> Tuple[List[Dict], Dict]:
+        """Process a message and return its responses and a summary of the database queries it issued."""
+        # Every module sees the same catalog version for the whole message, even if it is reloaded meanwhile
+        pinned = self.catalog.pinned() if self.catalog is not None else nullcontext()
+        with track_queries() as queries, pinned:
+            responses = self._process_message(is_team, playername, chattext, platform)
+        return responses, queries.summary()
+        
+    def _process_message(self, is_team: bool, playername: str, chattext: str, platform: str = None) -> List[Dict]:
+        """Run the modules and the command for a message and return the collected responses."""
+        start_time = time.perf_counter()
+        
+        if platform is not None:
+            self.platform = platform
         
         # Clear response queue for this message
         self._response_queue = []
         
         # Pass to modules that are reading input
-        module_start = time.time()
         for module_name, module_instance in self.modules.modules.items():
             if hasattr(module_instance, "process") and getattr(module_instance, "reading_input", True):
+                module_start = time.perf_counter()
                 try:
                     response = module_instance.process(playername, is_team, chattext)
                     if response:
@@ -108,37 +254,37 @@ class BotServer:
                             "text": f"{playername}: {response}"
                         })
                 except Exception as e:
-                    self.logger.error(f"Error in module '{module_name}' while processing: {e}")
-        module_time = time.time() - module_start
+                    module_errors.inc(module_name)
+                    self.logger.error("Error in module '%s' while processing: %s", module_name, e)
+                module_duration.observe(time.perf_counter() - module_start, module_name)
                     
         # Process commands if the line contains the command prefix
         if chattext.startswith(self.prefix):
+            command_name = chattext[len(self.prefix):].split(" ")[0]
+            command_args = chattext[len(self.prefix) + len(command_name):].strip()
+            # Unknown commands share one label so typos cannot create new series
+            label = command_name.lower() if command_name.lower() in self.commands.commands else "unknown"
+            command_start = time.perf_counter()
             try:
-                command_start = time.time()
-                command_name = chattext[len(self.prefix):].split(" ")[0]
-                command_args = chattext[len(self.prefix) + len(command_name):].strip()
-                
-                self.logger.info(f"Executing command: {command_name} with args: {command_args}")
-                res = self.commands.execute(command_name, self, is_team, playername, command_args)
+                self.logger.info("Executing command: %s with args: %s", command_name, command_args, extra=SAMPLED)
+                with command_context(label):
+                    res = self.commands.execute(command_name, self, is_team, playername, command_args)
                 
                 if isinstance(res, str):
                     self._response_queue.append({
                         "is_team": is_team,
                         "text": res
                     })
-                command_time = time.time() - command_start
-                self.logger.info(f"Command execution took {command_time:.4f}s")
             except Exception as e:
-                import traceback
-                self.logger.error(f"Error executing command: {e}")
-                self.logger.error(f"Traceback: {traceback.format_exc()}")
+                command_errors.inc(label)
+                self.logger.exception("Error executing command: %s", e)
+            command_duration.observe(time.perf_counter() - command_start, label)
         
         # Return collected responses
         responses = self._response_queue
         self._response_queue = []
         
-        total_time = time.time() - start_time
-        self.logger.info(f"Total processing time: {total_time:.4f}s (modules: {module_time:.4f}s)")
+        message_duration.observe(time.perf_counter() - start_time)
         
         return responses
         
@@ -156,6 +302,35 @@ app = Flask(__name__)
 bot_server = None
 
 
+@app.before_request
+def _start_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def _record_request(response):
+    """Count every request and record its latency by endpoint."""
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    requests_total.inc(endpoint, str(response.status_code))
+    if "request_start" in g:
+        request_duration.observe(time.perf_counter() - g.request_start, endpoint)
+    return response
+
+
+def _is_admin():
+    """Whether the request carries the configured admin token."""
+    token = bot_server.admin_token if bot_server else ""
+    supplied = request.headers.get("X-Admin-Token", "")
+    return bool(token) and hmac.compare_digest(supplied.encode(), token.encode())
+
+
+def _rejected(message, status, retry_after):
+    """Build a fast rejection response with a Retry-After header."""
+    response = jsonify({"error": message, "retry_after": round(retry_after, 2)})
+    response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response, status
+
+
 @app.route('/process_message', methods=['POST'])
 def process_message():
     """Handle incoming messages from the client."""
@@ -173,36 +348,216 @@ def process_message():
         if not playername or not chattext:
             return jsonify({"error": "Missing required fields"}), 400
         
-        # Store platform info on the bot server for commands to access
-        bot_server.platform = platform
+        # Admission control happens before any database work
+        admission = bot_server.admission
+        retry_after = admission.check_rate((platform, playername), chattext)
+        if retry_after:
+            return _rejected("Rate limited, slow down.", 429, retry_after)
+        cheap = admission.is_cheap(chattext)
+        if not admission.try_acquire(cheap):
+            return _rejected("Server is busy, try again shortly.", 503, 1)
         
-        # Get preferred identifier (Discord if linked, otherwise original)
-        account_linking = bot_server.modules.get_module("account_linking")
-        if account_linking:
-            playername = account_linking.get_preferred_identifier(platform, playername)
-            
-        # Process the message
-        responses = bot_server.process_message(is_team, playername, chattext)
+        try:
+            # Get preferred identifier (Discord if linked, otherwise original)
+            account_linking = bot_server.modules.get_module("account_linking")
+            if account_linking:
+                playername = account_linking.get_preferred_identifier(platform, playername)
+                
+            # Process the message on the player's lane, under cProfile if an admin asked for it
+            report = None
+            if data.get('profile') and _is_admin():
+                (responses, queries), report = bot_server.executor.submit(
+                    playername, profile_call, bot_server.process_message_with_queries,
+                    is_team, playername, chattext, platform, urgent=cheap
+                ).result()
+            else:
+                responses, queries = bot_server.submit_message(is_team, playername, chattext, platform, urgent=cheap).result()
+        finally:
+            admission.release(cheap)
         
-        return jsonify({"responses": responses}), 200
+        result = {"responses": responses}
+        if data.get('debug'):
+            result["queries"] = queries
+        if report is not None:
+            result["profile"] = report
+        return jsonify(result), 200
         
     except Exception as e:
         app.logger.error(f"Error processing message: {e}")
         return jsonify({"error": str(e)}), 500
 
 
+def _process_group(playername, group, debug=False):
+    """Process one player's messages from a batch in order, sharing one storage session."""
+    results = []
+    with bot_server.storage.session():
+        for index, message, platform in group:
+            try:
+                responses, queries = bot_server.process_message_with_queries(message.get('is_team', False), playername, message['chattext'], platform)
+                result = {"responses": responses}
+                if debug:
+                    result["queries"] = queries
+                results.append((index, result))
+            except Exception as e:
+                app.logger.error(f"Error processing message {index} of batch: {e}")
+                results.append((index, {"error": str(e)}))
+    return results
+
+
+def _process_batch(valid, results, urgent=False, debug=False):
+    """Resolve identities for a batch, run it on the players' lanes and fill in results."""
+    # One identity-resolution query for the whole batch
+    preferred = {}
+    account_linking = bot_server.modules.get_module("account_linking")
+    if account_linking:
+        preferred = account_linking.get_preferred_identifiers(
+            [(message.get('platform', 'unknown'), message['playername']) for _, message in valid]
+        )
+    
+    # Group messages by player, keeping their order, and run each group on the
+    # player's lane with one storage session
+    groups = {}
+    for index, message in valid:
+        platform = message.get('platform', 'unknown')
+        playername = preferred.get((platform, message['playername']), message['playername'])
+        groups.setdefault(playername, []).append((index, message, platform))
+    
+    futures = [
+        bot_server.executor.submit(playername, _process_group, playername, group, debug, urgent=urgent)
+        for playername, group in groups.items()
+    ]
+    for future in futures:
+        for index, result in future.result():
+            results[index] = result
+
+
+@app.route('/process_messages', methods=['POST'])
+def process_messages():
+    """Handle an ordered batch of incoming messages from the client."""
+    try:
+        data = request.get_json()
+        
+        if not data or not isinstance(data.get('messages'), list):
+            return jsonify({"error": "No messages provided"}), 400
+            
+        messages = data['messages']
+        if len(messages) > MAX_BATCH_SIZE:
+            return jsonify({"error": f"Too many messages (max {MAX_BATCH_SIZE})"}), 400
+        
+        admission = bot_server.admission
+        results = [None] * len(messages)
+        valid = []
+        for index, message in enumerate(messages):
+            if not isinstance(message, dict) or not message.get('playername') or not message.get('chattext'):
+                results[index] = {"error": "Missing required fields"}
+                continue
+            # Rate limits are applied per message, before any database work
+            retry_after = admission.check_rate((message.get('platform', 'unknown'), message['playername']), message['chattext'])
+            if retry_after:
+                results[index] = {"error": "Rate limited, slow down.", "retry_after": round(retry_after, 2)}
+                continue
+            valid.append((index, message))
+        
+        if not valid:
+            return jsonify({"results": results}), 200
+        
+        # A batch occupies one slot per distinct player, since each player's messages run on one lane
+        cheap = all(admission.is_cheap(message['chattext']) for _, message in valid)
+        slots = len({(message.get('platform', 'unknown'), message['playername']) for _, message in valid})
+        slots = max(1, min(slots, admission.max_in_flight if cheap else admission.max_in_flight - admission.reserved_cheap))
+        if not admission.try_acquire(cheap, slots):
+            return _rejected("Server is busy, try again shortly.", 503, 1)
+        
+        try:
+            _process_batch(valid, results, urgent=cheap, debug=bool(data.get('debug')))
+        finally:
+            admission.release(cheap, slots)
+        
+        return jsonify({"results": results}), 200
+        
+    except Exception as e:
+        app.logger.error(f"Error processing message batch: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint."""
     return jsonify({"status": "ok"}), 200
 
 
+@app.route('/stats', methods=['GET'])
+def stats():
+    """Execution lane and admission control statistics."""
+    return jsonify({
+        "lanes": bot_server.executor.metrics(),
+        "admission": bot_server.admission.metrics(),
+    }), 200
+
+
+@app.route('/admin/profile', methods=['GET'])
+def admin_profile():
+    """Sample every server thread for a few seconds and return collapsed stacks."""
+    if not _is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+    
+    try:
+        seconds = min(float(request.args.get('seconds', 10)), 60)
+        interval = max(float(request.args.get('interval_ms', 5)), 1) / 1000
+    except ValueError:
+        return jsonify({"error": "seconds and interval_ms must be numbers"}), 400
+    include_idle = request.args.get('idle', '0') == '1'
+    
+    try:
+        stacks, samples = SamplingProfiler(interval, include_idle).run(seconds)
+    except ProfilerBusy as e:
+        return jsonify({"error": str(e)}), 409
+    
+    if request.args.get('format') == 'json':
+        return jsonify({"samples": samples, "interval_ms": interval * 1000, "stacks": dict(stacks.most_common())}), 200
+    return Response(collapsed(stacks), mimetype="text/plain")
+
+
+@app.route('/admin/reload_catalog', methods=['POST'])
+def admin_reload_catalog():
+    """Re-read the game data files now instead of waiting for the file watcher."""
+    if not _is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+    if bot_server.catalog is None:
+        return jsonify({"error": "Catalog module not loaded"}), 404
+    
+    if not bot_server.catalog.reload():
+        return jsonify({"error": "Invalid game data, kept the current version (see the server log)",
+                        "version": bot_server.catalog.version}), 422
+    return jsonify({"version": bot_server.catalog.version}), 200
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics in the text exposition format."""
+    return Response(metrics_registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+def _exit_on_signal(signum, frame):
+    """Turn SIGTERM/SIGINT into a normal exit so run_server can shut down cleanly."""
+    raise SystemExit(0)
+
+
 def run_server(host='127.0.0.1', port=8080):
-    """Run the Flask server."""
+    """Run the Flask server until it is stopped, then shut the bot server down."""
     global bot_server
     bot_server = BotServer()
+    # `docker stop` sends SIGTERM to PID 1, which has no default handler there. Handlers
+    # can only be installed on the main thread; the launchers that run the server on a
+    # worker thread rely on the atexit hooks instead
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, _exit_on_signal)
+        signal.signal(signal.SIGINT, _exit_on_signal)
     app.logger.info(f"Starting bot server on {host}:{port}")
-    app.run(host=host, port=port, debug=False)
+    try:
+        app.run(host=host, port=port, debug=False, threaded=True)
+    finally:
+        bot_server.shutdown()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,324 @@
+"""
+Economy simulator for balancing fish, cases and the casino.
+
+Draws millions of casts, case openings and coin flips with NumPy from the real
+catalogs (modules/data) and the rules the modules play by: Fishing.catch_table,
+Fishing.miss_chance_for, Fishing.apply_bait and Fishing.apply_price_effects for
+casts, the catalog's case alias tables for openings and Casino.win_chance for
+flips. Editing a data file and running this again shows what the edit does.
+
+Usage:
+    python simulate_economy.py fishing [--casts N] [--casts-per-hour R] [--effects E,...] [--bait RARITY]
+        Simulate N casts per rod (no rod and each rod in the shop) and report
+        the miss rate, the value of a cast (mean and standard deviation) and
+        the share of each rarity. Items are valued at what they sell for:
+        cases are opened and sold, other items are worth nothing. Then, per
+        sack, the expected income per hour and its standard deviation when
+        a player sends R commands an hour, one `sellall` for every full
+        sack. --effects applies status effects (e.g. fishing.price_50).
+        --bait baits every cast with a fish of that rarity, charged at the
+        rarity's average price.
+
+    python simulate_economy.py cases [--opens N]
+        Open N of each case and report the payout (mean, standard deviation,
+        median and best) and the share of each tier.
+
+    python simulate_economy.py casino [--flips N] [--effects E,...]
+        Flip N coins for $1 each and report the win rate, the mean return
+        per dollar and its standard deviation.
+
+    python simulate_economy.py all [...]
+        All of the above.
+
+    Every mode takes --seed S for reproducible runs and --output FILE to
+    write the results as JSON.
+
+Needs NumPy (pip install numpy), which the bot itself does not.
+"""
+import argparse
+import json
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:  # Reported in main, so --help works without it
+    np = None
+
+from modules.casino import Casino
+from modules.catalog import Catalog
+from modules.fishing import Fishing
+from util.game_data import CASE_ODDS, RARITIES
+
+CHUNK_SIZE = 1_000_000  # Draws per NumPy batch; bounds memory for large runs
+
+
+class Moments:
+    """Running count, mean and variance of simulated values, fed in batches."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.squares = 0.0
+
+    def add(self, values):
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.squares += float((values * values).sum())
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def std(self):
+        if self.count < 2:
+            return 0.0
+        return max(self.squares / self.count - self.mean ** 2, 0.0) ** 0.5
+
+
+def find_effects(catalog, names):
+    """
+    Return status effects the way StatusEffects.get_effects does.
+
+    :param names: "module.effect" names, e.g. ["fishing.price_50"].
+    """
+    effects = []
+    for name in names:
+        module_id, _, effect_id = name.partition(".")
+        effect = catalog.status_effects.get(module_id, {}).get(effect_id)
+        if effect is None:
+            raise ValueError(f"Unknown status effect '{name}'")
+        effects.append(dict(effect, module_id=module_id, effect_id=effect_id))
+    return effects
+
+
+def gear(catalog, item_type):
+    """Return the shop items of a type, cheapest first, after None for no item."""
+    items = [catalog.shop_items[name] for name in catalog.names_by_type.get(item_type, ()) if name in catalog.shop_items]
+    return [None] + sorted(items, key=lambda item: item["price"])
+
+
+class CaseSampler:
+    """A case's alias table as NumPy arrays, to open cases in bulk."""
+
+    def __init__(self, table):
+        self.tiers = [tier for tier, _ in table.outcomes]
+        self.prices = np.array([item["price"] for _, item in table.outcomes], dtype=float)
+        self.keep = np.array(table.keep, dtype=float)
+        self.alias = np.array(table.alias, dtype=np.intp)
+
+    def open(self, count, rng):
+        """Return the index of the drop of each of `count` openings."""
+        position = rng.random(count) * len(self.prices)
+        column = position.astype(np.intp)
+        return np.where(position - column < self.keep[column], column, self.alias[column])
+
+
+def simulate_casts(catalog, rod, effects, bait, casts, rng, case_samplers):
+    """
+    Simulate casts with one rod.
+
+    :return: {"miss_rate", "fish_rate", "value": Moments, "rarities": {rarity: share}, "items": {name: share}}
+    """
+    minimum_rarity = Fishing.minimum_rarity_for(rod)
+    miss_chance = Fishing.miss_chance_for(rod, effects)
+    bait_cost = 0.0
+    if bait:
+        minimum_rarity, miss_chance = Fishing.apply_bait(minimum_rarity, miss_chance, bait)
+        bait_fish = [fish for fish in catalog.fish_by_rarity[bait] if fish["type"] == "fish"]
+        bait_cost = float(np.mean([Fishing.apply_price_effects(
+            (fish["min_weight"] + fish["max_weight"]) / 2 * fish["price_multiplier"], effects) for fish in bait_fish]))
+    fish_around, cumulative_rates = Fishing.catch_table(catalog, minimum_rarity, effects)
+
+    cumulative_rates = np.asarray(cumulative_rates, dtype=float)
+    total_catch_rate = cumulative_rates[-1] + cumulative_rates[-1] * miss_chance
+    is_fish = np.array([item["type"] == "fish" for item in fish_around])
+    min_weights = np.array([item["min_weight"] for item in fish_around], dtype=float)
+    max_weights = np.array([item["max_weight"] for item in fish_around], dtype=float)
+    multipliers = np.array([item["price_multiplier"] for item in fish_around], dtype=float)
+
+    value = Moments()
+    caught = np.zeros(len(fish_around) + 1, dtype=np.int64)  # The last slot counts misses
+    remaining = casts
+    while remaining:
+        size = min(remaining, CHUNK_SIZE)
+        remaining -= size
+        # The first fish whose running total reaches the roll; past the end is a miss
+        index = np.searchsorted(cumulative_rates, rng.uniform(0, total_catch_rate, size), side="left")
+        caught += np.bincount(index, minlength=len(caught))
+
+        values = np.zeros(size)
+        hit = index < len(fish_around)
+        fish = hit & is_fish[np.minimum(index, len(fish_around) - 1)]
+        weights = np.round(rng.uniform(min_weights[index[fish]], max_weights[index[fish]]), 2)
+        values[fish] = np.round(Fishing.apply_price_effects(weights * multipliers[index[fish]], effects), 2)
+        for position, item in enumerate(fish_around):
+            sampler = case_samplers.get(item["name"]) if item["type"] == "item" else None
+            if sampler is not None:
+                found = index == position
+                values[found] = sampler.prices[sampler.open(int(found.sum()), rng)]
+        value.add(values - bait_cost)
+
+    rarities = dict.fromkeys(RARITIES, 0.0)
+    items = {}
+    for item, count in zip(fish_around, caught[:-1]):
+        rarities[item["rarity"]] += count / casts
+        if item["type"] == "item":
+            items[item["name"]] = count / casts
+    return {
+        "minimum_rarity": minimum_rarity,
+        "miss_chance": miss_chance,
+        "miss_rate": caught[-1] / casts,
+        "fish_rate": float(caught[:-1][is_fish].sum()) / casts,
+        "bait_cost": bait_cost,
+        "value": value,
+        "rarities": {rarity: share for rarity, share in rarities.items() if share},
+        "items": items,
+    }
+
+
+def simulate_fishing(catalog, args, rng):
+    """Simulate every rod and report the income per hour with every sack."""
+    effects = find_effects(catalog, args.effects)
+    case_samplers = {name: CaseSampler(table) for name, table in catalog.case_tables.items()}
+    results = []
+    start = time.perf_counter()
+    for rod in gear(catalog, "rod"):
+        result = simulate_casts(catalog, rod, effects, args.bait, args.casts, rng, case_samplers)
+        result["rod"] = rod["name"] if rod else "No rod"
+        results.append(result)
+    elapsed = time.perf_counter() - start
+    print(f"Fishing: {args.casts * len(results):,} casts in {elapsed:.2f}s "
+          f"({args.casts * len(results) / elapsed / 1e6:.1f}M casts/s)")
+
+    print(f"\n{'rod':<18} {'min rarity':>10} {'miss':>6} {'$/cast':>8} {'std':>8}  rarity shares")
+    for result in results:
+        shares = ", ".join(f"{rarity} {share:.1%}" for rarity, share in result["rarities"].items())
+        print(f"{result['rod']:<18} {result['minimum_rarity']:>10} {result['miss_rate']:6.1%} "
+              f"{result['value'].mean:8.2f} {result['value'].std:8.2f}  {shares}")
+
+    sacks = gear(catalog, "sack")
+    print(f"\nIncome per hour at {args.casts_per_hour} commands/hour (mean +- std)")
+    print(f"{'rod':<18} " + " ".join(f"{(sack['name'] if sack else 'No sack'):>20}" for sack in sacks))
+    report = []
+    for result in results:
+        row = []
+        for sack in sacks:
+            sack_size = Fishing.sack_size_for(sack)
+            # Every full sack costs one sellall out of the hour's commands; a size of 0 or less is unlimited
+            casts = args.casts_per_hour / (1 + result["fish_rate"] / sack_size) if sack_size > 0 else args.casts_per_hour
+            per_hour = result["value"].mean * casts
+            std_per_hour = result["value"].std * casts ** 0.5
+            row.append(f"{per_hour:>11,.0f} +- {std_per_hour:>5,.0f}")
+            report.append({
+                "rod": result["rod"], "sack": sack["name"] if sack else "No sack", "casts_per_hour": casts,
+                "income_per_hour": per_hour, "std_per_hour": std_per_hour,
+            })
+        print(f"{result['rod']:<18} " + " ".join(f"{cell:>20}" for cell in row))
+
+    return {
+        "rods": [{
+            "rod": result["rod"], "minimum_rarity": result["minimum_rarity"], "miss_chance": result["miss_chance"],
+            "miss_rate": result["miss_rate"], "fish_rate": result["fish_rate"], "bait_cost": result["bait_cost"],
+            "value_per_cast": result["value"].mean, "std_per_cast": result["value"].std,
+            "rarities": result["rarities"], "items": result["items"],
+        } for result in results],
+        "income": report,
+    }
+
+
+def simulate_cases(catalog, args, rng):
+    """Open every case many times and report the payouts."""
+    report = {}
+    start = time.perf_counter()
+    print(f"{'case':<22} {'mean':>9} {'std':>9} {'median':>9} {'best':>9}  tier shares")
+    for name, table in catalog.case_tables.items():
+        sampler = CaseSampler(table)
+        value = Moments()
+        tiers = np.zeros(len(sampler.prices), dtype=np.int64)
+        samples = []
+        remaining = args.opens
+        while remaining:
+            size = min(remaining, CHUNK_SIZE)
+            remaining -= size
+            drops = sampler.open(size, rng)
+            tiers += np.bincount(drops, minlength=len(tiers))
+            prices = sampler.prices[drops]
+            value.add(prices)
+            samples.append(prices[:10_000])
+        shares = dict.fromkeys(CASE_ODDS, 0.0)
+        for tier, count in zip(sampler.tiers, tiers):
+            shares[tier] += count / args.opens
+        shares = {tier: share for tier, share in shares.items() if share}
+        median = float(np.median(np.concatenate(samples)))
+        print(f"{name:<22} {value.mean:9.2f} {value.std:9.2f} {median:9.2f} {sampler.prices.max():9.2f}  "
+              + ", ".join(f"{tier} {share:.2%}" for tier, share in shares.items()))
+        report[name] = {"mean": value.mean, "std": value.std, "median": median,
+                        "best": float(sampler.prices.max()), "tiers": shares}
+    elapsed = time.perf_counter() - start
+    print(f"Cases: {args.opens * len(report):,} openings in {elapsed:.2f}s "
+          f"({args.opens * len(report) / elapsed / 1e6:.1f}M openings/s)")
+    return report
+
+
+def simulate_casino(catalog, args, rng):
+    """Flip coins for $1 each and report the returns."""
+    effects = find_effects(catalog, args.effects)
+    win_chance = Casino.win_chance(effects)
+    value = Moments()
+    wins = 0
+    start = time.perf_counter()
+    remaining = args.flips
+    while remaining:
+        size = min(remaining, CHUNK_SIZE)
+        remaining -= size
+        heads = rng.random(size) < win_chance
+        wins += int(heads.sum())
+        value.add(np.where(heads, 1.0, -1.0))
+    elapsed = time.perf_counter() - start
+    print(f"Casino: {args.flips:,} flips in {elapsed:.2f}s ({args.flips / elapsed / 1e6:.1f}M flips/s)")
+    print(f"win chance {win_chance:.4f}, win rate {wins / args.flips:.4f}, "
+          f"return per $1 {value.mean:+.4f} (std {value.std:.4f})")
+    return {"win_chance": win_chance, "win_rate": wins / args.flips, "mean_return": value.mean, "std": value.std}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate the game economy from the real catalogs.")
+    parser.add_argument("mode", choices=["fishing", "cases", "casino", "all"])
+    parser.add_argument("--casts", type=int, default=1_000_000, help="casts per rod")
+    parser.add_argument("--casts-per-hour", type=float, default=120, help="commands a player sends per hour")
+    parser.add_argument("--opens", type=int, default=1_000_000, help="openings per case")
+    parser.add_argument("--flips", type=int, default=1_000_000)
+    parser.add_argument("--effects", type=lambda value: [name.strip() for name in value.split(",") if name.strip()],
+                        default=[], help="status effects to apply, e.g. fishing.price_50,fishing.catch_rate_20")
+    parser.add_argument("--bait", choices=RARITIES, help="bait every cast with a fish of this rarity")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    if np is None:
+        print("simulate_economy.py needs NumPy: pip install numpy")
+        sys.exit(1)
+
+    catalog = Catalog()
+    rng = np.random.default_rng(args.seed)
+    modes = {"fishing": simulate_fishing, "cases": simulate_cases, "casino": simulate_casino}
+    try:
+        results = {}
+        for mode, simulate in modes.items():
+            if args.mode in (mode, "all"):
+                results[mode] = simulate(catalog, args, rng)
+                print()
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
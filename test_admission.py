@@ -0,0 +1,38 @@
+"""
+Tests for admission control (server/admission.py)
+
+Run with: python -m pytest test_admission.py
+"""
+
+import pytest
+
+from server.admission import AdmissionController
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.parametrize("settings", [{"rate": 0}, {"rate": -1.0}, {"burst": 0}, {"burst": 0.5}])
+def test_invalid_rate_limits_are_rejected(settings):
+    """A zero rate would never refill the bucket; reject it up front instead of dividing by zero later."""
+    with pytest.raises(ValueError):
+        AdmissionController(**settings)
+
+
+def test_token_bucket_limits_and_refills():
+    clock = FakeClock()
+    admission = AdmissionController(rate=2.0, burst=2, clock=clock)
+    assert admission.check_rate("alice", "@fish") == 0.0
+    assert admission.check_rate("alice", "@fish") == 0.0
+    assert admission.check_rate("alice", "@fish") == 0.5
+    assert admission.check_rate("alice", "hello") == 0.0  # Chatter is never limited
+    assert admission.check_rate("bob", "@fish") == 0.0
+
+    clock.now += 0.5
+    assert admission.check_rate("alice", "@fish") == 0.0
+    assert admission.rate_limited == 1
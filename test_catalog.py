@@ -0,0 +1,111 @@
+"""
+Tests for the game data catalog (modules/catalog.py)
+
+Works on a copy of modules/data in a temporary directory: reloads swap in new
+versions while reader threads are pinned to one, and invalid files are
+rejected without touching the loaded data.
+
+Run with: python -m pytest test_catalog.py
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+
+import pytest
+
+from modules.catalog import Catalog
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "modules", "data")
+
+
+class TempCatalog(Catalog):
+    """Catalog that reads its data files from a test directory."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        super().__init__()
+
+    def data_path(self, filename):
+        return os.path.join(self.directory, filename)
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    for filename in ("fish.json", "shop.json", "cases.json", "status_effects.json"):
+        shutil.copy(os.path.join(DATA_DIR, filename), tmp_path / filename)
+    return TempCatalog(str(tmp_path))
+
+
+def write_fish(catalog, marker):
+    """Rewrite fish.json with a marker fish first, so every version is recognisable."""
+    with open(os.path.join(DATA_DIR, "fish.json"), encoding="utf-8") as file:
+        fish = json.load(file)
+    marked = dict(fish[0], name=f"Marker {marker}")
+    with open(catalog.data_path("fish.json"), "w", encoding="utf-8") as file:
+        json.dump([marked] + fish, file)
+
+
+def test_pinned_readers_see_one_version_during_reloads(catalog):
+    stop = threading.Event()
+    problems = []
+    seen = set()
+
+    def reader():
+        while not stop.is_set():
+            with catalog.pinned() as data:
+                marker = catalog.fish[0]["name"]
+                for _ in range(20):
+                    # Every read in the block, raw or indexed, comes from the pinned version
+                    if catalog.data is not data or catalog.fish[0]["name"] != marker or marker not in catalog.fish_by_name:
+                        problems.append(marker)
+                seen.add(marker)
+
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+    try:
+        for marker in range(1, 21):
+            write_fish(catalog, marker)
+            assert catalog.reload()
+    finally:
+        stop.set()
+        for thread in readers:
+            thread.join(5)
+
+    assert problems == []
+    assert catalog.version == 21
+    assert catalog.fish[0]["name"] == "Marker 20"
+    assert len(seen) > 1
+
+
+def test_pinned_version_survives_a_reload(catalog):
+    write_fish(catalog, 1)
+    assert catalog.reload()
+    with catalog.pinned():
+        write_fish(catalog, 2)
+        assert catalog.reload()
+        assert catalog.fish[0]["name"] == "Marker 1"
+    assert catalog.fish[0]["name"] == "Marker 2"
+
+
+@pytest.mark.parametrize("content", [
+    "[{\"name\": \"Salmon\",",  # Not JSON
+    json.dumps([{"name": "Salmon", "type": "fish", "rarity": "Mythic", "catch_rate": 1}]),  # Invalid data
+])
+def test_malformed_fish_json_keeps_the_old_version(catalog, caplog, content):
+    old_data, old_version = catalog.data, catalog.version
+    with open(catalog.data_path("fish.json"), "w", encoding="utf-8") as file:
+        file.write(content)
+
+    with caplog.at_level(logging.ERROR):
+        assert not catalog.reload()
+
+    assert catalog.data is old_data
+    assert catalog.version == old_version
+    assert "Catalog reload rejected" in caplog.text
+    assert "fish.json" in caplog.text
+    # The failed attempt is remembered, so the watcher does not retry until the file changes again
+    assert not catalog.changed()
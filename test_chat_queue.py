@@ -0,0 +1,124 @@
+"""
+Tests for the outgoing chat queue (util/chat_queue.py)
+
+Simulates producer bursts against ChatQueue: duplicates, both drop policies
+at max_size, round-robin fairness when one player floods, and consumers
+waking up on put and close.
+
+Run with: python -m pytest test_chat_queue.py
+"""
+
+import threading
+import time
+
+from util.chat_queue import ChatQueue
+
+
+def test_duplicate_put_is_rejected():
+    """A message already waiting is not queued twice."""
+    queue = ChatQueue()
+    assert queue.put(False, "hello", "alice")
+    assert not queue.put(False, "hello", "bob")
+    assert queue.put(True, "hello", "alice")  # Team chat is a different message
+    assert len(queue) == 2
+
+    # Once sent, the same text may be queued again
+    assert queue.get(timeout=0) == (False, "hello")
+    assert queue.put(False, "hello", "alice")
+
+
+def test_drop_oldest_at_max_size():
+    """The oldest message of the busiest player makes room for the new one."""
+    queue = ChatQueue(max_size=3, drop_policy="oldest")
+    assert queue.put(False, "spam 1", "spammer")
+    assert queue.put(False, "spam 2", "spammer")
+    assert queue.put(False, "reply", "alice")
+    assert queue.put(False, "spam 3", "spammer")
+
+    assert queue.dropped == 1
+    assert len(queue) == 3
+    assert sorted(queue.drain()) == sorted([(False, "spam 2"), (False, "reply"), (False, "spam 3")])
+
+
+def test_drop_newest_at_max_size():
+    """With the newest policy a full queue rejects the incoming message."""
+    queue = ChatQueue(max_size=2, drop_policy="newest")
+    assert queue.put(False, "first", "alice")
+    assert queue.put(False, "second", "alice")
+    assert not queue.put(False, "third", "bob")
+
+    assert queue.dropped == 1
+    assert queue.drain() == [(False, "first"), (False, "second")]
+
+
+def test_burst_does_not_starve_other_players():
+    """Lanes are served round-robin, so one player's burst cannot delay everyone else."""
+    queue = ChatQueue(max_size=100)
+    for i in range(20):
+        queue.put(False, f"spam {i}", "spammer")
+    queue.put(False, "alice reply", "alice")
+    queue.put(False, "bob reply", "bob")
+
+    first = [queue.get(timeout=0)[1] for _ in range(3)]
+    assert first == ["spam 0", "alice reply", "bob reply"]
+    # The burst keeps its own order
+    assert [text for _, text in queue.drain()] == [f"spam {i}" for i in range(1, 20)]
+
+
+def test_concurrent_producers_keep_per_player_order():
+    """Bursts from several threads at once lose nothing and keep each player's order."""
+    queue = ChatQueue(max_size=1000)
+    players = [f"player{i}" for i in range(8)]
+
+    def burst(player):
+        for i in range(50):
+            queue.put(False, f"{player} {i}", player)
+
+    threads = [threading.Thread(target=burst, args=(player,)) for player in players]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    messages = [text for _, text in queue.drain()]
+    assert len(messages) == 400
+    for player in players:
+        assert [text for text in messages if text.startswith(f"{player} ")] == [f"{player} {i}" for i in range(50)]
+
+
+def _time_get(queue, results):
+    start = time.monotonic()
+    results.append((queue.get(timeout=5), time.monotonic() - start))
+
+
+def test_get_wakes_on_put():
+    """A blocked consumer returns as soon as a message is queued."""
+    queue = ChatQueue()
+    results = []
+    consumer = threading.Thread(target=_time_get, args=(queue, results))
+    consumer.start()
+    time.sleep(0.05)
+    queue.put(False, "wake up", "alice")
+    consumer.join(timeout=5)
+
+    message, waited = results[0]
+    assert message == (False, "wake up")
+    assert waited < 1
+
+
+def test_get_wakes_on_close():
+    """Closing the queue releases blocked consumers with None and rejects new messages."""
+    queue = ChatQueue()
+    results = []
+    consumers = [threading.Thread(target=_time_get, args=(queue, results)) for _ in range(3)]
+    for consumer in consumers:
+        consumer.start()
+    time.sleep(0.05)
+    queue.close()
+    for consumer in consumers:
+        consumer.join(timeout=5)
+
+    assert [message for message, _ in results] == [None, None, None]
+    assert all(waited < 1 for _, waited in results)
+    assert not queue.put(False, "too late", "alice")
+    assert queue.closed
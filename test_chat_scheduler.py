@@ -0,0 +1,128 @@
+"""
+Tests for the outgoing chat scheduler (util/chat_scheduler.py)
+
+Covers line packing (UTF-8 byte limit, per-channel order, over-long messages)
+and send timing, driven by a fake clock and a recording stand-in for the game
+instead of the win32 helpers.
+
+Run with: python -m pytest test_chat_scheduler.py
+"""
+
+from util.chat_queue import ChatQueue
+from util.chat_scheduler import ChatScheduler, pack_messages
+
+
+class FakeGame:
+    """Records what the scheduler does and advances a fake clock instead of sleeping."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.events = []
+        self.sent = []
+        self._pending = None
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.events.append(("sleep", seconds))
+        self.now += seconds
+
+    def write_chat(self, is_team, chattext):
+        self._pending = (is_team, chattext)
+
+    def load_chat(self):
+        pass
+
+    def send_chat(self):
+        self.sent.append((self.now, self._pending))
+
+    def scheduler(self, queue, **settings):
+        settings.setdefault("write_delay", 0)
+        settings.setdefault("load_delay", 0)
+        settings.setdefault("gather_delay", 0)
+        return ChatScheduler(queue, self.write_chat, self.load_chat, self.send_chat,
+                             sleep=self.sleep, clock=self.clock, **settings)
+
+
+def test_pack_joins_messages_up_to_the_limit():
+    """Messages of one channel share a line while it fits."""
+    lines = pack_messages([(False, "aaaa"), (False, "bbbb"), (False, "cccc")], max_length=11, separator=" | ")
+    assert lines == [(False, "aaaa | bbbb"), (False, "cccc")]
+
+
+def test_pack_counts_utf8_bytes():
+    """The limit is in UTF-8 bytes, as the game counts it, not in characters."""
+    # "✓✓" is 2 characters but 6 bytes; joined it would be 6 + 3 + 6 = 15 bytes
+    assert pack_messages([(False, "✓✓"), (False, "✓✓")], max_length=14, separator=" | ") == \
+        [(False, "✓✓"), (False, "✓✓")]
+    assert pack_messages([(False, "✓✓"), (False, "✓✓")], max_length=15, separator=" | ") == \
+        [(False, "✓✓ | ✓✓")]
+
+
+def test_pack_keeps_order_per_channel():
+    """Team and all chat are packed separately, each in send order, channels in first-seen order."""
+    messages = [(True, "t1"), (False, "a1"), (True, "t2"), (False, "a2"), (True, "t3")]
+    assert pack_messages(messages, max_length=127) == [(True, "t1 | t2 | t3"), (False, "a1 | a2")]
+
+
+def test_pack_sends_too_long_messages_unchanged():
+    """A message longer than the limit gets a line of its own and is not cut."""
+    long_text = "x" * 200
+    lines = pack_messages([(False, "short"), (False, long_text), (False, "after")], max_length=127)
+    assert lines == [(False, "short"), (False, long_text), (False, "after")]
+
+
+def test_first_line_is_sent_without_delay():
+    game = FakeGame()
+    scheduler = game.scheduler(ChatQueue())
+    assert scheduler.next_send_delay() == 0.0
+
+
+def test_send_interval_spaces_lines():
+    """Consecutive lines wait out the send interval and no longer."""
+    game = FakeGame()
+    scheduler = game.scheduler(ChatQueue(), send_interval=0.5, flood_lines=10, flood_window=5.0)
+    scheduler.send_line(False, "one")
+    assert scheduler.next_send_delay() == 0.5
+    game.now += 0.2
+    assert abs(scheduler.next_send_delay() - 0.3) < 1e-9
+    game.now += 1.0
+    assert scheduler.next_send_delay() == 0.0
+
+
+def test_flood_window_limits_lines():
+    """Once flood_lines lines went out, the next waits until the oldest leaves the window."""
+    game = FakeGame()
+    scheduler = game.scheduler(ChatQueue(), send_interval=0.5, flood_lines=3, flood_window=5.0)
+    for text in ("one", "two", "three"):
+        game.now += scheduler.next_send_delay()
+        scheduler.send_line(False, text)
+    # Sent at 0.0, 0.5 and 1.0: the fourth may go at 0.0 + 5.0
+    assert [at for at, _ in game.sent] == [0.0, 0.5, 1.0]
+    assert scheduler.next_send_delay() == 4.0
+
+
+def test_run_once_packs_and_respects_flood_window():
+    """A burst is packed into lines and no flood window ever holds more than flood_lines lines."""
+    game = FakeGame()
+    queue = ChatQueue(max_size=100)
+    for i in range(30):
+        queue.put(i % 2 == 0, f"reply number {i:02d}", f"player{i}")
+    scheduler = game.scheduler(queue, max_length=40, send_interval=0.5, flood_lines=2, flood_window=3.0)
+
+    assert scheduler.run_once(timeout=0)
+    assert scheduler.messages_sent == 30
+    assert scheduler.lines_sent == len(game.sent)
+    assert all(len(text.encode("utf-8")) <= 40 for _, (_, text) in game.sent)
+
+    # Every message arrives exactly once and in order within its channel
+    for is_team in (True, False):
+        texts = [part for _, (team, text) in game.sent if team == is_team for part in text.split(" | ")]
+        assert texts == [f"reply number {i:02d}" for i in range(30) if (i % 2 == 0) == is_team]
+
+    times = [at for at, _ in game.sent]
+    for earlier, later in zip(times, times[1:]):
+        assert later - earlier >= 0.5 - 1e-9
+    for index in range(2, len(times)):
+        assert times[index] - times[index - 2] >= 3.0 - 1e-9
@@ -0,0 +1,72 @@
+"""
+Tests for the keyed executor (server/executor.py)
+
+Checks that tasks for one key run one at a time in submission order, and that
+different keys really share the worker pool in parallel.
+
+Run with: python -m pytest test_executor.py
+"""
+
+import threading
+import time
+
+from server.executor import KeyedExecutor
+
+
+def test_per_key_order_is_preserved():
+    """Tasks submitted under one key run in submission order, never two at once."""
+    executor = KeyedExecutor(max_workers=4)
+    lock = threading.Lock()
+    seen = {key: [] for key in range(5)}
+    running = {key: 0 for key in range(5)}
+    overlaps = []
+
+    def task(key, index):
+        with lock:
+            running[key] += 1
+            if running[key] > 1:
+                overlaps.append(key)
+        time.sleep(0.001)
+        with lock:
+            seen[key].append(index)
+            running[key] -= 1
+
+    futures = [executor.submit(key, task, key, index) for index in range(20) for key in range(5)]
+    for future in futures:
+        future.result(timeout=10)
+    executor.shutdown()
+
+    assert overlaps == []
+    assert all(seen[key] == list(range(20)) for key in seen)
+    assert executor.completed == executor.submitted == 100
+    assert executor.lane_depths() == {}
+
+
+def test_keys_run_in_parallel():
+    """N keys with sleeping tasks finish in about 1/workers of the serial time."""
+    workers, keys, tasks_per_key, delay = 4, 8, 3, 0.05
+    executor = KeyedExecutor(max_workers=workers)
+
+    start = time.monotonic()
+    futures = [executor.submit(key, time.sleep, delay) for key in range(keys) for _ in range(tasks_per_key)]
+    for future in futures:
+        future.result(timeout=10)
+    elapsed = time.monotonic() - start
+    executor.shutdown()
+
+    serial = keys * tasks_per_key * delay
+    assert elapsed >= serial / workers - 0.01
+    assert elapsed < serial / workers * 2
+
+
+def test_exceptions_reach_the_future_and_the_lane_continues():
+    executor = KeyedExecutor(max_workers=2)
+
+    def fail():
+        raise ValueError("boom")
+
+    failed = executor.submit("alice", fail)
+    after = executor.submit("alice", lambda: "ok")
+    assert isinstance(failed.exception(timeout=5), ValueError)
+    assert after.result(timeout=5) == "ok"
+    executor.shutdown()
@@ -0,0 +1,78 @@
+"""
+Tests for the alias tables that case drops are drawn from (util/game_data.py)
+
+Draws a fixed number of seeded samples and compares the counts with the odds
+the tables are built from using a chi-squared goodness-of-fit test.
+
+Run with: python -m pytest test_game_data.py
+"""
+
+import random
+from collections import Counter
+
+import pytest
+
+from modules.catalog import Catalog
+from util.game_data import CASE_ODDS, AliasTable
+
+SAMPLES = 200_000
+
+# Upper 0.1% points of the chi-squared distribution by degrees of freedom, so a
+# correct table fails about once in a thousand seeds (and these seeds are fixed)
+CHI_SQUARED_999 = {1: 10.828, 2: 13.816, 3: 16.266, 4: 18.467, 5: 20.515, 6: 22.458, 7: 24.322, 8: 26.124,
+                   9: 27.877, 10: 29.588, 11: 31.264, 12: 32.909, 13: 34.528, 14: 36.123, 15: 37.697,
+                   16: 39.252, 17: 40.790, 18: 42.312, 19: 43.820, 20: 45.315, 25: 52.620, 30: 59.703}
+
+
+def chi_squared(observed, expected):
+    """Return the chi-squared statistic of observed counts against expected probabilities."""
+    total = sum(observed.values())
+    return sum((observed.get(key, 0) - total * p) ** 2 / (total * p) for key, p in expected.items())
+
+
+def critical_value(bins):
+    degrees = bins - 1
+    if degrees not in CHI_SQUARED_999:
+        pytest.skip(f"no critical value for {degrees} degrees of freedom")
+    return CHI_SQUARED_999[degrees]
+
+
+def expected_case_odds(case):
+    """Item name -> probability, from CASE_ODDS: empty tiers' chance shared out, each tier split evenly."""
+    tiers = {tier: items for tier, items in case["items"].items() if items}
+    total = sum(CASE_ODDS[tier] for tier in tiers)
+    return {item["name"]: CASE_ODDS[tier] / total / len(items) for tier, items in tiers.items() for item in items}
+
+
+def test_alias_table_matches_its_weights():
+    table = AliasTable(["a", "b", "c", "d", "never"], [5, 1, 3, 1, 0])
+    assert "never" not in table.outcomes
+    assert table.probabilities() == pytest.approx([0.5, 0.1, 0.3, 0.1])
+
+    drawn = Counter(table.draw_many(SAMPLES, rng=random.Random(7)))
+    expected = {"a": 0.5, "b": 0.1, "c": 0.3, "d": 0.1}
+    assert set(drawn) == set(expected)
+    assert chi_squared(drawn, expected) < critical_value(len(expected))
+
+
+def test_alias_table_needs_a_positive_weight():
+    with pytest.raises(ValueError):
+        AliasTable(["a", "b"], [0, 0])
+
+
+@pytest.mark.parametrize("case_name", sorted(Catalog().case_tables))
+def test_case_drops_follow_case_odds(case_name):
+    catalog = Catalog()
+    table = catalog.case_tables[case_name]
+    expected = expected_case_odds(catalog.cases[case_name])
+
+    assert {item["name"]: p for (_, item), p in zip(table.outcomes, table.probabilities())} == pytest.approx(expected)
+
+    drawn = Counter(item["name"] for _, item in table.draw_many(SAMPLES, rng=random.Random(1234)))
+    assert set(drawn) <= set(expected)
+    assert chi_squared(drawn, expected) < critical_value(len(expected))
+
+    # draw() samples the same distribution as draw_many()
+    rng = random.Random(99)
+    single = Counter(table.draw(rng)[1]["name"] for _ in range(SAMPLES // 4))
+    assert chi_squared(single, expected) < critical_value(len(expected))
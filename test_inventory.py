@@ -0,0 +1,96 @@
+"""
+Tests for the inventory module (modules/inventory.py)
+
+Loads the catalog, economy and inventory modules against a fresh SQLite or
+in-memory backend and checks the per-user inventory cache.
+
+Run with: python -m pytest test_inventory.py
+"""
+
+import random
+import threading
+
+import pytest
+
+from modules.catalog import Catalog
+from modules.economy import Economy
+from modules.inventory import Inventory
+from util.module_registry import module_registry
+from util.storage import set_storage
+from util.storage.memory import MemoryStorage
+from util.storage.sqlite import SQLiteStorage
+
+
+def load_inventory(storage):
+    """Register the modules the inventory needs against storage and return a new Inventory."""
+    set_storage(storage)
+    module_registry.register("catalog", Catalog())
+    module_registry.register("economy", Economy())
+    inventory = Inventory()
+    module_registry.register("inventory", inventory)
+    return inventory
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def storage(request, tmp_path):
+    storage = MemoryStorage() if request.param == "memory" else SQLiteStorage(str(tmp_path / "bot.db"))
+    yield storage
+    storage.close()
+
+
+def test_writes_invalidate_the_cache(storage):
+    inventory = load_inventory(storage)
+    assert inventory.get_inventory("alice") == []
+    inventory.add_item("alice", "Bravo Case", 2)
+    assert inventory.get_inventory("alice") == [("Bravo Case", 2)]
+    inventory.remove_item("alice", "Bravo Case")
+    assert inventory.get_inventory("alice") == [("Bravo Case", 1)]
+
+
+def test_miss_during_a_transaction_does_not_keep_pre_commit_rows(tmp_path):
+    """A reader that caches the old rows while a transaction is open loses them when it commits."""
+    storage = SQLiteStorage(str(tmp_path / "bot.db"))
+    inventory = load_inventory(storage)
+    storage.add_item("alice", "Bravo Case", 2)
+    written, read = threading.Event(), threading.Event()
+
+    def reader():
+        written.wait(5)
+        # Sees the last committed rows and caches them
+        assert inventory.get_inventory("alice") == [("Bravo Case", 2)]
+        read.set()
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    with storage.transaction():
+        inventory.remove_item("alice", "Bravo Case")
+        written.set()
+        read.wait(5)
+    thread.join(5)
+
+    assert inventory.get_inventory("alice") == [("Bravo Case", 1)]
+    storage.close()
+
+
+def test_open_many_cases_removes_them_and_credits_the_drops(storage):
+    """Opening count cases takes exactly count and pays what the same draws are worth."""
+    inventory = load_inventory(storage)
+    storage.add_item("alice", "Bravo Case", 10)
+    storage.add_balance("alice", 1.5)
+
+    random.seed(2024)
+    drops = inventory.catalog.case_tables["Bravo Case"].draw_many(7)
+    payout = round(sum(item["price"] for _, item in drops), 2)
+    random.seed(2024)
+    message = inventory.open_case("alice", "bravo case", 7)
+
+    assert "You opened 7 x Bravo Case" in message
+    assert f"${payout}" in message
+    assert inventory.get_inventory("alice") == [("Bravo Case", 3)]
+    assert storage.get_balance("alice") == round(1.5 + payout, 2)
+
+    # Opening the rest removes the row; asking for more than owned changes nothing
+    assert inventory.open_case("alice", "Bravo Case", 4) == "You only have 3 x Bravo Case."
+    inventory.open_case("alice", "Bravo Case", 3)
+    assert inventory.get_inventory("alice") == []
+    assert inventory.open_case("alice", "Bravo Case", 1) == "You don't have a Bravo Case to open."
@@ -0,0 +1,110 @@
+"""
+Tests for the metrics recorder (util/metrics.py)
+
+Renders a fresh registry and checks the Prometheus text exposition format:
+HELP/TYPE headers, cumulative histogram buckets ending in +Inf, _sum/_count
+series and label value escaping.
+
+Run with: python -m pytest test_metrics.py
+"""
+
+import threading
+
+import pytest
+
+from util.metrics import MetricsRegistry
+
+
+def _registry():
+    registry = MetricsRegistry()
+    counter = registry.counter("test_requests_total", "Requests handled.", ["endpoint", "status"])
+    histogram = registry.histogram("test_duration_seconds", "Handling time.", ["endpoint"], buckets=(0.1, 1.0))
+    return registry, counter, histogram
+
+
+def test_help_and_type_lines():
+    registry, counter, histogram = _registry()
+    counter.inc("/message", 200)
+    histogram.observe(0.05, "/message")
+    lines = registry.render().splitlines()
+
+    assert lines[0] == "# HELP test_requests_total Requests handled."
+    assert lines[1] == "# TYPE test_requests_total counter"
+    assert "# HELP test_duration_seconds Handling time." in lines
+    assert "# TYPE test_duration_seconds histogram" in lines
+    assert registry.render().endswith("\n")
+
+
+def test_counter_samples():
+    registry, counter, _ = _registry()
+    counter.inc("/message", 200)
+    counter.inc("/message", 200, amount=2)
+    counter.inc("/health", 200)
+    lines = registry.render().splitlines()
+
+    assert 'test_requests_total{endpoint="/message",status="200"} 3' in lines
+    assert 'test_requests_total{endpoint="/health",status="200"} 1' in lines
+
+
+def test_histogram_buckets_sum_and_count():
+    registry, _, histogram = _registry()
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value, "/message")
+    lines = registry.render().splitlines()
+
+    # Buckets are cumulative and the last one is +Inf
+    assert 'test_duration_seconds_bucket{endpoint="/message",le="0.1"} 1' in lines
+    assert 'test_duration_seconds_bucket{endpoint="/message",le="1"} 3' in lines
+    assert 'test_duration_seconds_bucket{endpoint="/message",le="+Inf"} 4' in lines
+    assert 'test_duration_seconds_sum{endpoint="/message"} 4.05' in lines
+    assert 'test_duration_seconds_count{endpoint="/message"} 4' in lines
+
+
+def test_label_values_are_escaped():
+    registry, counter, _ = _registry()
+    counter.inc('say "hi"\\now\nplease', 200)
+    lines = registry.render().splitlines()
+
+    assert 'test_requests_total{endpoint="say \\"hi\\"\\\\now\\nplease",status="200"} 1' in lines
+
+
+def test_shards_from_several_threads_are_merged():
+    registry, counter, histogram = _registry()
+
+    def record():
+        for _ in range(1000):
+            counter.inc("/message", 200)
+            histogram.observe(0.5, "/message")
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.value("/message", 200) == 4000
+    assert histogram.snapshot("/message") == (4000, 2000.0)
+    assert 'test_duration_seconds_count{endpoint="/message"} 4000' in registry.render().splitlines()
+
+
+def test_shards_of_finished_threads_are_folded():
+    """A thread per request must not leave a shard per request behind."""
+    registry, counter, histogram = _registry()
+
+    def request():
+        counter.inc("/message", 200)
+        histogram.observe(0.05, "/message")
+
+    for _ in range(200):
+        thread = threading.Thread(target=request)
+        thread.start()
+        thread.join()
+
+    assert counter.value("/message", 200) == 200
+    assert histogram.snapshot("/message") == (200, pytest.approx(10.0))
+    assert len(counter._shards) <= 1
+    assert len(histogram._shards) <= 1
+    # Totals survive further scrapes and new threads
+    request()
+    assert counter.value("/message", 200) == 201
+    assert 'test_duration_seconds_count{endpoint="/message"} 201' in registry.render().splitlines()
@@ -0,0 +1,62 @@
+"""
+Tests for starting and stopping the bot server (server/server.py:run_server)
+
+The bot server and Flask's app.run are replaced by stand-ins, so these only
+check the signal handling and the shutdown path around them.
+
+Run with: python -m pytest test_server_shutdown.py
+"""
+
+import signal
+import threading
+
+import pytest
+
+from server import server as server_module
+
+
+class FakeBotServer:
+    def __init__(self):
+        self.shut_down = False
+
+    def shutdown(self):
+        self.shut_down = True
+
+
+@pytest.fixture
+def fake_server(monkeypatch):
+    runs = []
+    monkeypatch.setattr(server_module, "BotServer", FakeBotServer)
+    monkeypatch.setattr(server_module.app, "run", lambda **kwargs: runs.append(kwargs))
+    previous = {signum: signal.getsignal(signum) for signum in (signal.SIGTERM, signal.SIGINT)}
+    yield runs
+    for signum, handler in previous.items():
+        signal.signal(signum, handler)
+
+
+def test_run_server_on_a_worker_thread(fake_server):
+    """Launchers run the server on a thread, where signal handlers cannot be installed."""
+    errors = []
+
+    def target():
+        try:
+            server_module.run_server(port=8099)
+        except BaseException as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join(10)
+
+    assert errors == []
+    assert fake_server == [{"host": "127.0.0.1", "port": 8099, "debug": False, "threaded": True}]
+    assert server_module.bot_server.shut_down
+    assert signal.getsignal(signal.SIGTERM) is not server_module._exit_on_signal
+
+
+def test_run_server_on_the_main_thread_handles_sigterm(fake_server):
+    server_module.run_server(port=8099)
+
+    assert server_module.bot_server.shut_down
+    assert signal.getsignal(signal.SIGTERM) is server_module._exit_on_signal
+    assert signal.getsignal(signal.SIGINT) is server_module._exit_on_signal
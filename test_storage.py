@@ -0,0 +1,245 @@
+"""
+Tests for the storage backends (util/storage)
+
+Run with: python -m pytest test_storage.py
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import pytest
+
+from util.storage import Storage
+from util.storage.memory import MemoryStorage
+from util.storage.sqlite import SQLiteStorage
+from util.storage.write_behind import WriteBehindStorage
+
+
+def test_backend_missing_a_method_fails_at_creation():
+    class PartialStorage(Storage):
+        def get_balance(self, user_id):
+            return 0.0
+
+    with pytest.raises(TypeError, match="abstract"):
+        PartialStorage()
+
+
+def test_every_backend_implements_the_interface(tmp_path):
+    for storage in (MemoryStorage(), SQLiteStorage(str(tmp_path / "bot.db")), WriteBehindStorage(MemoryStorage())):
+        assert not storage.__abstractmethods__
+        storage.close()
+
+
+@pytest.fixture
+def sqlite_storage(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "bot.db"), timeout=0.3)
+    yield storage
+    storage.close()
+
+
+def test_sqlite_transaction_times_out_while_the_writer_is_busy(sqlite_storage):
+    """A transaction waiting behind a long one gives up after the timeout instead of blocking forever."""
+    entered, release = threading.Event(), threading.Event()
+
+    def long_transaction():
+        with sqlite_storage.transaction():
+            sqlite_storage.add_balance("alice", 10)
+            entered.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=long_transaction)
+    holder.start()
+    entered.wait(5)
+    start = time.monotonic()
+    with pytest.raises(sqlite3.OperationalError):
+        with sqlite_storage.transaction():
+            pass
+    assert time.monotonic() - start < 2
+    release.set()
+    holder.join(5)
+
+    # The abandoned handoff is skipped and the writer keeps working
+    with sqlite_storage.transaction():
+        sqlite_storage.add_balance("alice", 5)
+    sqlite_storage.add_balance("alice", 1)
+    assert sqlite_storage.get_balance("alice") == 16
+
+
+def test_sqlite_transaction_fails_when_the_writer_is_stopped(sqlite_storage):
+    sqlite_storage.close()
+    start = time.monotonic()
+    with pytest.raises(sqlite3.OperationalError):
+        with sqlite_storage.transaction():
+            pass
+    assert time.monotonic() - start < 1
+
+
+def create_backend(backend, tmp_path):
+    """Create a fresh backend; Postgres uses the POSTGRES_* database, which must have db/init.sql applied."""
+    if backend == "memory":
+        return MemoryStorage()
+    if backend == "sqlite":
+        return SQLiteStorage(str(tmp_path / "bot.db"))
+    from util.database import initialize_pool
+    from util.storage.postgres import PostgresStorage
+    initialize_pool(maxconn=20)
+    return PostgresStorage()
+
+
+BACKENDS = ["memory", "sqlite", pytest.param("postgres", marks=pytest.mark.skipif(
+    not os.getenv("POSTGRES_HOST"), reason="set POSTGRES_HOST (and the other POSTGRES_* variables) to test Postgres"))]
+
+
+@pytest.fixture(params=BACKENDS)
+def storage(request, tmp_path):
+    storage = create_backend(request.param, tmp_path)
+    yield storage
+    storage.close()
+
+
+def unique_user(name):
+    """A user ID no earlier run used, so tests can share a Postgres database."""
+    return f"{name}-{uuid.uuid4().hex}"
+
+
+def run_threads(count, target):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+
+
+def test_concurrent_purchases_never_overdraw(storage):
+    """Threads buying against one balance: every debit grants the item and the balance never goes negative."""
+    user_id = unique_user("buyer")
+    storage.add_balance(user_id, 95)
+    results = []
+
+    def buy():
+        for _ in range(5):
+            results.append(storage.purchase(user_id, "Bait Bucket", 10))
+
+    run_threads(8, buy)
+
+    debits = [balance for balance in results if balance is not None]
+    assert len(debits) == 9
+    assert all(balance >= 0 for balance in debits)
+    assert sorted(debits) == [5.0 + 10 * i for i in range(9)]
+    assert storage.get_balance(user_id) == 5.0
+    assert storage.get_item(user_id, "Bait Bucket") == ("Bait Bucket", 9)
+
+
+def test_concurrent_purchases_respect_max_quantity(storage):
+    """Purchases over the max are undone, debit included, even when they race."""
+    user_id = unique_user("buyer")
+    storage.add_balance(user_id, 1000)
+    storage.add_item(user_id, "Old Rod", 100)
+    results = []
+
+    def buy():
+        for _ in range(5):
+            results.append(storage.purchase(user_id, "New Rod", 10, replaces=["Old Rod"], max_quantity=3))
+
+    run_threads(8, buy)
+
+    debits = sum(1 for balance in results if balance is not None)
+    assert debits == 3
+    assert storage.get_balance(user_id) == 1000 - 10 * debits
+    assert storage.get_item(user_id, "New Rod") == ("New Rod", debits)
+    assert storage.get_item(user_id, "Old Rod") == ("Old Rod", 100 - debits)
+
+
+def test_after_transaction_waits_for_the_outermost_transaction(storage):
+    calls = []
+    assert not storage.after_transaction(lambda: calls.append("outside"))
+    with storage.transaction():
+        assert storage.after_transaction(lambda: calls.append("outer"))
+        with storage.transaction():
+            assert storage.after_transaction(lambda: calls.append("nested"))
+        assert calls == []
+    assert calls == ["outer", "nested"]
+
+
+def test_after_transaction_runs_on_rollback(storage):
+    calls = []
+    with pytest.raises(ValueError):
+        with storage.transaction():
+            storage.after_transaction(lambda: calls.append("rolled back"))
+            raise ValueError("abort")
+    assert calls == ["rolled back"]
+    assert not storage.after_transaction(lambda: calls.append("outside"))
+
+
+def test_take_quest_items_takes_fish_first_then_the_inventory(storage):
+    user_id = unique_user("quester")
+    oldest = storage.add_fish(user_id, "Salmon", 3.0, 10.0)
+    storage.add_fish(user_id, "Salmon", 4.0, 12.0)
+    storage.add_fish(user_id, "Salmon", 5.0, 14.0)
+    storage.add_item(user_id, "salmon", 2)
+    storage.add_item(user_id, "Bravo Case", 1)
+
+    assert storage.count_quest_items(user_id, ["Salmon", "Bravo Case"]) == {"Salmon": 5, "Bravo Case": 1}
+    assert storage.take_quest_items(user_id, {"Salmon": 2})
+    assert [fish["weight"] for fish in storage.get_fish(user_id)] == [5.0]
+    assert storage.find_fish(user_id, "Salmon")["id"] != oldest
+
+    assert storage.take_quest_items(user_id, {"Salmon": 2, "Bravo Case": 1})
+    assert storage.get_fish(user_id) == []
+    assert storage.get_inventory(user_id) == [("salmon", 1)]
+
+
+def test_take_quest_items_shortfall_changes_nothing(storage):
+    user_id = unique_user("quester")
+    storage.add_fish(user_id, "Salmon", 3.0, 10.0)
+    storage.add_item(user_id, "Bravo Case", 1)
+
+    assert not storage.take_quest_items(user_id, {"Salmon": 1, "Bravo Case": 2})
+    assert storage.count_quest_items(user_id, ["Salmon", "Bravo Case"]) == {"Salmon": 1, "Bravo Case": 1}
+    # A failed take inside a transaction leaves the rest of the transaction usable
+    with storage.transaction():
+        assert not storage.take_quest_items(user_id, {"Bravo Case": 5})
+        storage.add_balance(user_id, 25)
+    assert storage.get_balance(user_id) == 25
+
+
+def test_concurrent_quest_claims_take_each_item_once(storage):
+    """Threads taking the same requirements: each success takes them once and nothing goes negative."""
+    user_id = unique_user("quester")
+    for weight in range(5):
+        storage.add_fish(user_id, "Salmon", weight + 1.0, 10.0)
+    storage.add_item(user_id, "Bravo Case", 3)
+    results = []
+
+    def claim():
+        for _ in range(3):
+            results.append(storage.take_quest_items(user_id, {"Salmon": 2, "Bravo Case": 1}))
+
+    run_threads(8, claim)
+
+    taken = results.count(True)
+    assert taken == 2
+    assert storage.count_quest_items(user_id, ["Salmon", "Bravo Case"]) == {"Salmon": 1, "Bravo Case": 1}
+
+
+def test_migrate_is_idempotent(storage):
+    """Migrations run on every start, so running them again must change nothing."""
+    storage.migrate()
+    storage.migrate()
+    user_id = unique_user("angler")
+    assert storage.add_autosell(user_id, "Salmon")
+    assert storage.get_autosell(user_id) == ["Salmon"]
+
+
+def test_purchase_max_quantity_ignores_case(storage):
+    """An item stored under different case still counts towards the max on every backend."""
+    user_id = unique_user("buyer")
+    storage.add_balance(user_id, 100)
+    storage.add_item(user_id, "fishing rod", 1)
+
+    assert storage.purchase(user_id, "Fishing Rod", 10, max_quantity=1) is None
+    assert storage.get_balance(user_id) == 100
+    assert storage.get_item(user_id, "Fishing Rod") == ("fishing rod", 1)
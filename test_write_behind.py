@@ -0,0 +1,141 @@
+"""
+Crash-consistency tests for the write-behind fish buffer (util/storage/write_behind.py)
+
+A child process buffers fish in front of a SQLite file and is then killed or
+stopped; the parent reopens the file and checks what survived. Also checks
+that the buffer stops growing while the backend is failing.
+
+Run with: python -m pytest test_write_behind.py
+"""
+
+import json
+import os
+import signal
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from util.storage.memory import MemoryStorage
+from util.storage.sqlite import SQLiteStorage
+from util.storage.write_behind import WriteBehindStorage
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Buffers fish, flushes some, buffers more, then reports and waits to be stopped
+CHILD = textwrap.dedent("""
+    import json, sys, time
+    from util.storage.sqlite import SQLiteStorage
+    from util.storage.write_behind import WriteBehindStorage
+
+    storage = WriteBehindStorage(SQLiteStorage(sys.argv[1]), flush_interval=3600, flush_size=10000)
+    if sys.argv[2] == "sigterm":
+        import signal
+        from server.server import _exit_on_signal
+        signal.signal(signal.SIGTERM, _exit_on_signal)
+
+    flushed = {}
+    for i in range(50):
+        fish_id = storage.add_fish(f"player{i % 5}", f"fish {i}", i + 0.5, i * 2.0)
+        flushed[fish_id] = (f"player{i % 5}", f"fish {i}", i + 0.5, i * 2.0)
+    storage.flush()
+    mapping = {str(fish_id): storage._stored_id(fish_id) for fish_id in flushed}
+
+    pending = {}
+    for i in range(20):
+        fish_id = storage.add_fish("late", f"late fish {i}", 1.0, 1.0)
+        pending[fish_id] = ("late", f"late fish {i}", 1.0, 1.0)
+
+    print(json.dumps({"flushed": {str(k): v for k, v in flushed.items()}, "mapping": mapping,
+                      "pending": {str(k): v for k, v in pending.items()}}), flush=True)
+    try:
+        time.sleep(60)
+    finally:
+        storage.close()
+""")
+
+
+def _run_child(path, mode):
+    """Start the child, wait for its report and stop it with SIGKILL or SIGTERM."""
+    child = subprocess.Popen([sys.executable, "-c", CHILD, path, mode], cwd=ROOT,
+                             stdout=subprocess.PIPE, text=True)
+    try:
+        report = json.loads(child.stdout.readline())
+        child.send_signal(signal.SIGKILL if mode == "kill" else signal.SIGTERM)
+        child.wait(timeout=30)
+    finally:
+        if child.poll() is None:
+            child.kill()
+        child.stdout.close()
+    return report, child.returncode
+
+
+def _stored_fish(path):
+    storage = SQLiteStorage(path)
+    try:
+        users = [f"player{i}" for i in range(5)] + ["late"]
+        return {fish["id"]: (user_id, fish) for user_id in users for fish in storage.get_fish(user_id)}
+    finally:
+        storage.close()
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGKILL"), reason="needs POSIX signals")
+def test_killed_process_keeps_every_flushed_fish(tmp_path):
+    path = str(tmp_path / "bot.db")
+    report, returncode = _run_child(path, "kill")
+    assert returncode == -signal.SIGKILL
+
+    stored = _stored_fish(path)
+    # Every flushed fish is in the file under the ID its temporary ID maps to
+    assert len(report["mapping"]) == 50
+    assert all(int(temporary) < 0 for temporary in report["mapping"])
+    assert len(set(report["mapping"].values())) == 50
+    for temporary, stored_id in report["mapping"].items():
+        assert stored_id is not None and stored_id > 0
+        user_id, name, weight, price = report["flushed"][temporary]
+        stored_user, fish = stored[stored_id]
+        assert (stored_user, fish["name"], fish["weight"], fish["price"]) == (user_id, name, weight, price)
+
+    # Only the fish caught after the flush were lost
+    assert set(stored) == set(report["mapping"].values())
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGKILL"), reason="needs POSIX signals")
+def test_sigterm_flushes_pending_fish(tmp_path):
+    path = str(tmp_path / "bot.db")
+    report, returncode = _run_child(path, "sigterm")
+    assert returncode == 0
+
+    stored = _stored_fish(path)
+    assert len(stored) == 70
+    late = sorted(fish["name"] for user_id, fish in stored.values() if user_id == "late")
+    assert late == sorted(name for _, name, _, _ in report["pending"].values())
+
+
+class FlakyStorage(MemoryStorage):
+    """Memory backend whose batch inserts fail while `down` is set, like a database outage."""
+
+    down = True
+
+    def add_fish_many(self, fish):
+        if self.down:
+            raise ConnectionError("database is down")
+        return super().add_fish_many(fish)
+
+
+def test_pending_buffer_is_capped():
+    """Once max_pending fish wait, new fish are written straight to the backend."""
+    inner = FlakyStorage()
+    storage = WriteBehindStorage(inner, flush_interval=3600, flush_size=5, max_pending=20)
+    ids = [storage.add_fish("alice", "Trout", 1.0, 1.0) for _ in range(30)]
+    assert storage.pending_count() == 20
+    assert all(fish_id < 0 for fish_id in ids[:20])
+    assert all(fish_id > 0 for fish_id in ids[20:])
+    assert storage.count_fish("alice") == 30
+
+    # Once the backend is back, closing writes the buffered fish
+    inner.down = False
+    storage.close()
+    assert storage.pending_count() == 0
+    assert inner.count_fish("alice") == 30
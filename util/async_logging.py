@@ -0,0 +1,131 @@
+"""Queue-based logging so disk and console writes happen off the request path."""
+import atexit
+import itertools
+import json
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, TextIO
+
+DEFAULT_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+# Pass as `extra=SAMPLED` on high-volume lines so only some of them are written
+SAMPLED = {"sampled": True}
+
+_listeners: Dict[str, QueueListener] = {}
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class SampleFilter(logging.Filter):
+    """Keep one in every `every` records marked with SAMPLED; unmarked records and warnings always pass."""
+
+    def __init__(self, every: int = 1) -> None:
+        super().__init__()
+        self.every = max(1, every)
+        self._counter = itertools.count()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.every == 1 or record.levelno >= logging.WARNING or not getattr(record, "sampled", False):
+            return True
+        return next(self._counter) % self.every == 0
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler that never blocks the caller and leaves formatting to the listener thread.
+
+    The standard QueueHandler formats the message before queueing it, which keeps the
+    cost on the caller's thread; here the record is queued as-is and `%`-style arguments
+    are only merged when the listener writes it. When the queue is full the record
+    is dropped and counted instead of waiting.
+    """
+
+    def __init__(self, log_queue: queue.Queue) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logger(name: str, log_file: Optional[str] = None, level: int = logging.INFO, json_format: bool = False,
+                 sample_every: int = 1, queue_size: int = 10000, stream: Optional[TextIO] = None) -> logging.Logger:
+    """
+    Configure a logger that writes to a file and the console from a background thread.
+
+    :param name: Logger name.
+    :param log_file: File to append to, or None to log to the console only.
+    :param level: Minimum level to log.
+    :param json_format: Write one JSON object per line instead of plain text.
+    :param sample_every: Keep one in every N records logged with `extra=SAMPLED`.
+    :param queue_size: Records buffered before new ones are dropped.
+    :param stream: Console stream, defaults to stderr.
+    :return: The configured logger.
+    """
+    logger = logging.getLogger(name)
+    if name in _listeners:
+        return logger
+    logger.setLevel(level)
+
+    formatter = JsonFormatter() if json_format else logging.Formatter(DEFAULT_FORMAT)
+    handlers = [logging.StreamHandler(stream or sys.stderr)]
+    if log_file:
+        handlers.insert(0, logging.FileHandler(log_file, encoding="utf-8"))
+    for handler in handlers:
+        handler.setLevel(level)
+        handler.setFormatter(formatter)
+
+    queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+    queue_handler.addFilter(SampleFilter(sample_every))
+    logger.addHandler(queue_handler)
+
+    listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    listener.start()
+    _listeners[name] = listener
+    return logger
+
+
+def logging_settings(config: dict) -> dict:
+    """Read setup_logger keyword arguments from the configuration."""
+    return {
+        "level": logging.getLevelName(str(config.get("log_level", "INFO")).upper()),
+        "json_format": config.get("log_format", "text") == "json",
+        "sample_every": config.get("log_sample_every", 1),
+    }
+
+
+def stop_logging() -> None:
+    """
+    Flush queued records and stop every background writer.
+
+    Called by the server's SIGTERM/SIGINT shutdown path and again at exit (a second
+    call does nothing). Records logged afterwards stay queued and are not written.
+    """
+    while _listeners:
+        _, listener = _listeners.popitem()
+        listener.stop()
+
+
+atexit.register(stop_logging)
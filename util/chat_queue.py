@@ -0,0 +1,140 @@
+"""Outgoing chat message queue used by the game clients."""
+import threading
+from collections import OrderedDict, deque
+from typing import Deque, List, Optional, Set, Tuple
+
+ChatMessage = Tuple[bool, str]
+
+
+class ChatQueue:
+    """
+    Bounded, de-duplicated outgoing chat queue with per-player fairness.
+
+    Messages are kept in one lane per player and lanes are served round-robin,
+    so a single player spamming commands cannot starve replies to everyone
+    else. Consumers block on a condition variable and wake up as soon as a
+    message is queued or the queue is closed.
+    """
+
+    DROP_POLICIES = ("oldest", "newest")
+
+    def __init__(self, max_size: int = 50, drop_policy: str = "oldest") -> None:
+        """
+        Initialize the queue.
+
+        :param max_size: Maximum number of queued messages across all players.
+        :param drop_policy: What to drop when full: "oldest" drops the oldest message
+            of the busiest player, "newest" rejects the incoming message.
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1.")
+        if drop_policy not in self.DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy '{drop_policy}'. Use one of: {', '.join(self.DROP_POLICIES)}")
+        self.max_size = max_size
+        self.drop_policy = drop_policy
+        self.dropped = 0
+
+        self._lanes: "OrderedDict[Optional[str], Deque[ChatMessage]]" = OrderedDict()
+        self._index: Set[ChatMessage] = set()
+        self._size = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def put(self, is_team: bool, chattext: str, playername: Optional[str] = None) -> bool:
+        """
+        Queue a message.
+
+        :param is_team: Whether the message goes to team chat.
+        :param chattext: The message text.
+        :param playername: The player the message is a reply to, used for fairness.
+        :return: True if the message was queued, False if it was a duplicate,
+            rejected by the drop policy or the queue is closed.
+        """
+        message = (is_team, chattext)
+        with self._condition:
+            if self._closed or message in self._index:
+                return False
+
+            if self._size >= self.max_size:
+                if self.drop_policy == "newest":
+                    self.dropped += 1
+                    return False
+                self._drop_oldest()
+
+            lane = self._lanes.get(playername)
+            if lane is None:
+                lane = self._lanes[playername] = deque()
+            lane.append(message)
+            self._index.add(message)
+            self._size += 1
+            self._condition.notify()
+            return True
+
+    def get(self, timeout: Optional[float] = None) -> Optional[ChatMessage]:
+        """
+        Remove and return the next message, blocking until one is available.
+
+        :param timeout: Maximum time to wait in seconds, or None to wait forever.
+        :return: The (is_team, chattext) tuple, or None on timeout or when the queue is closed.
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._size or self._closed, timeout):
+                return None
+            if not self._size:
+                return None
+            return self._pop_next()
+
+    def drain(self, max_items: Optional[int] = None) -> List[ChatMessage]:
+        """
+        Remove and return all queued messages (up to max_items) without blocking.
+
+        Messages are returned in the same fair order `get` would produce.
+        """
+        with self._condition:
+            messages = []
+            while self._size and (max_items is None or len(messages) < max_items):
+                messages.append(self._pop_next())
+            return messages
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until a message is queued or the queue is closed. Return True if messages are waiting."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._size or self._closed, timeout)
+            return bool(self._size)
+
+    def close(self) -> None:
+        """Close the queue and wake up every waiting consumer."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    @property
+    def closed(self) -> bool:
+        """Whether the queue has been closed."""
+        return self._closed
+
+    def __len__(self) -> int:
+        """Return the number of queued messages."""
+        return self._size
+
+    def _pop_next(self) -> ChatMessage:
+        """Pop the next message round-robin across player lanes. Caller must hold the lock."""
+        playername, lane = next(iter(self._lanes.items()))
+        message = lane.popleft()
+        if lane:
+            self._lanes.move_to_end(playername)
+        else:
+            del self._lanes[playername]
+        self._index.discard(message)
+        self._size -= 1
+        return message
+
+    def _drop_oldest(self) -> None:
+        """Drop the oldest message of the player with the most queued messages. Caller must hold the lock."""
+        playername = max(self._lanes, key=lambda name: len(self._lanes[name]))
+        lane = self._lanes[playername]
+        self._index.discard(lane.popleft())
+        if not lane:
+            del self._lanes[playername]
+        self._size -= 1
+        self.dropped += 1
@@ -0,0 +1,189 @@
+"""Outgoing chat scheduler that packs queued replies into as few chat lines as possible."""
+import logging
+import time
+from collections import deque
+from typing import Callable, List, Optional
+
+from util.chat_queue import ChatQueue, ChatMessage
+
+# CS2 truncates chat lines longer than this many bytes
+DEFAULT_MAX_LENGTH = 127
+DEFAULT_SEPARATOR = " | "
+
+
+def _line_length(text: str) -> int:
+    """Length of a chat line as counted by the game (UTF-8 bytes)."""
+    return len(text.encode("utf-8"))
+
+
+def pack_messages(messages: List[ChatMessage], max_length: int = DEFAULT_MAX_LENGTH,
+                  separator: str = DEFAULT_SEPARATOR) -> List[ChatMessage]:
+    """
+    Coalesce messages for the same channel (team/all) into as few lines as max_length allows.
+
+    Order is preserved within each channel, and channels are emitted in the order
+    they first appear. Messages that are too long on their own are sent unchanged.
+
+    :param messages: List of (is_team, chattext) tuples in send order.
+    :param max_length: Maximum length of a packed chat line.
+    :param separator: Text placed between coalesced messages.
+    :return: List of (is_team, chattext) lines to send.
+    """
+    lines: List[ChatMessage] = []
+    open_line = {}  # is_team -> index into lines of the line still being filled
+    separator_length = _line_length(separator)
+
+    for is_team, chattext in messages:
+        index = open_line.get(is_team)
+        if index is not None:
+            current = lines[index][1]
+            if _line_length(current) + separator_length + _line_length(chattext) <= max_length:
+                lines[index] = (is_team, f"{current}{separator}{chattext}")
+                continue
+        lines.append((is_team, chattext))
+        open_line[is_team] = len(lines) - 1
+
+    return lines
+
+
+class ChatScheduler:
+    """
+    Drain a ChatQueue, pack replies per channel and push them into the game.
+
+    The game interaction is injected as three callables (write the chat cfg, press
+    the load key, press the send key), so the packing, ordering and timing logic
+    can be exercised with a recording stand-in instead of the win32 helpers.
+
+    Instead of fixed sleeps, lines are spaced by a minimum send interval and a
+    flood window: at most `flood_lines` lines are sent per `flood_window` seconds,
+    and the scheduler only waits as long as needed to respect both.
+    """
+
+    def __init__(self, queue: ChatQueue,
+                 write_chat: Callable[[bool, str], None],
+                 load_chat: Callable[[], None],
+                 send_chat: Callable[[], None],
+                 sleep: Callable[[float], None] = time.sleep,
+                 wait_until_resumed: Callable[[], None] = lambda: None,
+                 clock: Callable[[], float] = time.monotonic,
+                 max_length: int = DEFAULT_MAX_LENGTH,
+                 separator: str = DEFAULT_SEPARATOR,
+                 gather_delay: float = 0.05,
+                 write_delay: float = 0.1,
+                 load_delay: float = 0.1,
+                 send_interval: float = 0.5,
+                 flood_lines: int = 5,
+                 flood_window: float = 5.0,
+                 logger: Optional[logging.Logger] = None) -> None:
+        """
+        Initialize the scheduler.
+
+        :param queue: The queue to drain.
+        :param write_chat: Callable writing a line to the chat cfg, called as write_chat(is_team, chattext).
+        :param load_chat: Callable pressing the load chat key.
+        :param send_chat: Callable pressing the send chat key.
+        :param sleep: Sleep function; should return early when the client stops.
+        :param wait_until_resumed: Blocks while the client is paused.
+        :param clock: Monotonic clock used for send spacing.
+        :param max_length: Maximum length of a packed chat line.
+        :param separator: Text placed between coalesced messages.
+        :param gather_delay: Time to wait after the first message so related replies can be packed with it.
+        :param write_delay: Delay between writing the cfg and pressing the load key.
+        :param load_delay: Delay between pressing the load key and the send key.
+        :param send_interval: Minimum time between two sent lines.
+        :param flood_lines: Maximum number of lines sent per flood window.
+        :param flood_window: Length of the flood window in seconds.
+        """
+        self.queue = queue
+        self.write_chat = write_chat
+        self.load_chat = load_chat
+        self.send_chat = send_chat
+        self.sleep = sleep
+        self.wait_until_resumed = wait_until_resumed
+        self.clock = clock
+        self.max_length = max_length
+        self.separator = separator
+        self.gather_delay = gather_delay
+        self.write_delay = write_delay
+        self.load_delay = load_delay
+        self.send_interval = send_interval
+        self.flood_lines = max(1, flood_lines)
+        self.flood_window = flood_window
+        self.logger = logger or logging.getLogger(__name__)
+
+        self.messages_sent = 0
+        self.lines_sent = 0
+        self._sent_at: deque = deque(maxlen=self.flood_lines)
+
+    def run(self, should_stop: Callable[[], bool]) -> None:
+        """Send queued messages until should_stop returns True or the queue is closed."""
+        while not should_stop():
+            if not self.run_once():
+                if self.queue.closed:
+                    break
+
+    def run_once(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for queued messages, pack them and send the resulting lines.
+
+        :param timeout: Maximum time to wait for the first message.
+        :return: True if anything was sent.
+        """
+        if not self.queue.wait(timeout):
+            return False
+        if self.gather_delay > 0:
+            self.sleep(self.gather_delay)
+
+        messages = self.queue.drain()
+        if not messages:
+            return False
+
+        lines = pack_messages(messages, self.max_length, self.separator)
+        self.logger.info(f"Sending {len(messages)} message(s) as {len(lines)} chat line(s).")
+        for is_team, chattext in lines:
+            self.send_line(is_team, chattext)
+        self.messages_sent += len(messages)
+        return True
+
+    def send_line(self, is_team: bool, chattext: str) -> None:
+        """Write, load and send a single chat line, respecting the send spacing."""
+        try:
+            self.write_chat(is_team, chattext)
+            self.sleep(self.write_delay)
+
+            self.wait_until_resumed()
+            self.load_chat()
+            self.sleep(self.load_delay)
+
+            delay = self.next_send_delay()
+            if delay > 0:
+                self.sleep(delay)
+            self.wait_until_resumed()
+            self.send_chat()
+            self._sent_at.append(self.clock())
+            self.lines_sent += 1
+        except Exception as e:
+            self.logger.error(f"Error processing chat message: {e}")
+
+    def next_send_delay(self) -> float:
+        """Return how long to wait before the next line may be sent."""
+        if not self._sent_at:
+            return 0.0
+        now = self.clock()
+        ready_at = self._sent_at[-1] + self.send_interval
+        if len(self._sent_at) >= self.flood_lines:
+            ready_at = max(ready_at, self._sent_at[0] + self.flood_window)
+        return max(0.0, ready_at - now)
+
+
+def scheduler_settings(config: dict) -> dict:
+    """Read the chat scheduler settings from the client configuration."""
+    return {
+        "max_length": config.get("chat_max_length", DEFAULT_MAX_LENGTH),
+        "gather_delay": config.get("chat_gather_delay", 0.05),
+        "write_delay": config.get("chat_write_delay", 0.1),
+        "load_delay": config.get("chat_load_delay", 0.1),
+        "send_interval": config.get("chat_send_interval", 0.5),
+        "flood_lines": config.get("chat_flood_lines", 5),
+        "flood_window": config.get("chat_flood_window", 5.0),
+    }
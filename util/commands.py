@@ -1,6 +1,70 @@
+import ast
 import functools
+import importlib.util as importlib_util
+import inspect
+import os
+import re
+import threading
+import time
 from thefuzz import process, fuzz
 
+
+# A function with its @command_registry.register decorators and docstring
+_COMMAND_PATTERN = re.compile(
+    r"((?:^@command_registry\.register\([^\n]*\)[ \t]*\n)+)^def \w+\(.*?\).*?:[ \t]*\n"
+    r"(?:[ \t]*(?:\"\"\"(.*?)\"\"\"|'''(.*?)'''))?",
+    re.MULTILINE | re.DOTALL,
+)
+_DECORATOR_PATTERN = re.compile(r"^@command_registry\.register\(([^\n]*)\)[ \t]*$", re.MULTILINE)
+
+
+def scan_commands(path):
+    """
+    Find the commands a file registers without importing it.
+
+    Reads the `@command_registry.register(name, aliases=[...])` decorators from the
+    source text; only their arguments are parsed, which keeps indexing every file far
+    cheaper than importing it. A function with several decorators is registered under
+    each of them; the outermost one names it.
+
+    :param path: The command file.
+    :return: A list of {"name", "keys", "doc"}, keys being every name and alias.
+    """
+    with open(path, encoding="utf-8") as file:
+        source = file.read()
+    found = []
+    for match in _COMMAND_PATTERN.finditer(source):
+        keys = []
+        for arguments in _DECORATOR_PATTERN.findall(match.group(1)):
+            call = ast.parse(f"register({arguments})", mode="eval").body
+            keys.append(ast.literal_eval(call.args[0]))
+            for keyword in call.keywords:
+                if keyword.arg == "aliases":
+                    keys.extend(ast.literal_eval(keyword.value) or [])
+        doc = match.group(2) if match.group(2) is not None else match.group(3)
+        found.append({"name": keys[0], "keys": keys, "doc": doc})
+    return found
+
+
+class LazyCommand:
+    """Stands in for a command whose file has not been imported yet; the first call imports it."""
+    is_bot_command = True
+
+    def __init__(self, registry, key, command_name, filename, doc):
+        self.registry = registry
+        self.key = key
+        self.command_name = command_name
+        self.filename = filename
+        self.__doc__ = doc
+
+    def __call__(self, *args, **kwargs):
+        self.registry.import_command_file(self.filename)
+        command = self.registry.commands.get(self.key)
+        if command is None or command is self:
+            raise RuntimeError(f"{self.filename} did not register the command '{self.key}'")
+        return command(*args, **kwargs)
+
+
 class CommandRegistry:
     def __init__(self, logger=None):
         if logger is None:
@@ -14,6 +78,11 @@ class CommandRegistry:
             logger.addHandler(handler)
         self.logger = logger
         self.commands = {}
+        self.import_times = {}  # path -> seconds it took to import the file
+        self._command_files = {}  # filename -> path, for lazy loading
+        self._owners = {}  # command or alias -> filename that registers it, for lazy loading
+        self._imported = set()
+        self._import_lock = threading.Lock()
 
     def register(self, command_name, aliases=None):
         """Decorator to register a command."""
@@ -37,25 +106,54 @@ class CommandRegistry:
 
         return decorator
 
-    def load_commands(self, commands_dir):
-        """Load all commands from the specified directory."""
-        import os
-        import importlib.util as importlib_util
-        import inspect
+    def load_commands(self, commands_dir, lazy=False):
+        """
+        Load all commands from the specified directory.
 
+        :param commands_dir: The directory with the command files.
+        :param lazy: Only index the commands and aliases (see scan_commands); a file is
+                     imported when one of its commands first runs.
+        """
         for filename in os.listdir(commands_dir):
             if filename.endswith(".py"):
-                module_name = filename[:-3]
                 module_path = os.path.join(commands_dir, filename)
-                spec = importlib_util.spec_from_file_location(module_name, module_path)
-                module = importlib_util.module_from_spec(spec)
-                spec.loader.exec_module(module)
-
-                # Inspect the module for functions decorated with @register
-                for _, obj in inspect.getmembers(module, inspect.isfunction):
-                    self.logger.info(f"Attempting to load command: {obj.__name__}")
-                    if getattr(obj, "is_bot_command", False):
-                        self.commands[obj.command_name] = obj
+                if not lazy:
+                    self._exec_command_file(module_path)
+                    continue
+                self._command_files[filename] = module_path
+                # Same order as eager loading, so a name claimed by two files maps to the same one
+                for command in scan_commands(module_path):
+                    for key in command["keys"]:
+                        self._owners[key] = filename
+                        self.commands[key] = LazyCommand(self, key, command["name"], filename, command["doc"])
+
+    def _exec_command_file(self, module_path):
+        """Import a command file and register the commands it defines."""
+        module_name = os.path.basename(module_path)[:-3]
+        start = time.perf_counter()
+        spec = importlib_util.spec_from_file_location(module_name, module_path)
+        module = importlib_util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        self.import_times[module_path] = time.perf_counter() - start
+
+        # Inspect the module for functions decorated with @register
+        for _, obj in inspect.getmembers(module, inspect.isfunction):
+            self.logger.info(f"Attempting to load command: {obj.__name__}")
+            if getattr(obj, "is_bot_command", False):
+                self.commands[obj.command_name] = obj
+
+    def import_command_file(self, filename):
+        """Import a lazily indexed command file, once."""
+        with self._import_lock:
+            if filename in self._imported:
+                return
+            previous = dict(self.commands)
+            self._exec_command_file(self._command_files[filename])
+            # A file may also register a name another file owns; keep the owner's
+            for key, command in list(self.commands.items()):
+                if self._owners.get(key, filename) != filename and key in previous and command is not previous[key]:
+                    self.commands[key] = previous[key]
+            self._imported.add(filename)
 
     def execute(self, command_name, *args, **kwargs):
         """Execute a registered command."""
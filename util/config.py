@@ -33,12 +33,17 @@ def copy_files_to_appdata():
         ("modules/data/fish.json", "fish.json"),
         ("modules/data/scramble_dict.txt", "scramble_dict.txt"),
         ("modules/data/shop.json", "shop.json"),
+        ("modules/data/status_effects.json", "status_effects.json"),
+        ("modules/data/catalog.snapshot", "catalog.snapshot"),
     ]
+    optional_files = {"catalog.snapshot"}  # Only there when compile_catalog.py ran before bundling
 
     for src, dest in files_to_copy:
         src_path = os.path.join(os.path.dirname(__file__), "..", src)
         dest_path = os.path.join(appdata_dir, dest)
 
+        if dest in optional_files and not os.path.exists(src_path):
+            continue
         if not os.path.exists(dest_path):
             try:
                 shutil.copy(src_path, dest_path)
@@ -78,6 +83,8 @@ def generate_default_config() -> dict:
         "command_prefix": "@",
         "pause_buttons": "b,tab,y,`,u,alt+tab",
         "resume_buttons": "enter,esc",
+        # The desktop bundle runs the server in-process, so keep data in a local file
+        "storage": {"backend": "sqlite"},
     }
     config_path = get_config_path()
     os.makedirs(os.path.dirname(config_path), exist_ok=True)  # Ensure the directory exists
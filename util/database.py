@@ -1,14 +1,30 @@
 """Database connection management for PostgreSQL."""
 import os
+import re
+import sys
+import threading
+import time
 import psycopg2
 from psycopg2 import pool
+from psycopg2.extensions import connection as _connection, cursor as _cursor
+from contextlib import contextmanager
 from typing import Optional
 import logging
 
+from util.metrics import db_query_duration, db_slow_queries, db_n_plus_one, metrics_registry
+from util.request_context import current_command, current_query_log
+
 logger = logging.getLogger(__name__)
 
 # Connection pool
-_connection_pool: Optional[pool.SimpleConnectionPool] = None
+_connection_pool: Optional[pool.ThreadedConnectionPool] = None
+
+# Connection shared by every query on the current thread (see shared_connection)
+_local = threading.local()
+
+# Query instrumentation settings (see configure_instrumentation)
+_slow_query_seconds = 0.1
+_n_plus_one_threshold = 5
 
 
 def get_db_config():
@@ -28,27 +44,222 @@ def initialize_pool(minconn=1, maxconn=10):
     if _connection_pool is None:
         config = get_db_config()
         logger.info(f"Initializing connection pool to {config['host']}:{config['port']}/{config['database']}")
-        _connection_pool = pool.SimpleConnectionPool(
+        _connection_pool = pool.ThreadedConnectionPool(
             minconn,
             maxconn,
+            connection_factory=InstrumentedConnection,
             **config
         )
         logger.info("Connection pool initialized successfully")
 
 
 def get_connection():
-    """Get a connection from the pool."""
+    """Get a connection from the pool, or the thread's shared connection if one is bound."""
+    shared = getattr(_local, "conn", None)
+    if shared is not None:
+        return shared
     if _connection_pool is None:
         initialize_pool()
     return _connection_pool.getconn()
 
 
 def return_connection(conn):
-    """Return a connection to the pool."""
+    """Return a connection to the pool. The thread's shared connection is kept until released."""
+    if conn is getattr(_local, "conn", None):
+        return
     if _connection_pool is not None:
         _connection_pool.putconn(conn)
 
 
+@contextmanager
+def shared_connection():
+    """
+    Bind a single pooled connection to the current thread for the duration of the block.
+
+    Every DatabaseConnection and get_connection call made inside the block reuses
+    this connection instead of checking one out of the pool, so a batch of messages
+    costs one pool round trip. Nested calls reuse the outer connection.
+    """
+    if getattr(_local, "conn", None) is not None:
+        yield _local.conn
+        return
+
+    conn = get_connection()
+    _local.conn = conn
+    try:
+        yield conn
+    except Exception:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+    finally:
+        _local.conn = None
+        return_connection(conn)
+
+
+@contextmanager
+def transaction():
+    """
+    Run every query inside the block in one database transaction.
+
+    The block shares the thread's connection (see shared_connection); DatabaseConnection
+    blocks inside it do not commit, and the whole block is committed on exit or rolled
+    back if it raises. Nested calls join the outer transaction.
+    """
+    if getattr(_local, "transaction_depth", 0):
+        _local.transaction_depth += 1
+        try:
+            yield _local.conn
+        finally:
+            _local.transaction_depth -= 1
+        return
+
+    with shared_connection() as conn:
+        _local.transaction_depth = 1
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+        finally:
+            _local.transaction_depth = 0
+
+
+def pool_stats():
+    """Return the number of pooled connections in use and idle, and the pool size."""
+    if _connection_pool is None:
+        return {"in_use": 0, "idle": 0, "max": 0}
+    return {
+        "in_use": len(_connection_pool._used),
+        "idle": len(_connection_pool._pool),
+        "max": _connection_pool.maxconn,
+    }
+
+
+metrics_registry.gauge(
+    "bot_db_pool_connections", "Database pool connections by state.", ["state"],
+    callback=lambda: {(state,): value for state, value in pool_stats().items()},
+)
+
+
+def configure_instrumentation(slow_query_ms=100, n_plus_one_threshold=5):
+    """
+    Configure query instrumentation.
+
+    :param slow_query_ms: Queries taking at least this long are logged as slow.
+    :param n_plus_one_threshold: Flag a request once one query fingerprint runs more than this many times.
+    """
+    global _slow_query_seconds, _n_plus_one_threshold
+    _slow_query_seconds = slow_query_ms / 1000
+    _n_plus_one_threshold = n_plus_one_threshold
+
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PLACEHOLDERS = re.compile(r"%\(\w+\)s|%s")
+_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+_fingerprints = {}
+
+
+def fingerprint_query(query: str) -> str:
+    """Normalize a statement so executions that differ only in their values share a fingerprint."""
+    fingerprint = _fingerprints.get(query)
+    if fingerprint is None:
+        fingerprint = _PLACEHOLDERS.sub("?", _LITERALS.sub("?", query))
+        fingerprint = _WHITESPACE.sub(" ", _LISTS.sub("(?+)", fingerprint)).strip()
+        if len(_fingerprints) < 4096:
+            _fingerprints[query] = fingerprint
+    return fingerprint
+
+
+_caller_modules = {}
+
+
+def _calling_module() -> str:
+    """Return the name of the bot module (in the modules directory) that issued the current query."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        module = _caller_modules.get(filename)
+        if module is None:
+            directory, basename = os.path.split(filename)
+            module = _caller_modules[filename] = (
+                os.path.splitext(basename)[0] if os.path.basename(directory) == "modules" else ""
+            )
+        if module:
+            return module
+        frame = frame.f_back
+    return "none"
+
+
+def _record_query(cursor, query, duration):
+    """Record a finished query in the metrics and the current request's query log."""
+    command = current_command()
+    db_query_duration.observe(duration, command)
+
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "replace")
+    elif not isinstance(query, str):
+        query = query.as_string(cursor)
+    fingerprint = fingerprint_query(query)
+    module = _calling_module()
+
+    if duration >= _slow_query_seconds:
+        db_slow_queries.inc(command, module)
+        logger.warning(f"Slow query ({duration * 1000:.1f} ms, {cursor.rowcount} rows) from {module}/{command}: {fingerprint}")
+
+    log = current_query_log()
+    if log is not None and log.record(fingerprint, duration, cursor.rowcount, module, command) == _n_plus_one_threshold + 1:
+        log.flagged.append(fingerprint)
+        db_n_plus_one.inc(command, module)
+        logger.warning(f"Possible N+1: query ran more than {_n_plus_one_threshold} times in one request from {module}/{command}: {fingerprint}")
+
+
+class InstrumentedCursorMixin:
+    """Cursor mixin that records the fingerprint, duration, rows and caller of every query."""
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            _record_query(self, query, time.perf_counter() - start)
+
+    def executemany(self, query, vars_list):
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            _record_query(self, query, time.perf_counter() - start)
+
+
+_instrumented_cursors = {}
+
+
+def instrumented_cursor_class(cursor_class):
+    """Return an instrumented subclass of a cursor class (e.g. RealDictCursor)."""
+    if issubclass(cursor_class, InstrumentedCursorMixin):
+        return cursor_class
+    instrumented = _instrumented_cursors.get(cursor_class)
+    if instrumented is None:
+        instrumented = _instrumented_cursors[cursor_class] = type(
+            f"Instrumented{cursor_class.__name__}", (InstrumentedCursorMixin, cursor_class), {}
+        )
+    return instrumented
+
+
+class InstrumentedConnection(_connection):
+    """Connection whose cursors, whatever their cursor_factory, are instrumented."""
+
+    def cursor(self, *args, **kwargs):
+        cursor_factory = kwargs.get("cursor_factory") or self.cursor_factory or _cursor
+        kwargs["cursor_factory"] = instrumented_cursor_class(cursor_factory)
+        return super().cursor(*args, **kwargs)
+
+
 def close_pool():
     """Close all connections in the pool."""
     global _connection_pool
@@ -71,10 +282,12 @@ class DatabaseConnection:
         return self.cursor
     
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if exc_type is not None:
-            self.conn.rollback()
-        else:
-            self.conn.commit()
+        # Inside transaction() the enclosing block commits or rolls back
+        if not getattr(_local, "transaction_depth", 0):
+            if exc_type is not None:
+                self.conn.rollback()
+            else:
+                self.conn.commit()
         
         if self.cursor:
             self.cursor.close()
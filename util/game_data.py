@@ -0,0 +1,365 @@
+"""Validated, indexed and read-only game data built from the JSON catalogs."""
+import bisect
+import hashlib
+import itertools
+import os
+import pickle
+import random
+from types import MappingProxyType
+
+from util.module_registry import module_registry
+
+RARITIES = ("Common", "Uncommon", "Rare", "Epic", "Legendary", "Mythical")  # Rarities increasing in value
+CASE_ODDS = {  # Chance of each case tier; a case without items in a tier shares its chance among the others
+    "mil-spec": .7995, "restricted": .15, "classified": .042, "covert": .006, "exceedingly-rare": .0025,
+}
+SNAPSHOT_VERSION = 2  # Bump when the snapshot layout or the validation rules change
+
+
+def freeze(value):
+    """Return a read-only copy of parsed JSON: dicts become mapping proxies and lists tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+class UpgradeGraph:
+    """
+    The `replaces` links of one shop category, compiled to answer what a player may buy.
+
+    Walking the category from its best item down, an upgrade is offered when the player
+    owns an item it replaces, an item that replaces nothing is always offered, and the
+    walk stops at the first item the player owns.
+    """
+
+    def __init__(self, items):
+        """
+        :param items: The category's items, worst first as in shop.json.
+        """
+        self.items = tuple(reversed(items))
+        self.position = {item["name"]: index for index, item in enumerate(self.items)}
+        self.bases = tuple(index for index, item in enumerate(self.items) if item.get("replaces") is None)
+        replaced_by = {}
+        for index, item in enumerate(self.items):
+            replaces = item.get("replaces")
+            for name in [replaces] if isinstance(replaces, str) else replaces or []:
+                replaced_by.setdefault(name, []).append(index)
+        self.replaced_by = {name: tuple(indexes) for name, indexes in replaced_by.items()}
+
+    def involves(self, name):
+        """Return whether owning this item changes what the category offers."""
+        return name in self.position or name in self.replaced_by
+
+    def allowed(self, owned):
+        """
+        :param owned: Names of the items the player owns.
+        :return: The items the player may buy, best first.
+        """
+        stop = min((self.position[name] for name in owned if name in self.position), default=len(self.items))
+        offered = set(self.bases[:bisect.bisect_left(self.bases, stop)])
+        for name in owned:
+            offered.update(index for index in self.replaced_by.get(name, ()) if index < stop)
+        return [self.items[index] for index in sorted(offered)]
+
+
+class AliasTable:
+    """
+    Draws from a fixed discrete distribution in constant time (Walker's alias method).
+
+    Each of the n columns holds one outcome, the probability of keeping it and the
+    column to take instead, so a draw is one random number and one comparison.
+    """
+
+    def __init__(self, outcomes, weights):
+        """
+        :param outcomes: The values to draw.
+        :param weights: Their relative weights; zero weights are never drawn.
+        :raises ValueError: If there is nothing to draw.
+        """
+        outcomes = [outcome for outcome, weight in zip(outcomes, weights) if weight > 0]
+        weights = [weight for weight in weights if weight > 0]
+        if not outcomes:
+            raise ValueError("An alias table needs at least one outcome with a positive weight")
+        count = len(outcomes)
+        total = sum(weights)
+        scaled = [weight * count / total for weight in weights]
+        keep = [1.0] * count
+        alias = list(range(count))
+        small = [index for index, weight in enumerate(scaled) if weight < 1]
+        large = [index for index, weight in enumerate(scaled) if weight >= 1]
+        while small and large:
+            low, high = small.pop(), large.pop()
+            keep[low] = scaled[low]
+            alias[low] = high
+            scaled[high] -= 1 - scaled[low]
+            (small if scaled[high] < 1 else large).append(high)
+        # Whatever is left is 1 up to rounding and keeps its own outcome
+        self.outcomes = tuple(outcomes)
+        self.keep = tuple(keep)
+        self.alias = tuple(alias)
+
+    def draw(self, rng=random):
+        """Return one outcome."""
+        position = rng.random() * len(self.outcomes)
+        column = int(position)
+        return self.outcomes[column if position - column < self.keep[column] else self.alias[column]]
+
+    def draw_many(self, count, rng=random):
+        """Return a list of `count` independent outcomes."""
+        outcomes, keep, alias, size, uniform = self.outcomes, self.keep, self.alias, len(self.outcomes), rng.random
+        drawn = []
+        for position in (uniform() * size for _ in range(count)):
+            column = int(position)
+            drawn.append(outcomes[column if position - column < keep[column] else alias[column]])
+        return drawn
+
+    def probabilities(self):
+        """Return the probability of each outcome, in the order of `outcomes`."""
+        probabilities = [0.0] * len(self.outcomes)
+        share = 1 / len(self.outcomes)
+        for column, (keep, alias) in enumerate(zip(self.keep, self.alias)):
+            probabilities[column] += keep * share
+            probabilities[alias] += (1 - keep) * share
+        return probabilities
+
+
+class CatalogData:
+    """
+    One validated, indexed and read-only version of the game data.
+
+    A version never changes after it is built; reloading builds a new one.
+    """
+
+    def __init__(self, fish, shop, cases, quests, status_effects, mtimes=None, validate=True):
+        """
+        :param fish, shop, cases, quests, status_effects: The parsed JSON files.
+        :param mtimes: {path: mtime} of the files this version was read from.
+        :param validate: False for data that already passed validation (a snapshot).
+        :raises ValueError: If the data is invalid.
+        """
+        if validate:
+            self.validate(fish, shop, cases, quests, status_effects)
+        self.mtimes = dict(mtimes or {})
+        self.fish = freeze(fish)
+        self.shop = freeze(shop)
+        self.cases = MappingProxyType({case["name"]: case for case in freeze(cases)})
+        self.quests = freeze(quests)
+        self.status_effects = freeze(status_effects)
+        self.build_indexes()
+
+    def validate(self, fish, shop, cases, quests, status_effects):
+        """
+        Check the catalogs for mistakes that would otherwise surface as errors mid-game.
+        Quest requirements naming unknown items only make a quest impossible, so they are
+        logged as warnings.
+
+        :raises ValueError: Listing every problem found.
+        """
+        problems = []
+        warnings = []
+
+        fish_names = set()
+        for item in fish:
+            name = item.get("name")
+            if not name:
+                problems.append(f"fish.json: entry without a name: {item}")
+                continue
+            if name in fish_names:
+                problems.append(f"fish.json: duplicate name '{name}'")
+            fish_names.add(name)
+            if item.get("type") not in ("fish", "item"):
+                problems.append(f"fish.json: '{name}' has unknown type {item.get('type')!r}")
+            if item.get("rarity") not in RARITIES:
+                problems.append(f"fish.json: '{name}' has unknown rarity {item.get('rarity')!r}")
+            if not isinstance(item.get("catch_rate"), (int, float)) or item["catch_rate"] < 0:
+                problems.append(f"fish.json: '{name}' needs a non-negative catch_rate")
+            if item.get("type") == "fish":
+                if any(not isinstance(item.get(key), (int, float)) for key in ("min_weight", "max_weight", "price_multiplier")):
+                    problems.append(f"fish.json: '{name}' needs min_weight, max_weight and price_multiplier")
+                elif item["min_weight"] > item["max_weight"]:
+                    problems.append(f"fish.json: '{name}' has min_weight above max_weight")
+
+        shop_names = set()
+        for category, items in shop.items():
+            for item in items:
+                name = item.get("name")
+                if not name or not isinstance(item.get("price"), (int, float)):
+                    problems.append(f"shop.json: {category} entry needs a name and a price: {item}")
+                    continue
+                if name in shop_names:
+                    problems.append(f"shop.json: duplicate name '{name}'")
+                shop_names.add(name)
+        for category, items in shop.items():
+            for item in items:
+                replaces = item.get("replaces") or []
+                for replaced in [replaces] if isinstance(replaces, str) else replaces:
+                    if replaced not in shop_names:
+                        problems.append(f"shop.json: '{item.get('name')}' replaces unknown item '{replaced}'")
+                for effect in item.get("attributes", {}).get("effects", []):
+                    module_id, _, effect_id = effect.partition(".")
+                    if effect_id not in status_effects.get(module_id, {}):
+                        problems.append(f"shop.json: '{item.get('name')}' has unknown effect '{effect}'")
+
+        for case in cases:
+            if not case.get("name") or not isinstance(case.get("items"), dict):
+                problems.append(f"cases.json: entry needs a name and items: {case.get('name')!r}")
+                continue
+            for tier, tier_items in case["items"].items():
+                if tier not in CASE_ODDS:
+                    problems.append(f"cases.json: '{case['name']}' has unknown tier '{tier}'")
+                for item in tier_items:
+                    if not item.get("name") or not isinstance(item.get("price"), (int, float)):
+                        problems.append(f"cases.json: '{case['name']}' {tier} entry needs a name and a price: {item}")
+            if not any(case["items"].get(tier) for tier in CASE_ODDS):
+                problems.append(f"cases.json: '{case['name']}' has no items to drop")
+
+        quest_ids = set()
+        for quest in quests:
+            quest_id = quest.get("id")
+            if not quest_id or quest_id in quest_ids:
+                problems.append(f"quests.json: missing or duplicate id {quest_id!r}")
+            quest_ids.add(quest_id)
+            if not isinstance(quest.get("weight"), (int, float)) or not quest.get("requirements"):
+                problems.append(f"quests.json: '{quest_id}' needs a weight and requirements")
+            for requirement in quest.get("requirements", []):
+                if requirement.get("name") not in fish_names | shop_names:
+                    warnings.append(f"quests.json: '{quest_id}' requires unknown item '{requirement.get('name')}'")
+
+        for warning in warnings:
+            module_registry.logger.warning(warning)
+        if problems:
+            raise ValueError("Invalid game data:\n" + "\n".join(problems))
+
+    def build_indexes(self):
+        """
+        Build the lookup tables.
+
+        - items: name -> {"name", "type", "category", "data"} for every known item; shop
+          entries win over fish.json, which wins over cases.json.
+        - aliases: lowercase name or alias -> item data.
+        - names_by_type: lowercase type -> frozenset of names.
+        - fish_by_name: fish.json entries by name; shop_items: shop entries by name.
+        - fish_by_rarity / fish_from_rarity: fish.json entries of a rarity / of a rarity or better.
+        - by_category: shop category (or "fish", "item", "cases") -> tuple of item data.
+        - by_lowercase_name: the same categories -> {lowercase name: item data}, the
+          choices for fuzzy matching.
+        - catch_tables: minimum rarity -> (fish_from_rarity, running totals of their
+          catch rates), so a cast picks its catch with one bisect.
+        - shop_categories: lowercase shop category -> category.
+        - upgrade_graphs: shop category with `replaces` links -> UpgradeGraph.
+        - case_tables: case name -> AliasTable of (tier, item) drops, each tier's chance
+          split evenly among its items.
+        """
+        items = {}
+        by_category = {}
+        for name, case in self.cases.items():
+            items[name] = {"name": name, "type": "case", "category": "cases", "data": case}
+            by_category.setdefault("cases", []).append(case)
+        for item in self.fish:
+            items[item["name"]] = {"name": item["name"], "type": item["type"].lower(), "category": item["type"], "data": item}
+            by_category.setdefault(item["type"], []).append(item)
+        for category, category_items in self.shop.items():
+            for item in category_items:
+                items[item["name"]] = {"name": item["name"], "type": (item.get("type") or "").lower() or None,
+                                       "category": category, "data": item}
+            by_category[category] = list(category_items)
+
+        aliases = {}
+        names_by_type = {}
+        for name, entry in items.items():
+            aliases[name.lower()] = entry["data"]
+            for alias in entry["data"].get("aliases", ()):
+                aliases.setdefault(alias.lower(), entry["data"])
+            if entry["type"]:
+                names_by_type.setdefault(entry["type"], set()).add(name)
+
+        self.items = MappingProxyType({name: MappingProxyType(entry) for name, entry in items.items()})
+        self.aliases = MappingProxyType(aliases)
+        self.names_by_type = MappingProxyType({item_type: frozenset(names) for item_type, names in names_by_type.items()})
+        self.fish_by_name = MappingProxyType({item["name"]: item for item in self.fish})
+        self.shop_items = MappingProxyType({item["name"]: item for category in self.shop.values() for item in category})
+        self.fish_by_rarity = MappingProxyType({
+            rarity: tuple(item for item in self.fish if item["rarity"] == rarity) for rarity in RARITIES
+        })
+        self.fish_from_rarity = MappingProxyType({
+            rarity: tuple(item for item in self.fish if RARITIES.index(item["rarity"]) >= RARITIES.index(rarity))
+            for rarity in RARITIES
+        })
+        self.by_category = MappingProxyType({category: tuple(values) for category, values in by_category.items()})
+        self.by_lowercase_name = MappingProxyType({
+            category: MappingProxyType({item["name"].lower(): item for item in values})
+            for category, values in self.by_category.items()
+        })
+        self.shop_categories = MappingProxyType({category.lower(): category for category in self.shop})
+        self.upgrade_graphs = MappingProxyType({
+            category: UpgradeGraph(category_items) for category, category_items in self.shop.items()
+            if any(item.get("replaces") is not None for item in category_items)
+        })
+        self.catch_tables = MappingProxyType({
+            rarity: (fish, tuple(itertools.accumulate(item["catch_rate"] for item in fish)))
+            for rarity, fish in self.fish_from_rarity.items()
+        })
+        self.case_tables = MappingProxyType({name: self.build_case_table(case) for name, case in self.cases.items()})
+
+    @staticmethod
+    def build_case_table(case):
+        """Return the AliasTable of a case's (tier, item) drops."""
+        tiers = [(tier, case["items"].get(tier, ())) for tier in CASE_ODDS]
+        drops = [(tier, item) for tier, tier_items in tiers for item in tier_items]
+        weights = [CASE_ODDS[tier] / len(tier_items) for tier, tier_items in tiers for _ in tier_items]
+        return AliasTable(drops, weights)
+
+    def get_item_data(self, item_name):
+        """Return the data of any known item by exact name, or None."""
+        entry = self.items.get(item_name)
+        return entry["data"] if entry else None
+
+    def find_fish(self, name):
+        """Return the fish.json entry with this name (case-insensitive), or None."""
+        entry = self.fish_by_name.get(name)
+        if entry is None:
+            data = self.aliases.get(name.lower())
+            entry = self.fish_by_name.get(data["name"]) if data else None
+        return entry
+
+
+def fingerprint(content):
+    """Return the fingerprint of a data file's content (None for a missing file)."""
+    return hashlib.sha1(content).hexdigest() if content is not None else None
+
+
+def read_snapshot(path, fingerprints):
+    """
+    Load the sources stored in a catalog snapshot.
+
+    :param path: The snapshot file.
+    :param fingerprints: {catalog: fingerprint} of the data files as they are now.
+    :return: {catalog: parsed data}, or None if the snapshot is missing, unreadable,
+             from another version or built from different files.
+    """
+    try:
+        with open(path, "rb") as file:
+            snapshot = pickle.load(file)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        module_registry.logger.warning(f"Ignoring unreadable catalog snapshot {path}: {e}")
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION \
+            or snapshot.get("fingerprints") != fingerprints:
+        return None
+    return snapshot["sources"]
+
+
+def write_snapshot(path, fingerprints, sources):
+    """
+    Store validated sources with the fingerprints of the files they came from.
+    Written to a temporary file first, so a reader never sees half a snapshot.
+    """
+    snapshot = {"version": SNAPSHOT_VERSION, "fingerprints": fingerprints, "sources": sources}
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as file:
+        pickle.dump(snapshot, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, path)
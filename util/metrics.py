@@ -0,0 +1,268 @@
+"""Low-overhead metrics recorder with Prometheus text exposition."""
+import math
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond cache hits to client timeouts
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _escape(value) -> str:
+    """Escape a label value for the exposition format."""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: Optional[Tuple[str, str]] = None) -> str:
+    """Render a {name="value",...} label set."""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    """Render a sample value."""
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _ShardedMetric:
+    """
+    Base class for metrics recorded into per-thread shards.
+
+    Every thread writes to its own dictionary of series, so recording an
+    observation never takes a lock; the lock is only taken the first time a
+    thread records anything and when the shards are merged for a scrape. Both
+    also fold the shards of finished threads into one retired total, so a server
+    that starts a thread per request keeps one shard per live thread.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, Dict[tuple, list]]] = []
+        self._retired: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def _shard(self) -> Dict[tuple, list]:
+        """Create and register the calling thread's shard."""
+        shard = {}
+        with self._lock:
+            self._retire_finished()
+            self._shards.append((threading.current_thread(), shard))
+        self._local.shard = shard
+        return shard
+
+    @staticmethod
+    def _add(total: Dict[tuple, list], shard: Dict[tuple, list]) -> None:
+        """Add every series of shard to total."""
+        for labels, cell in list(shard.items()):
+            existing = total.get(labels)
+            if existing is None:
+                total[labels] = list(cell)
+            else:
+                for i, value in enumerate(cell):
+                    existing[i] += value
+
+    def _retire_finished(self) -> None:
+        """Fold the shards of finished threads into the retired total. Caller must hold the lock."""
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                # The thread is gone, so nobody writes to its shard any more
+                self._add(self._retired, shard)
+        self._shards = live
+
+    def _merged(self) -> Dict[tuple, list]:
+        """Sum the retired total and the shards of every live thread."""
+        with self._lock:
+            self._retire_finished()
+            shards = [shard for _, shard in self._shards]
+            merged: Dict[tuple, list] = {}
+            self._add(merged, self._retired)
+        for shard in shards:
+            self._add(merged, shard)
+        return merged
+
+    def render(self) -> List[str]:
+        """Render the metric in the Prometheus text format."""
+        raise NotImplementedError
+
+
+class Counter(_ShardedMetric):
+    """Monotonically increasing counter."""
+
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        """Increase the counter for the given label values."""
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._shard()
+        cell = shard.get(labels)
+        if cell is None:
+            shard[labels] = [amount]
+        else:
+            cell[0] += amount
+
+    def value(self, *labels) -> float:
+        """Return the current total for the given label values."""
+        cell = self._merged().get(labels)
+        return cell[0] if cell else 0
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(cell[0])}"
+            for labels, cell in sorted(self._merged().items())
+        ]
+
+
+class Histogram(_ShardedMetric):
+    """Histogram with fixed buckets; each series stores bucket counts followed by the sum."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._size = len(self.buckets) + 2  # finite buckets, +Inf bucket, sum
+
+    def observe(self, value: float, *labels) -> None:
+        """Record an observation for the given label values."""
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._shard()
+        cell = shard.get(labels)
+        if cell is None:
+            cell = shard[labels] = [0] * self._size
+        cell[bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def snapshot(self, *labels) -> Tuple[int, float]:
+        """Return (count, sum) for the given label values."""
+        cell = self._merged().get(labels)
+        if not cell:
+            return 0, 0.0
+        return sum(cell[:-1]), cell[-1]
+
+    def render(self) -> List[str]:
+        lines = []
+        bounds = self.buckets + (math.inf,)
+        for labels, cell in sorted(self._merged().items()):
+            cumulative = 0
+            for bound, count in zip(bounds, cell):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, ('le', _format_value(bound)))} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(cell[-1])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose values are read from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], Dict[tuple, float]]] = None) -> None:
+        """
+        :param callback: Returns a dictionary mapping label value tuples to values.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        if self.callback is None:
+            return []
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(self.callback().items())
+        ]
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together by the /metrics endpoint."""
+
+    def __init__(self) -> None:
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric '{name}' is already registered as a {metric.kind}.")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Get or create a counter."""
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Get or create a histogram."""
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              callback: Optional[Callable[[], Dict[tuple, float]]] = None) -> Gauge:
+        """Get or create a callback gauge. A new callback replaces the previous one."""
+        metric = self._get_or_create(Gauge, name, documentation, labelnames)
+        if callback is not None:
+            metric.callback = callback
+        return metric
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Global registry and the metrics shared across the server
+metrics_registry = MetricsRegistry()
+
+request_duration = metrics_registry.histogram(
+    "bot_request_duration_seconds", "HTTP request handling time.", ["endpoint"])
+requests_total = metrics_registry.counter(
+    "bot_requests_total", "HTTP requests by endpoint and status code.", ["endpoint", "status"])
+message_duration = metrics_registry.histogram(
+    "bot_message_duration_seconds", "Total processing time of a chat message.")
+command_duration = metrics_registry.histogram(
+    "bot_command_duration_seconds", "Command execution time.", ["command"])
+command_errors = metrics_registry.counter(
+    "bot_command_errors_total", "Commands that raised an exception.", ["command"])
+module_duration = metrics_registry.histogram(
+    "bot_module_duration_seconds", "Time spent in a module's process() hook.", ["module"])
+module_errors = metrics_registry.counter(
+    "bot_module_errors_total", "Module process() hooks that raised an exception.", ["module"])
+db_query_duration = metrics_registry.histogram(
+    "bot_db_query_duration_seconds", "Database query time by the command that issued it.", ["command"])
+db_slow_queries = metrics_registry.counter(
+    "bot_db_slow_queries_total", "Queries slower than the slow-query threshold.", ["command", "module"])
+db_n_plus_one = metrics_registry.counter(
+    "bot_db_n_plus_one_total", "Requests that repeated one query fingerprint too often.", ["command", "module"])
+cache_requests = metrics_registry.counter(
+    "bot_cache_requests_total", "Cache lookups by cache and result (hit/miss).", ["cache", "result"])
@@ -1,6 +1,74 @@
 import os
 import importlib.util as importlib_util
 import inspect
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# A `process` method, which makes a module see every chat line
+_PROCESS_METHOD = re.compile(r"^    def process\(", re.MULTILINE)
+
+
+def find_cycle(dependencies, names):
+    """Return one dependency cycle among names as [a, b, ..., a]."""
+    path = []
+    on_path = set()
+    visited = set()
+
+    def visit(name):
+        path.append(name)
+        on_path.add(name)
+        for dependency in dependencies[name]:
+            if dependency in on_path:
+                return path[path.index(dependency):] + [dependency]
+            if dependency in names and dependency not in visited:
+                cycle = visit(dependency)
+                if cycle:
+                    return cycle
+        visited.add(name)
+        on_path.discard(path.pop())
+        return None
+
+    for name in sorted(names):
+        if name not in visited:
+            cycle = visit(name)
+            if cycle:
+                return cycle
+    return list(names)
+
+
+def topological_order(dependencies):
+    """
+    Order names so that each comes after everything it depends on (Kahn's algorithm).
+    Names without an order between them keep the order of the dict.
+
+    :param dependencies: {name: names it depends on}; every dependency must be a key.
+    :return: The names in load order.
+    :raises RuntimeError: If there is a cycle, naming it.
+    """
+    remaining = {name: len(set(names)) for name, names in dependencies.items()}
+    dependents = {name: [] for name in dependencies}
+    for name, names in dependencies.items():
+        for dependency in set(names):
+            dependents[dependency].append(name)
+
+    ready = [name for name, count in remaining.items() if not count]
+    order = []
+    while ready:
+        name = ready.pop(0)
+        order.append(name)
+        for dependent in dependents[name]:
+            remaining[dependent] -= 1
+            if not remaining[dependent]:
+                ready.append(dependent)
+
+    if len(order) < len(dependencies):
+        blocked = {name for name in dependencies if name not in order}
+        cycle = find_cycle(dependencies, blocked)
+        raise RuntimeError(f"Circular dependency detected among modules: {' -> '.join(cycle)}")
+    return order
+
 
 class ModuleRegistry:
     def __init__(self, logger=None):
@@ -15,69 +83,183 @@ class ModuleRegistry:
             logger.addHandler(handler)
         self.logger = logger
         self.modules = {}
+        self.module_paths = {}  # name -> path of every module file found by load_modules
+        self.import_times = {}  # path -> seconds it took to import the file
+        self.init_times = {}  # name -> seconds it took to instantiate the module
+        self.lazy = False
+        self._local = threading.local()
+        self._loading = []  # modules being loaded on demand, outermost first
+        self._load_lock = threading.RLock()
 
     def register(self, module_name, module_instance):
         """Register a module instance with a given name."""
-        self.modules[module_name] = module_instance
+        if inspect.isclass(module_instance):
+            # Some modules register their class at import; the loader instantiates it like the others
+            return
+        # Copy on write, so threads iterating the modules never see the dict change size
+        with self._load_lock:
+            self.modules = {**self.modules, module_name: module_instance}
+
+    def import_module(self, module_name):
+        """Import a module file and return the class it defines, or None."""
+        module_path = self.module_paths[module_name]
+        start = time.perf_counter()
+        spec = importlib_util.spec_from_file_location(module_name, module_path)
+        module = importlib_util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        self.import_times[module_path] = time.perf_counter() - start
+
+        # Look for a class defined in the module itself
+        module_class = None
+        for _, obj in inspect.getmembers(module, inspect.isclass):
+            if obj.__module__ == module_name:
+                module_class = obj
+        return module_class
+
+    def reads_input(self, module_name):
+        """Return whether a module file defines a `process` method (sees every chat line), without importing it."""
+        with open(self.module_paths[module_name], encoding="utf-8") as file:
+            return _PROCESS_METHOD.search(file.read()) is not None
 
-    def load_modules(self, modules_dir):
-        """Load all modules from the specified directory, respecting load_after dependencies."""
+    def load_modules(self, modules_dir, lazy=False, workers=1):
+        """
+        Load all modules from the specified directory, respecting load_after dependencies.
+
+        :param modules_dir: The directory with the module files.
+        :param lazy: Only load the modules that process every chat line; the rest are
+                     imported and instantiated by their first get_module.
+        :param workers: Threads to initialize independent modules on (see initialize).
+        """
         modules_to_load = {}
 
         # Discover all modules and their classes
         for filename in os.listdir(modules_dir):
             if filename.endswith(".py"):
-                module_name = filename[:-3]
-                module_path = os.path.join(modules_dir, filename)
-                spec = importlib_util.spec_from_file_location(module_name, module_path)
-                module = importlib_util.module_from_spec(spec)
-                spec.loader.exec_module(module)
-
-                # Look for a class with the same name as the module
-                for _, obj in inspect.getmembers(module, inspect.isclass):
-                    if obj.__module__ == module_name:
-                        modules_to_load[module_name] = obj
-
-        # Load modules in the correct order
-        loaded_modules = set()
-        while modules_to_load:
-            loaded_in_iteration = False
-            for module_name, module_class in list(modules_to_load.items()):
-                self.logger.info(f"Attempting to load module: {module_name}")
-                # Check if the module has a load_after attribute
-                load_after = getattr(module_class, "load_after", [])
-                if all(dep in loaded_modules for dep in load_after):
-                    # Instantiate the class and register it
-                    self.logger.info(f"Loading module: {module_name}")
-                    try:
-                        module_instance = module_class()
-                        self.register(module_name, module_instance)
-                        self.logger.info(f"Module '{module_name}' loaded successfully.")
-                    except Exception as e:
-                        self.logger.error(f"Failed to load module '{module_name}': {e}")
-                        raise e
-                    loaded_modules.add(module_name)
-                    del modules_to_load[module_name]
-                    loaded_in_iteration = True
-
-            if not loaded_in_iteration:
-                # If no modules were loaded in this iteration, there is a circular dependency
-                self.logger.critical(
-                    f"Circular dependency detected among modules: {', '.join(modules_to_load.keys())}"
-                )
-                raise RuntimeError(
-                    f"Circular dependency detected among modules: {', '.join(modules_to_load.keys())}"
-                )
+                self.module_paths[filename[:-3]] = os.path.join(modules_dir, filename)
+
+        self.lazy = lazy
+        if lazy:
+            for module_name in list(self.module_paths):
+                if module_name != "__init__" and self.reads_input(module_name):
+                    self.get_module(module_name)
+            return
+
+        for module_name in self.module_paths:
+            module_class = self.import_module(module_name)
+            if module_class is not None:
+                modules_to_load[module_name] = module_class
+        self.initialize(modules_to_load, workers)
+
+    def initialize(self, module_classes, workers=1):
+        """
+        Instantiate and register module classes once everything in their load_after is loaded.
+
+        With more than one worker, modules whose dependencies are all loaded initialize
+        side by side on a thread pool. A module that uses another during initialization
+        must list it in load_after (directly or through a dependency), or the lookup fails;
+        otherwise whether it works would depend on timing.
+
+        :param module_classes: {module name: class}.
+        :param workers: Threads to initialize modules on.
+        :raises RuntimeError: On a dependency cycle (named) or an unknown dependency.
+        """
+        dependencies = {name: list(getattr(module_class, "load_after", [])) for name, module_class in module_classes.items()}
+        for module_name, names in dependencies.items():
+            unknown = [name for name in names if name not in module_classes and name not in self.modules]
+            if unknown:
+                raise RuntimeError(f"Module '{module_name}' loads after unknown module(s): {', '.join(unknown)}")
+            dependencies[module_name] = [name for name in names if name in module_classes]
+        order = topological_order(dependencies)
+
+        # Everything each module may use while it initializes
+        requires = {}
+        for module_name in order:
+            requires[module_name] = set(dependencies[module_name]).union(
+                *(requires[name] for name in dependencies[module_name]))
+
+        if workers <= 1:
+            for module_name in order:
+                self._initialize_module(module_name, module_classes[module_name], requires[module_name])
+        else:
+            remaining = {name: set(names) for name, names in dependencies.items()}
+            dependents = {name: [] for name in order}
+            for name in order:
+                for dependency in remaining[name]:
+                    dependents[dependency].append(name)
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="module-init") as pool:
+                def submit(name):
+                    return pool.submit(self._initialize_module, name, module_classes[name], requires[name])
+
+                running = {submit(name): name for name in order if not remaining[name]}
+                while running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        finished = running.pop(future)
+                        future.result()
+                        for name in dependents[finished]:
+                            remaining[name].discard(finished)
+                            if not remaining[name]:
+                                running[submit(name)] = name
+
+        # Keep the registry in load order, whichever thread finished first
+        with self._load_lock:
+            self.modules = {**{name: self.modules[name] for name in order}, **self.modules}
+
+    def _initialize_module(self, module_name, module_class, requires):
+        """Instantiate one module, time it and register it."""
+        self.logger.info(f"Loading module: {module_name}")
+        self._local.requires = (module_name, requires)
+        start = time.perf_counter()
+        try:
+            module_instance = module_class()
+        except Exception as e:
+            self.logger.error(f"Failed to load module '{module_name}': {e}")
+            raise e
+        finally:
+            self._local.requires = None
+        self.init_times[module_name] = time.perf_counter() - start
+        self.register(module_name, module_instance)
+        self.logger.info(f"Module '{module_name}' loaded successfully.")
 
     def get_module(self, module_name):
-        """Retrieve a registered module instance by name."""
+        """Retrieve a registered module instance by name; with lazy loading, load it first if needed."""
         module_name = module_name.lower()
+        loading = getattr(self._local, "requires", None)
+        if loading and module_name not in loading[1]:
+            raise RuntimeError(f"Module '{loading[0]}' uses '{module_name}' while loading; add it to load_after.")
         if module_name in self.modules:
             return self.modules[module_name]
+        elif self.lazy and module_name in self.module_paths and module_name != "__init__":
+            return self._load_on_demand(module_name)
         else:
             self.logger.error(f"Module '{module_name}' not found.")
             raise ValueError(f"Module '{module_name}' not found.")
 
+    def _load_on_demand(self, module_name):
+        """Import and instantiate a module and, first, the modules in its load_after."""
+        with self._load_lock:
+            if module_name in self.modules:
+                return self.modules[module_name]
+            if module_name in self._loading:
+                cycle = self._loading[self._loading.index(module_name):] + [module_name]
+                raise RuntimeError(f"Circular dependency detected among modules: {' -> '.join(cycle)}")
+            self._loading.append(module_name)
+            try:
+                module_class = self.import_module(module_name)
+                if module_class is None:
+                    raise ValueError(f"Module '{module_name}' not found.")
+                for dependency in getattr(module_class, "load_after", []):
+                    self.get_module(dependency)
+                self.logger.info(f"Loading module on demand: {module_name}")
+                start = time.perf_counter()
+                module_instance = module_class()
+                self.init_times[module_name] = time.perf_counter() - start
+            finally:
+                self._loading.remove(module_name)
+            self.register(module_name, module_instance)
+            self.logger.info(f"Module '{module_name}' loaded successfully.")
+            return module_instance
+
     def list_modules(self):
         """List all registered module names."""
         return list(self.modules.keys())
@@ -0,0 +1,73 @@
+"""Per-thread context describing the chat message currently being processed."""
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+_local = threading.local()
+
+
+def current_command() -> str:
+    """Return the command being executed on this thread, or "none" outside a command."""
+    return getattr(_local, "command", "none")
+
+
+@contextmanager
+def command_context(command: str):
+    """Attribute work done inside the block (such as database queries) to a command."""
+    previous = getattr(_local, "command", "none")
+    _local.command = command
+    try:
+        yield
+    finally:
+        _local.command = previous
+
+
+class QueryLog:
+    """Queries issued while processing one message, grouped by fingerprint."""
+
+    def __init__(self) -> None:
+        self.queries: Dict[str, dict] = {}
+        self.flagged = []
+
+    def record(self, fingerprint: str, duration: float, rows: int, module: str, command: str) -> int:
+        """
+        Record one execution of a query.
+
+        :return: How many times the fingerprint has run within this request.
+        """
+        stats = self.queries.get(fingerprint)
+        if stats is None:
+            stats = self.queries[fingerprint] = {
+                "fingerprint": fingerprint, "count": 0, "total_ms": 0.0, "rows": 0,
+                "module": module, "command": command,
+            }
+        stats["count"] += 1
+        stats["total_ms"] += duration * 1000
+        stats["rows"] += max(rows, 0)
+        return stats["count"]
+
+    def summary(self) -> dict:
+        """Return the query summary included in debug responses."""
+        queries = sorted(self.queries.values(), key=lambda stats: stats["total_ms"], reverse=True)
+        return {
+            "count": sum(stats["count"] for stats in queries),
+            "total_ms": round(sum(stats["total_ms"] for stats in queries), 3),
+            "n_plus_one": list(self.flagged),
+            "queries": [dict(stats, total_ms=round(stats["total_ms"], 3)) for stats in queries],
+        }
+
+
+def current_query_log() -> Optional[QueryLog]:
+    """Return the query log of the message being processed on this thread, if any."""
+    return getattr(_local, "queries", None)
+
+
+@contextmanager
+def track_queries():
+    """Collect the queries issued inside the block into a new QueryLog."""
+    previous = getattr(_local, "queries", None)
+    log = _local.queries = QueryLog()
+    try:
+        yield log
+    finally:
+        _local.queries = previous
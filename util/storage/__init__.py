@@ -0,0 +1,68 @@
+"""Pluggable storage backends for game state."""
+import os
+from typing import Optional
+
+from util.config import get_config_path, load_config
+from util.storage.base import Storage
+
+BACKENDS = ("postgres", "sqlite", "memory")
+
+_storage: Optional[Storage] = None
+
+
+def create_storage(backend: str, **kwargs) -> Storage:
+    """
+    Create a storage backend by name.
+
+    :param backend: "postgres", "sqlite" or "memory".
+    :param kwargs: Passed to the backend's constructor.
+    :return: The new backend.
+    """
+    if backend == "postgres":
+        # Imported lazily so the other backends work without psycopg2
+        from util.storage.postgres import PostgresStorage
+        return PostgresStorage(**kwargs)
+    if backend == "sqlite":
+        from util.storage.sqlite import SQLiteStorage
+        return SQLiteStorage(**kwargs)
+    if backend == "memory":
+        from util.storage.memory import MemoryStorage
+        return MemoryStorage(**kwargs)
+    raise ValueError(f"Unknown storage backend '{backend}'. Expected one of: {', '.join(BACKENDS)}.")
+
+
+def storage_from_config(config: dict) -> Storage:
+    """Create the backend configured in the [storage] section."""
+    storage_config = config.get("storage", {})
+    backend = storage_config.get("backend", "postgres")
+    kwargs = {}
+    if backend == "sqlite" and storage_config.get("sqlite_path"):
+        # Relative paths are relative to config.toml
+        kwargs["path"] = os.path.join(os.path.dirname(get_config_path()), storage_config["sqlite_path"])
+    storage = create_storage(backend, **kwargs)
+    if storage_config.get("write_behind", False):
+        from util.storage.write_behind import WriteBehindStorage
+        storage = WriteBehindStorage(
+            storage,
+            flush_interval=storage_config.get("flush_interval", 0.5),
+            flush_size=storage_config.get("flush_size", 100),
+            max_pending=storage_config.get("max_pending"),
+        )
+    return storage
+
+
+def get_storage() -> Storage:
+    """Return the process-wide backend, creating the one in config.toml on first use."""
+    global _storage
+    if _storage is None:
+        _storage = storage_from_config(load_config())
+    return _storage
+
+
+def set_storage(storage: Storage) -> None:
+    """Replace the process-wide backend. Modules pick it up when they are (re)loaded."""
+    global _storage
+    _storage = storage
+
+
+__all__ = ["BACKENDS", "Storage", "create_storage", "storage_from_config", "get_storage", "set_storage"]
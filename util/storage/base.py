@@ -0,0 +1,455 @@
+"""Storage interface shared by every backend."""
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Callbacks waiting for the calling thread's outermost transaction to end
+_transaction_local = threading.local()
+
+
+class Storage(ABC):
+    """
+    Persistent game state used by the modules.
+
+    Modules call these methods instead of issuing SQL, so the same game logic runs
+    on Postgres, in memory or on any other backend. Fish, trophies and quests are
+    returned as dictionaries and money and weights as floats on every backend.
+
+    Backends must implement every abstract method; the concrete ones (batch inserts,
+    purchases, redemptions, quest items) are built on them and may be overridden
+    with a faster version.
+    """
+
+    name = "base"
+
+    @contextmanager
+    def session(self):
+        """Reuse one connection for everything done in the block (e.g. a batch of messages)."""
+        yield
+
+    @abstractmethod
+    @contextmanager
+    def transaction(self):
+        """Apply everything done in the block atomically. Nested calls join the outer transaction."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release the backend's resources."""
+
+    def migrate(self) -> None:
+        """Bring an existing database up to the current schema. Safe to run on every start."""
+
+    def after_transaction(self, callback: Callable[[], None]) -> bool:
+        """
+        Run callback once the calling thread's outermost transaction has committed or rolled back.
+
+        For work that must wait until other threads see the final state, such as
+        dropping cache entries.
+
+        :return: False, without registering the callback, when no transaction is open.
+        """
+        callbacks = getattr(_transaction_local, "callbacks", None)
+        if callbacks is None:
+            return False
+        callbacks.append(callback)
+        return True
+
+    @contextmanager
+    def _transaction_scope(self):
+        """Wrap a backend's transaction so after_transaction callbacks run when the outermost one ends."""
+        if getattr(_transaction_local, "callbacks", None) is not None:
+            yield
+            return
+        callbacks = _transaction_local.callbacks = []
+        try:
+            yield
+        finally:
+            _transaction_local.callbacks = None
+            for callback in callbacks:
+                callback()
+
+    # Balances
+
+    @abstractmethod
+    def get_balance(self, user_id: str) -> float:
+        """
+        Get a user's balance.
+
+        :param user_id: The ID of the user.
+        :return: The balance, or 0.0 for unknown users.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_balance(self, user_id: str, amount: float) -> float:
+        """
+        Atomically add an amount (which may be negative) to a user's balance.
+
+        :return: The new balance.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def deduct_balance(self, user_id: str, amount: float) -> Optional[float]:
+        """
+        Atomically deduct an amount if the user can afford it.
+
+        :return: The new balance, or None if the balance is too low.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_top_balances(self, limit: int) -> List[Tuple[str, float]]:
+        """Return (user_id, balance) for the richest users, highest first."""
+        raise NotImplementedError
+
+    # Caught fish
+
+    @abstractmethod
+    def count_fish(self, user_id: str) -> int:
+        """Return the number of fish in a user's sack, including bait."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_fish(self, user_id: str, name: str, weight: float, price: float) -> int:
+        """
+        Put a fish in a user's sack.
+
+        :return: The ID of the new fish.
+        """
+        raise NotImplementedError
+
+    def add_fish_many(self, fish: List[Tuple[str, str, float, float, int]]) -> List[int]:
+        """
+        Insert many fish at once, atomically.
+
+        :param fish: (user_id, name, weight, price, bait) rows.
+        :return: The IDs of the new fish, in the same order.
+        """
+        with self.transaction():
+            ids = []
+            for user_id, name, weight, price, bait in fish:
+                ids.append(self.add_fish(user_id, name, weight, price))
+                if bait:
+                    self.set_bait(user_id, ids[-1])
+            return ids
+
+    @abstractmethod
+    def get_fish(self, user_id: str) -> List[Dict]:
+        """Return every fish in a user's sack as {"id", "name", "weight", "price", "bait"}, oldest first."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def find_fish(self, user_id: str, name: Optional[str] = None) -> Optional[Dict]:
+        """Return the first fish named `name` (case-insensitive), or the first fish if no name is given."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def find_heaviest_fish(self, user_id: str, fragment: str) -> Optional[Dict]:
+        """Return the heaviest fish whose name contains `fragment` (case-insensitive)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def remove_fish(self, user_id: str, fish_id: int) -> bool:
+        """
+        Remove a fish from a user's sack.
+
+        :return: True if the fish was removed.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def clear_fish(self, user_id: str) -> None:
+        """Remove every fish from a user's sack."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def sell_all_fish(self, user_id: str) -> Tuple[int, float]:
+        """
+        Remove every fish that is not bait from a user's sack.
+
+        :return: (number of fish removed, their total price).
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def count_fish_by_name(self, user_id: str, name: str) -> int:
+        """Return how many fish with exactly this name are in a user's sack."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def take_fish_by_name(self, user_id: str, name: str, limit: int) -> int:
+        """
+        Remove up to `limit` fish with exactly this name from a user's sack.
+
+        :return: The number of fish removed.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_bait(self, user_id: str) -> Optional[Dict]:
+        """Return the fish set as bait, if any."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_bait(self, user_id: str, fish_id: int) -> None:
+        """Make a fish the user's only bait."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def clear_bait(self, user_id: str) -> None:
+        """Unset the user's bait; the fish stays in the sack."""
+        raise NotImplementedError
+
+    # Trophies
+
+    @abstractmethod
+    def count_trophies(self, user_id: str) -> int:
+        """Return the number of fish in a user's trophy case."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_trophy(self, user_id: str, name: str, weight: float, price: float) -> int:
+        """
+        Put a fish in a user's trophy case.
+
+        :return: The ID of the new trophy.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_trophies(self, user_id: str) -> List[Dict]:
+        """Return a user's trophies as {"id", "name", "weight", "price"}, oldest first."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def remove_trophy(self, user_id: str, trophy_id: int) -> bool:
+        """
+        Remove a trophy.
+
+        :return: True if the trophy was removed.
+        """
+        raise NotImplementedError
+
+    # Inventory
+
+    @abstractmethod
+    def get_inventory(self, user_id: str) -> List[Tuple[str, int]]:
+        """Return (item_name, quantity) for every item a user owns."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_item(self, user_id: str, item_name: str) -> Optional[Tuple[str, int]]:
+        """Return (item_name, quantity) for an item matched case-insensitively, or None."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_item(self, user_id: str, item_name: str, quantity: int = 1) -> None:
+        """Add items to a user's inventory."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def remove_item(self, user_id: str, item_name: str, quantity: int = 1) -> bool:
+        """
+        Remove items (matched case-insensitively), deleting the row when none are left.
+
+        :return: False, without changing anything, if the user owns fewer than `quantity`.
+        """
+        raise NotImplementedError
+
+    def purchase(self, user_id: str, item_name: str, cost: float, quantity: int = 1,
+                 replaces: Sequence[str] = (), max_quantity: Optional[int] = None) -> Optional[float]:
+        """
+        Buy an item in one transaction: debit the cost, add the items and remove
+        `quantity` of each replaced item the user owns.
+
+        :param replaces: Items the new one replaces.
+        :param max_quantity: Most the user may own of the item afterwards (None for no limit).
+        :return: The new balance, or None, without changing anything, if the user cannot
+                 afford it or would own more than max_quantity.
+        """
+        with self.transaction():
+            owned = self.get_item(user_id, item_name)
+            if max_quantity is not None and (owned[1] if owned else 0) + quantity > max_quantity:
+                return None
+            balance = self.deduct_balance(user_id, cost)
+            if balance is None:
+                return None
+            self.add_item(user_id, item_name, quantity)
+            for replaced in replaces:
+                self.remove_item(user_id, replaced, quantity)
+            return balance
+
+    def redeem_item(self, user_id: str, item_name: str, quantity: int, amount: float) -> Optional[float]:
+        """
+        Remove `quantity` of an item (case-insensitive name) and credit `amount` in one
+        transaction, e.g. to open cases and sell what they dropped.
+
+        :return: The new balance, or None, without changing anything, if the user does not
+                 have enough of the item.
+        """
+        with self.transaction():
+            if not self.remove_item(user_id, item_name, quantity):
+                return None
+            return self.add_balance(user_id, amount)
+
+    # Status effects
+
+    @abstractmethod
+    def get_effects(self, user_id: str) -> List[Tuple[str, int]]:
+        """Return (effect_name, expiration_time) for every stored effect, expired or not."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_effect(self, user_id: str, effect_name: str, expiration_time: int) -> None:
+        """Create or replace an effect's expiration time (Unix seconds)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def remove_effect(self, user_id: str, effect_name: str) -> None:
+        """Remove an effect."""
+        raise NotImplementedError
+
+    # Account links
+
+    @abstractmethod
+    def replace_link_code(self, code: str, platform: str, identifier: str, expires_at: datetime) -> None:
+        """Store a linking code, replacing any earlier code for the same user."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_link_code(self, code: str) -> Optional[Tuple[str, str, datetime]]:
+        """Return (platform, identifier, expires_at) for a linking code."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_link_code(self, code: str) -> None:
+        """Delete a linking code."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_expired_link_codes(self, now: datetime) -> None:
+        """Delete every linking code that expired before `now`."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_account_id(self, platform: str, identifier: str) -> Optional[int]:
+        """Return the account ID a platform identity is linked to."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_account_links(self, account_id: int) -> List[Tuple[str, str]]:
+        """Return (platform, identifier) for every identity linked to an account."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_link(self, account_id: int, platform: str, identifier: str) -> None:
+        """Link a platform identity to an account."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def next_account_id(self) -> int:
+        """Return an unused account ID."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_preferred_identifiers(self, users: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], Optional[str]]:
+        """
+        Look up the Discord identifier linked to each (platform, identifier).
+
+        :return: Dictionary with the Discord identifier for every linked user that has one.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def merge_user(self, source_user: str, target_user: str) -> None:
+        """
+        Move a user's fish, inventory, balance, status effects and autosell list to another user.
+
+        Quantities and balances are added together; for effects the later expiration wins.
+        """
+        raise NotImplementedError
+
+    # Daily quests
+
+    @abstractmethod
+    def get_latest_daily_quest(self, user_id: str) -> Optional[Dict]:
+        """Return the user's latest daily quest as {"quest_id", "assigned_at", "completed"}."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def assign_daily_quest(self, user_id: str, quest_id: str, assigned_at: datetime) -> None:
+        """Assign a new daily quest."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def complete_daily_quest(self, user_id: str, quest_id: str, completed_at: datetime) -> None:
+        """Mark a user's daily quest as completed."""
+        raise NotImplementedError
+
+    def count_quest_items(self, user_id: str, names: Sequence[str]) -> Dict[str, int]:
+        """
+        Count what a user has towards quest requirements.
+
+        :param names: Item names.
+        :return: {name: fish with exactly this name in the sack + quantity of the item (case-insensitive) in the inventory}.
+        """
+        counts = {}
+        for name in names:
+            item = self.get_item(user_id, name)
+            counts[name] = self.count_fish_by_name(user_id, name) + (item[1] if item else 0)
+        return counts
+
+    def take_quest_items(self, user_id: str, quantities: Dict[str, int]) -> bool:
+        """
+        Remove quest requirements: for each name, the oldest fish with exactly this name
+        from the sack first, the rest from the inventory.
+
+        :param quantities: {name: quantity}.
+        :return: False, without changing anything, if the user has too few of an item.
+        """
+        with self.transaction():
+            counts = self.count_quest_items(user_id, list(quantities))
+            if any(counts[name] < quantity for name, quantity in quantities.items()):
+                return False
+            for name, quantity in quantities.items():
+                rest = quantity - self.take_fish_by_name(user_id, name, quantity)
+                if rest > 0:
+                    self.remove_item(user_id, name, rest)
+            return True
+
+    # Autosell
+
+    @abstractmethod
+    def get_autosell(self, user_id: str) -> List[str]:
+        """Return the fish names a user sells automatically when caught."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_autosell(self, user_id: str, fish_name: str) -> bool:
+        """
+        Add a fish name to a user's autosell list.
+
+        :return: False if it was already on the list.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def remove_autosell(self, user_id: str, fish_name: str) -> bool:
+        """
+        Remove a fish name (case-insensitive) from a user's autosell list.
+
+        :return: False if it was not on the list.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def clear_autosell(self, user_id: str) -> int:
+        """
+        Empty a user's autosell list.
+
+        :return: The number of names removed.
+        """
+        raise NotImplementedError
@@ -0,0 +1,300 @@
+"""In-memory storage backend for tests, benchmarks and offline play."""
+import itertools
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from util.storage.base import Storage
+
+
+class MemoryStorage(Storage):
+    """
+    Storage kept in dictionaries for the lifetime of the process.
+
+    Every method holds one re-entrant lock, so single calls are atomic. `transaction()`
+    holds the same lock for the whole block, which makes the block atomic with respect
+    to other threads; changes made before an exception are not rolled back.
+    """
+
+    name = "memory"
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._ids = itertools.count(1)
+        self._balances: Dict[str, float] = {}
+        self._fish: Dict[str, Dict[int, Dict]] = {}
+        self._trophies: Dict[str, Dict[int, Dict]] = {}
+        self._inventory: Dict[str, Dict[str, int]] = {}
+        self._effects: Dict[str, Dict[str, int]] = {}
+        self._link_codes: Dict[str, Tuple[str, str, datetime]] = {}
+        self._links: Dict[Tuple[str, str], int] = {}
+        self._daily_quests: Dict[str, Dict] = {}
+        self._autosell: Dict[str, Dict[str, None]] = {}
+
+    @contextmanager
+    def transaction(self):
+        with self._transaction_scope(), self._lock:
+            yield
+
+    # Balances
+
+    def get_balance(self, user_id: str) -> float:
+        return round(self._balances.get(user_id, 0.0), 2)
+
+    def add_balance(self, user_id: str, amount: float) -> float:
+        with self._lock:
+            balance = self._balances[user_id] = round(self._balances.get(user_id, 0.0) + amount, 2)
+        return balance
+
+    def deduct_balance(self, user_id: str, amount: float) -> Optional[float]:
+        with self._lock:
+            balance = self._balances.get(user_id, 0.0)
+            if balance < amount:
+                return None
+            balance = self._balances[user_id] = round(balance - amount, 2)
+        return balance
+
+    def get_top_balances(self, limit: int) -> List[Tuple[str, float]]:
+        with self._lock:
+            balances = list(self._balances.items())
+        return sorted(balances, key=lambda item: item[1], reverse=True)[:limit]
+
+    # Caught fish
+
+    def count_fish(self, user_id: str) -> int:
+        return len(self._fish.get(user_id, {}))
+
+    def add_fish(self, user_id: str, name: str, weight: float, price: float) -> int:
+        with self._lock:
+            fish_id = next(self._ids)
+            self._fish.setdefault(user_id, {})[fish_id] = {
+                "id": fish_id, "name": name, "weight": float(weight), "price": float(price), "bait": 0,
+            }
+        return fish_id
+
+    def get_fish(self, user_id: str) -> List[Dict]:
+        with self._lock:
+            return [dict(fish) for fish in self._fish.get(user_id, {}).values()]
+
+    def find_fish(self, user_id: str, name: Optional[str] = None) -> Optional[Dict]:
+        with self._lock:
+            for fish in self._fish.get(user_id, {}).values():
+                if not name or fish["name"].lower() == name.lower():
+                    return dict(fish)
+        return None
+
+    def find_heaviest_fish(self, user_id: str, fragment: str) -> Optional[Dict]:
+        with self._lock:
+            matches = [fish for fish in self._fish.get(user_id, {}).values() if fragment.lower() in fish["name"].lower()]
+            return dict(max(matches, key=lambda fish: fish["weight"])) if matches else None
+
+    def remove_fish(self, user_id: str, fish_id: int) -> bool:
+        with self._lock:
+            return self._fish.get(user_id, {}).pop(fish_id, None) is not None
+
+    def clear_fish(self, user_id: str) -> None:
+        with self._lock:
+            self._fish.pop(user_id, None)
+
+    def sell_all_fish(self, user_id: str) -> Tuple[int, float]:
+        with self._lock:
+            sack = self._fish.get(user_id, {})
+            sold = [fish_id for fish_id, fish in sack.items() if not fish["bait"]]
+            total = sum(sack.pop(fish_id)["price"] for fish_id in sold)
+        return len(sold), total
+
+    def count_fish_by_name(self, user_id: str, name: str) -> int:
+        with self._lock:
+            return sum(1 for fish in self._fish.get(user_id, {}).values() if fish["name"] == name)
+
+    def take_fish_by_name(self, user_id: str, name: str, limit: int) -> int:
+        with self._lock:
+            sack = self._fish.get(user_id, {})
+            taken = [fish_id for fish_id, fish in sack.items() if fish["name"] == name][:limit]
+            for fish_id in taken:
+                del sack[fish_id]
+        return len(taken)
+
+    def get_bait(self, user_id: str) -> Optional[Dict]:
+        with self._lock:
+            return next((dict(fish) for fish in self._fish.get(user_id, {}).values() if fish["bait"]), None)
+
+    def set_bait(self, user_id: str, fish_id: int) -> None:
+        with self._lock:
+            for other_id, fish in self._fish.get(user_id, {}).items():
+                fish["bait"] = 1 if other_id == fish_id else 0
+
+    def clear_bait(self, user_id: str) -> None:
+        with self._lock:
+            for fish in self._fish.get(user_id, {}).values():
+                fish["bait"] = 0
+
+    # Trophies
+
+    def count_trophies(self, user_id: str) -> int:
+        return len(self._trophies.get(user_id, {}))
+
+    def add_trophy(self, user_id: str, name: str, weight: float, price: float) -> int:
+        with self._lock:
+            trophy_id = next(self._ids)
+            self._trophies.setdefault(user_id, {})[trophy_id] = {
+                "id": trophy_id, "name": name, "weight": float(weight), "price": float(price),
+            }
+        return trophy_id
+
+    def get_trophies(self, user_id: str) -> List[Dict]:
+        with self._lock:
+            return [dict(trophy) for trophy in self._trophies.get(user_id, {}).values()]
+
+    def remove_trophy(self, user_id: str, trophy_id: int) -> bool:
+        with self._lock:
+            return self._trophies.get(user_id, {}).pop(trophy_id, None) is not None
+
+    # Inventory
+
+    def get_inventory(self, user_id: str) -> List[Tuple[str, int]]:
+        with self._lock:
+            return list(self._inventory.get(user_id, {}).items())
+
+    def _find_item(self, user_id: str, item_name: str) -> Optional[str]:
+        """Return the stored spelling of an item name matched case-insensitively."""
+        items = self._inventory.get(user_id, {})
+        if item_name in items:
+            return item_name
+        return next((name for name in items if name.lower() == item_name.lower()), None)
+
+    def get_item(self, user_id: str, item_name: str) -> Optional[Tuple[str, int]]:
+        with self._lock:
+            name = self._find_item(user_id, item_name)
+            return (name, self._inventory[user_id][name]) if name else None
+
+    def add_item(self, user_id: str, item_name: str, quantity: int = 1) -> None:
+        with self._lock:
+            items = self._inventory.setdefault(user_id, {})
+            items[item_name] = items.get(item_name, 0) + quantity
+
+    def remove_item(self, user_id: str, item_name: str, quantity: int = 1) -> bool:
+        with self._lock:
+            name = self._find_item(user_id, item_name)
+            if name is None or self._inventory[user_id][name] < quantity:
+                return False
+            items = self._inventory[user_id]
+            items[name] -= quantity
+            if items[name] <= 0:
+                del items[name]
+        return True
+
+    # Status effects
+
+    def get_effects(self, user_id: str) -> List[Tuple[str, int]]:
+        with self._lock:
+            return list(self._effects.get(user_id, {}).items())
+
+    def set_effect(self, user_id: str, effect_name: str, expiration_time: int) -> None:
+        with self._lock:
+            self._effects.setdefault(user_id, {})[effect_name] = int(expiration_time)
+
+    def remove_effect(self, user_id: str, effect_name: str) -> None:
+        with self._lock:
+            self._effects.get(user_id, {}).pop(effect_name, None)
+
+    # Account links
+
+    def replace_link_code(self, code: str, platform: str, identifier: str, expires_at: datetime) -> None:
+        with self._lock:
+            for old_code, (old_platform, old_identifier, _) in list(self._link_codes.items()):
+                if (old_platform, old_identifier) == (platform, identifier):
+                    del self._link_codes[old_code]
+            self._link_codes[code] = (platform, identifier, expires_at)
+
+    def get_link_code(self, code: str) -> Optional[Tuple[str, str, datetime]]:
+        return self._link_codes.get(code)
+
+    def delete_link_code(self, code: str) -> None:
+        with self._lock:
+            self._link_codes.pop(code, None)
+
+    def delete_expired_link_codes(self, now: datetime) -> None:
+        with self._lock:
+            for code, (_, _, expires_at) in list(self._link_codes.items()):
+                if expires_at < now:
+                    del self._link_codes[code]
+
+    def get_account_id(self, platform: str, identifier: str) -> Optional[int]:
+        return self._links.get((platform, identifier))
+
+    def get_account_links(self, account_id: int) -> List[Tuple[str, str]]:
+        with self._lock:
+            return [user for user, linked_id in self._links.items() if linked_id == account_id]
+
+    def add_link(self, account_id: int, platform: str, identifier: str) -> None:
+        with self._lock:
+            self._links.setdefault((platform, identifier), account_id)
+
+    def next_account_id(self) -> int:
+        with self._lock:
+            return max(self._links.values(), default=0) + 1
+
+    def get_preferred_identifiers(self, users: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], Optional[str]]:
+        with self._lock:
+            discord = {account_id: identifier for (platform, identifier), account_id in self._links.items()
+                       if platform == "discord"}
+            return {user: discord.get(self._links[user]) for user in users if user in self._links}
+
+    def merge_user(self, source_user: str, target_user: str) -> None:
+        with self._lock:
+            for fish in self._fish.pop(source_user, {}).values():
+                self._fish.setdefault(target_user, {})[fish["id"]] = fish
+            for item_name, quantity in self._inventory.pop(source_user, {}).items():
+                self.add_item(target_user, item_name, quantity)
+            if source_user in self._balances:
+                self.add_balance(target_user, self._balances.pop(source_user))
+            for effect_name, expiration_time in self._effects.pop(source_user, {}).items():
+                effects = self._effects.setdefault(target_user, {})
+                effects[effect_name] = max(effects.get(effect_name, 0), expiration_time)
+            for fish_name in self._autosell.pop(source_user, {}):
+                self._autosell.setdefault(target_user, {})[fish_name] = None
+
+    # Daily quests
+
+    def get_latest_daily_quest(self, user_id: str) -> Optional[Dict]:
+        with self._lock:
+            quest = self._daily_quests.get(user_id)
+            return dict(quest) if quest else None
+
+    def assign_daily_quest(self, user_id: str, quest_id: str, assigned_at: datetime) -> None:
+        with self._lock:
+            self._daily_quests[user_id] = {"quest_id": quest_id, "assigned_at": assigned_at, "completed": False}
+
+    def complete_daily_quest(self, user_id: str, quest_id: str, completed_at: datetime) -> None:
+        with self._lock:
+            quest = self._daily_quests.get(user_id)
+            if quest and quest["quest_id"] == quest_id:
+                quest["completed"] = True
+
+    # Autosell
+
+    def get_autosell(self, user_id: str) -> List[str]:
+        with self._lock:
+            return sorted(self._autosell.get(user_id, {}))
+
+    def add_autosell(self, user_id: str, fish_name: str) -> bool:
+        with self._lock:
+            names = self._autosell.setdefault(user_id, {})
+            if fish_name in names:
+                return False
+            names[fish_name] = None
+        return True
+
+    def remove_autosell(self, user_id: str, fish_name: str) -> bool:
+        with self._lock:
+            names = self._autosell.get(user_id, {})
+            matches = [name for name in names if name.lower() == fish_name.lower()]
+            for name in matches:
+                del names[name]
+        return bool(matches)
+
+    def clear_autosell(self, user_id: str) -> int:
+        with self._lock:
+            return len(self._autosell.pop(user_id, {}))
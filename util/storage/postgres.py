@@ -0,0 +1,721 @@
+"""PostgreSQL storage backend (schema in db/init.sql)."""
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from psycopg2.extras import execute_values
+
+from util.database import DatabaseConnection, close_pool, shared_connection, transaction
+from util.storage.base import Storage
+
+
+# Schema added after the first release, for databases created from an older db/init.sql
+# (Postgres only runs init.sql when the data volume is created). Each step is idempotent
+# and mirrors a script in db/.
+MIGRATIONS = (
+    # db/add_item_data.sql
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'user_inventory' AND column_name = 'item_data'
+        ) THEN
+            ALTER TABLE user_inventory ADD COLUMN item_data TEXT DEFAULT '{}';
+        END IF;
+    END $$
+    """,
+    # db/add_autosell_fish.sql
+    """
+    DO $$
+    BEGIN
+        IF to_regclass('autosell_fish') IS NULL THEN
+            CREATE TABLE autosell_fish (
+                user_id TEXT NOT NULL,
+                fish_name TEXT NOT NULL,
+                PRIMARY KEY (user_id, fish_name)
+            );
+            CREATE INDEX idx_autosell_fish_user_id ON autosell_fish(user_id);
+        END IF;
+    END $$
+    """,
+)
+
+
+def _quest_counts(names: Sequence[str], rows) -> Dict[str, int]:
+    """Combine ("fish", name, count) and ("item", lowercase name, quantity) rows into {name: total}."""
+    found = {(source, name): int(count) for source, name, count in rows}
+    return {name: found.get(("fish", name), 0) + found.get(("item", name.lower()), 0) for name in names}
+
+
+def _fish_row(row) -> Optional[Dict]:
+    """Convert an (id, name, weight, price, bait) row to a fish dictionary."""
+    if not row:
+        return None
+    return {"id": row[0], "name": row[1], "weight": float(row[2]), "price": float(row[3]), "bait": row[4]}
+
+
+class PostgresStorage(Storage):
+    """Storage backed by the PostgreSQL connection pool (see util.database)."""
+
+    name = "postgres"
+
+    def session(self):
+        return shared_connection()
+
+    @contextmanager
+    def transaction(self):
+        with self._transaction_scope(), transaction():
+            yield
+
+    def close(self) -> None:
+        close_pool()
+
+    def migrate(self) -> None:
+        with DatabaseConnection() as cursor:
+            for statement in MIGRATIONS:
+                cursor.execute(statement)
+
+    # Balances
+
+    def get_balance(self, user_id: str) -> float:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                SELECT balance
+                FROM user_balances
+                WHERE user_id = %s
+            """, (user_id,))
+            result = cursor.fetchone()
+        return round(float(result[0]), 2) if result else 0.0
+
+    def add_balance(self, user_id: str, amount: float) -> float:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                INSERT INTO user_balances (user_id, balance)
+                VALUES (%s, %s)
+                ON CONFLICT (user_id) DO UPDATE SET balance = user_balances.balance + EXCLUDED.balance
+                RETURNING balance
+            """, (user_id, round(amount, 2)))
+            return round(float(cursor.fetchone()[0]), 2)
+
+    def deduct_balance(self, user_id: str, amount: float) -> Optional[float]:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                UPDATE user_balances
+                SET balance = balance - %s
+                WHERE user_id = %s AND balance >= %s
+                RETURNING balance
+            """, (round(amount, 2), user_id, round(amount, 2)))
+            result = cursor.fetchone()
+        return round(float(result[0]), 2) if result else None
+
+    def get_top_balances(self, limit: int) -> List[Tuple[str, float]]:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                SELECT user_id, balance
+                FROM user_balances
+                ORDER BY balance DESC
+                LIMIT %s
+            """, (limit,))
+            return [(user_id, round(float(balance), 2)) for user_id, balance in cursor.fetchall()]
+
+    # Caught fish
+
+    def count_fish(self, user_id: str) -> int:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                SELECT COUNT(*)
+                FROM caught_fish
+                WHERE user_id = %s
+            """, (user_id,))
+            return int(cursor.fetchone()[0])
+
+    def add_fish(self, user_id: str, name: str, weight: float, price: float) -> int:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                INSERT INTO caught_fish (user_id, name, weight, price)
+                VALUES (%s, %s, %s, %s)
+                RETURNING id
+            """, (user_id, name, weight, price))
+            return cursor.fetchone()[0]
+
+    def add_fish_many(self, fish: List[Tuple[str, str, float, float, int]]) -> List[int]:
+        if not fish:
+            return []
+        with DatabaseConnection() as cursor:
+            # One multi-row INSERT; rows come back in VALUES order
+            rows = execute_values(cursor, """
+                INSERT INTO caught_fish (user_id, name, weight, price, bait)
+                VALUES %s
+                RETURNING id
+            """, fish, page_size=len(fish), fetch=True)
+            return [row[0] for row in rows]
+
+    def get_fish(self, user_id: str) -> List[Dict]:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                SELECT id, name, weight, price, bait
+                FROM caught_fish
+                WHERE user_id = %s
+                ORDER BY id
+            """, (user_id,))
+            return [_fish_row(row) for row in cursor.fetchall()]
+
+    def find_fish(self, user_id: str, name: Optional[str] = None) -> Optional[Dict]:
+        with DatabaseConnection() as cursor:
+            if name:
+                cursor.execute("""
+                    SELECT id, name, weight, price, bait
+                    FROM caught_fish
+                    WHERE user_id = %s AND LOWER(name) = LOWER(%s)
+                    ORDER BY id
+                    LIMIT 1
+                """, (user_id, name))
+            else:
+                cursor.execute("""
+                    SELECT id, name, weight, price, bait
+                    FROM caught_fish
+                    WHERE user_id = %s
+                    ORDER BY id
+                    LIMIT 1
+                """, (user_id,))
+            return _fish_row(cursor.fetchone())
+
+    def find_heaviest_fish(self, user_id: str, fragment: str) -> Optional[Dict]:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                SELECT id, name, weight, price, bait
+                FROM caught_fish
+                WHERE user_id = %s AND LOWER(name) LIKE LOWER(%s)
+                ORDER BY weight DESC
+                LIMIT 1
+            """, (user_id, f"%{fragment}%"))
+            return _fish_row(cursor.fetchone())
+
+    def remove_fish(self, user_id: str, fish_id: int) -> bool:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                DELETE FROM caught_fish
+                WHERE id = %s AND user_id = %s
+            """, (fish_id, user_id))
+            return cursor.rowcount > 0
+
+    def clear_fish(self, user_id: str) -> None:
+        with DatabaseConnection() as cursor:
+            cursor.execute("DELETE FROM caught_fish WHERE user_id = %s", (user_id,))
+
+    def sell_all_fish(self, user_id: str) -> Tuple[int, float]:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                DELETE FROM caught_fish
+                WHERE user_id = %s AND bait = 0
+                RETURNING price
+            """, (user_id,))
+            prices = [float(row[0]) for row in cursor.fetchall()]
+        return len(prices), sum(prices)
+
+    def count_fish_by_name(self, user_id: str, name: str) -> int:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                SELECT COUNT(*)
+                FROM caught_fish
+                WHERE user_id = %s AND name = %s
+            """, (user_id, name))
+            return int(cursor.fetchone()[0])
+
+    def take_fish_by_name(self, user_id: str, name: str, limit: int) -> int:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                DELETE FROM caught_fish
+                WHERE id IN (
+                    SELECT id FROM caught_fish
+                    WHERE user_id = %s AND name = %s
+                    ORDER BY id
+                    LIMIT %s
+                )
+            """, (user_id, name, limit))
+            return cursor.rowcount
+
+    def get_bait(self, user_id: str) -> Optional[Dict]:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                SELECT id, name, weight, price, bait
+                FROM caught_fish
+                WHERE user_id = %s AND bait = 1
+                LIMIT 1
+            """, (user_id,))
+            return _fish_row(cursor.fetchone())
+
+    def set_bait(self, user_id: str, fish_id: int) -> None:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                UPDATE caught_fish
+                SET bait = CASE WHEN id = %s THEN 1 ELSE 0 END
+                WHERE user_id = %s AND (bait = 1 OR id = %s)
+            """, (fish_id, user_id, fish_id))
+
+    def clear_bait(self, user_id: str) -> None:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                UPDATE caught_fish
+                SET bait = 0
+                WHERE user_id = %s AND bait = 1
+            """, (user_id,))
+
+    # Trophies
+
+    def count_trophies(self, user_id: str) -> int:
+        with DatabaseConnection() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM trophy_fish WHERE user_id = %s", (user_id,))
+            return int(cursor.fetchone()[0])
+
+    def add_trophy(self, user_id: str, name: str, weight: float, price: float) -> int:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                INSERT INTO trophy_fish (user_id, name, weight, price)
+                VALUES (%s, %s, %s, %s)
+                RETURNING id
+            """, (user_id, name, weight, price))
+            return cursor.fetchone()[0]
+
+    def get_trophies(self, user_id: str) -> List[Dict]:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                SELECT id, name, weight, price
+                FROM trophy_fish
+                WHERE user_id = %s
+                ORDER BY added_at ASC, id ASC
+            """, (user_id,))
+            return [
+                {"id": row[0], "name": row[1], "weight": float(row[2]), "price": float(row[3])}
+                for row in cursor.fetchall()
+            ]
+
+    def remove_trophy(self, user_id: str, trophy_id: int) -> bool:
+        with DatabaseConnection() as cursor:
+            cursor.execute("DELETE FROM trophy_fish WHERE id = %s AND user_id = %s", (trophy_id, user_id))
+            return cursor.rowcount > 0
+
+    # Inventory
+
+    def get_inventory(self, user_id: str) -> List[Tuple[str, int]]:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                SELECT item_name, quantity FROM user_inventory
+                WHERE user_id = %s
+            """, (user_id,))
+            return [(name, quantity) for name, quantity in cursor.fetchall()]
+
+    def get_item(self, user_id: str, item_name: str) -> Optional[Tuple[str, int]]:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                SELECT item_name, quantity FROM user_inventory
+                WHERE user_id = %s AND LOWER(item_name) = LOWER(%s)
+                LIMIT 1
+            """, (user_id, item_name))
+            result = cursor.fetchone()
+        return (result[0], result[1]) if result else None
+
+    def add_item(self, user_id: str, item_name: str, quantity: int = 1) -> None:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                INSERT INTO user_inventory (user_id, item_name, quantity)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (user_id, item_name) DO UPDATE SET quantity = user_inventory.quantity + EXCLUDED.quantity
+            """, (user_id, item_name, quantity))
+
+    def remove_item(self, user_id: str, item_name: str, quantity: int = 1) -> bool:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                UPDATE user_inventory
+                SET quantity = quantity - %s
+                WHERE user_id = %s AND LOWER(item_name) = LOWER(%s) AND quantity >= %s
+                RETURNING item_name, quantity
+            """, (quantity, user_id, item_name, quantity))
+            result = cursor.fetchone()
+            if not result:
+                return False
+            if result[1] <= 0:
+                cursor.execute("""
+                    DELETE FROM user_inventory
+                    WHERE user_id = %s AND item_name = %s AND quantity <= 0
+                """, (user_id, result[0]))
+        return True
+
+    def purchase(self, user_id: str, item_name: str, cost: float, quantity: int = 1,
+                 replaces: Sequence[str] = (), max_quantity: Optional[int] = None) -> Optional[float]:
+        params = {
+            "user_id": user_id, "item_name": item_name, "cost": round(cost, 2), "quantity": quantity,
+            "replaces": [name.lower() for name in replaces], "max_quantity": max_quantity,
+        }
+        with DatabaseConnection() as cursor:
+            # The savepoint lets an over-the-max purchase undo its debit without
+            # aborting an enclosing transaction
+            cursor.execute("SAVEPOINT purchase")
+            try:
+                # One statement: the debit only succeeds if the balance covers the cost and the
+                # max allows it, the grant only if the debit did and the max still allows it
+                # (checked again against the locked row on conflict), and the replaced items
+                # only go if the grant happened.
+                # Replaced rows that would drop to zero are deleted, the rest decremented.
+                cursor.execute("""
+                    WITH owned AS (
+                        -- Case-insensitive, like get_item and the other backends
+                        SELECT COALESCE((
+                            SELECT quantity FROM user_inventory
+                            WHERE user_id = %(user_id)s AND LOWER(item_name) = LOWER(%(item_name)s)
+                            LIMIT 1
+                        ), 0) AS quantity
+                    ), debit AS (
+                        UPDATE user_balances
+                        SET balance = balance - %(cost)s
+                        WHERE user_id = %(user_id)s AND balance >= %(cost)s
+                          AND (%(max_quantity)s::int IS NULL
+                               OR (SELECT quantity FROM owned) + %(quantity)s <= %(max_quantity)s::int)
+                        RETURNING balance
+                    ), granted AS (
+                        INSERT INTO user_inventory (user_id, item_name, quantity)
+                        SELECT %(user_id)s, %(item_name)s, %(quantity)s FROM debit
+                        WHERE %(max_quantity)s::int IS NULL OR %(quantity)s <= %(max_quantity)s::int
+                        ON CONFLICT (user_id, item_name) DO UPDATE SET quantity = user_inventory.quantity + EXCLUDED.quantity
+                        WHERE %(max_quantity)s::int IS NULL OR user_inventory.quantity + EXCLUDED.quantity <= %(max_quantity)s::int
+                        RETURNING quantity
+                    ), replaced_deleted AS (
+                        DELETE FROM user_inventory
+                        WHERE user_id = %(user_id)s AND LOWER(item_name) = ANY(%(replaces)s::text[])
+                          AND quantity = %(quantity)s AND EXISTS (SELECT 1 FROM granted)
+                    ), replaced_decremented AS (
+                        UPDATE user_inventory
+                        SET quantity = quantity - %(quantity)s
+                        WHERE user_id = %(user_id)s AND LOWER(item_name) = ANY(%(replaces)s::text[])
+                          AND quantity > %(quantity)s AND EXISTS (SELECT 1 FROM granted)
+                    )
+                    SELECT (SELECT balance FROM debit), EXISTS (SELECT 1 FROM granted)
+                """, params)
+                balance, granted = cursor.fetchone()
+            except Exception:
+                cursor.execute("ROLLBACK TO SAVEPOINT purchase")
+                raise
+            if balance is not None and not granted:
+                # Paid but over the max: undo the debit
+                cursor.execute("ROLLBACK TO SAVEPOINT purchase")
+                balance = None
+            cursor.execute("RELEASE SAVEPOINT purchase")
+        return round(float(balance), 2) if balance is not None else None
+
+    def redeem_item(self, user_id: str, item_name: str, quantity: int, amount: float) -> Optional[float]:
+        params = {"user_id": user_id, "item_name": item_name, "quantity": quantity, "amount": round(amount, 2)}
+        with DatabaseConnection() as cursor:
+            # One round trip: rows that would drop to zero are deleted, the rest decremented,
+            # and the payout is only credited if either took the items
+            cursor.execute("""
+                WITH emptied AS (
+                    DELETE FROM user_inventory
+                    WHERE user_id = %(user_id)s AND LOWER(item_name) = LOWER(%(item_name)s)
+                      AND quantity = %(quantity)s
+                    RETURNING 1
+                ), decremented AS (
+                    UPDATE user_inventory
+                    SET quantity = quantity - %(quantity)s
+                    WHERE user_id = %(user_id)s AND LOWER(item_name) = LOWER(%(item_name)s)
+                      AND quantity > %(quantity)s
+                    RETURNING 1
+                )
+                INSERT INTO user_balances (user_id, balance)
+                SELECT %(user_id)s, %(amount)s
+                WHERE EXISTS (SELECT 1 FROM emptied) OR EXISTS (SELECT 1 FROM decremented)
+                ON CONFLICT (user_id) DO UPDATE SET balance = user_balances.balance + EXCLUDED.balance
+                RETURNING balance
+            """, params)
+            result = cursor.fetchone()
+        return round(float(result[0]), 2) if result else None
+
+    # Status effects
+
+    def get_effects(self, user_id: str) -> List[Tuple[str, int]]:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                SELECT effect_name, expiration_time FROM status_effects
+                WHERE user_id = %s
+            """, (user_id,))
+            return [(name, int(expires_at)) for name, expires_at in cursor.fetchall()]
+
+    def set_effect(self, user_id: str, effect_name: str, expiration_time: int) -> None:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                INSERT INTO status_effects (user_id, effect_name, expiration_time)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (user_id, effect_name) DO UPDATE SET expiration_time = EXCLUDED.expiration_time
+            """, (user_id, effect_name, expiration_time))
+
+    def remove_effect(self, user_id: str, effect_name: str) -> None:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                DELETE FROM status_effects
+                WHERE user_id = %s AND effect_name = %s
+            """, (user_id, effect_name))
+
+    # Account links
+
+    def replace_link_code(self, code: str, platform: str, identifier: str, expires_at: datetime) -> None:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                DELETE FROM link_codes
+                WHERE platform = %s AND identifier = %s
+            """, (platform, identifier))
+            cursor.execute("""
+                INSERT INTO link_codes (code, platform, identifier, expires_at)
+                VALUES (%s, %s, %s, %s)
+            """, (code, platform, identifier, expires_at))
+
+    def get_link_code(self, code: str) -> Optional[Tuple[str, str, datetime]]:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                SELECT platform, identifier, expires_at
+                FROM link_codes
+                WHERE code = %s
+            """, (code,))
+            result = cursor.fetchone()
+        return tuple(result) if result else None
+
+    def delete_link_code(self, code: str) -> None:
+        with DatabaseConnection() as cursor:
+            cursor.execute("DELETE FROM link_codes WHERE code = %s", (code,))
+
+    def delete_expired_link_codes(self, now: datetime) -> None:
+        with DatabaseConnection() as cursor:
+            cursor.execute("DELETE FROM link_codes WHERE expires_at < %s", (now,))
+
+    def get_account_id(self, platform: str, identifier: str) -> Optional[int]:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                SELECT account_id FROM account_links
+                WHERE platform = %s AND identifier = %s
+            """, (platform, identifier))
+            result = cursor.fetchone()
+        return result[0] if result else None
+
+    def get_account_links(self, account_id: int) -> List[Tuple[str, str]]:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                SELECT platform, identifier
+                FROM account_links
+                WHERE account_id = %s
+            """, (account_id,))
+            return [(platform, identifier) for platform, identifier in cursor.fetchall()]
+
+    def add_link(self, account_id: int, platform: str, identifier: str) -> None:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                INSERT INTO account_links (account_id, platform, identifier)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (platform, identifier) DO NOTHING
+            """, (account_id, platform, identifier))
+
+    def next_account_id(self) -> int:
+        with DatabaseConnection() as cursor:
+            cursor.execute("SELECT COALESCE(MAX(account_id), 0) + 1 FROM account_links")
+            return cursor.fetchone()[0]
+
+    def get_preferred_identifiers(self, users: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], Optional[str]]:
+        users = list(users)
+        if not users:
+            return {}
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                SELECT src.platform, src.identifier, discord.identifier
+                FROM account_links src
+                JOIN unnest(%s::text[], %s::text[]) AS wanted(platform, identifier)
+                  ON wanted.platform = src.platform AND wanted.identifier = src.identifier
+                LEFT JOIN account_links discord
+                  ON discord.account_id = src.account_id AND discord.platform = 'discord'
+            """, ([platform for platform, _ in users], [identifier for _, identifier in users]))
+            return {(platform, identifier): discord for platform, identifier, discord in cursor.fetchall()}
+
+    def merge_user(self, source_user: str, target_user: str) -> None:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                UPDATE caught_fish
+                SET user_id = %s
+                WHERE user_id = %s
+            """, (target_user, source_user))
+
+            # Combine quantities for items both users own
+            cursor.execute("""
+                INSERT INTO user_inventory (user_id, item_name, item_data, quantity)
+                SELECT %s, item_name, item_data, quantity
+                FROM user_inventory
+                WHERE user_id = %s
+                ON CONFLICT (user_id, item_name)
+                DO UPDATE SET quantity = user_inventory.quantity + EXCLUDED.quantity
+            """, (target_user, source_user))
+            cursor.execute("DELETE FROM user_inventory WHERE user_id = %s", (source_user,))
+
+            cursor.execute("""
+                INSERT INTO user_balances (user_id, balance)
+                SELECT %s, balance
+                FROM user_balances
+                WHERE user_id = %s
+                ON CONFLICT (user_id)
+                DO UPDATE SET balance = user_balances.balance + EXCLUDED.balance
+            """, (target_user, source_user))
+            cursor.execute("DELETE FROM user_balances WHERE user_id = %s", (source_user,))
+
+            # Keep the longest-lasting version of each effect
+            cursor.execute("""
+                INSERT INTO status_effects (user_id, effect_name, expiration_time)
+                SELECT %s, effect_name, expiration_time
+                FROM status_effects
+                WHERE user_id = %s
+                ON CONFLICT (user_id, effect_name)
+                DO UPDATE SET expiration_time = GREATEST(status_effects.expiration_time, EXCLUDED.expiration_time)
+            """, (target_user, source_user))
+            cursor.execute("DELETE FROM status_effects WHERE user_id = %s", (source_user,))
+
+            cursor.execute("""
+                INSERT INTO autosell_fish (user_id, fish_name)
+                SELECT %s, fish_name
+                FROM autosell_fish
+                WHERE user_id = %s
+                ON CONFLICT (user_id, fish_name) DO NOTHING
+            """, (target_user, source_user))
+            cursor.execute("DELETE FROM autosell_fish WHERE user_id = %s", (source_user,))
+
+    # Daily quests
+
+    def get_latest_daily_quest(self, user_id: str) -> Optional[Dict]:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                SELECT quest_id, assigned_at, completed
+                FROM daily_quests
+                WHERE user_id = %s
+                ORDER BY assigned_at DESC
+                LIMIT 1
+            """, (user_id,))
+            result = cursor.fetchone()
+        if not result:
+            return None
+        return {"quest_id": result[0], "assigned_at": result[1], "completed": bool(result[2])}
+
+    def assign_daily_quest(self, user_id: str, quest_id: str, assigned_at: datetime) -> None:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                INSERT INTO daily_quests (user_id, quest_id, assigned_at, completed)
+                VALUES (%s, %s, %s, FALSE)
+            """, (user_id, quest_id, assigned_at))
+
+    def complete_daily_quest(self, user_id: str, quest_id: str, completed_at: datetime) -> None:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                UPDATE daily_quests
+                SET completed = TRUE, completed_at = %s
+                WHERE user_id = %s AND quest_id = %s
+            """, (completed_at, user_id, quest_id))
+
+    def count_quest_items(self, user_id: str, names: Sequence[str]) -> Dict[str, int]:
+        if not names:
+            return {}
+        with DatabaseConnection() as cursor:
+            # One round trip for every name: fish counts by exact name, inventory by lowercase name
+            cursor.execute("""
+                SELECT 'fish', name, COUNT(*)
+                FROM caught_fish
+                WHERE user_id = %(user_id)s AND name = ANY(%(names)s::text[])
+                GROUP BY name
+                UNION ALL
+                SELECT 'item', LOWER(item_name), SUM(quantity)
+                FROM user_inventory
+                WHERE user_id = %(user_id)s AND LOWER(item_name) = ANY(%(lowered)s::text[])
+                GROUP BY LOWER(item_name)
+            """, {"user_id": user_id, "names": list(names), "lowered": [name.lower() for name in names]})
+            rows = cursor.fetchall()
+        return _quest_counts(names, rows)
+
+    def take_quest_items(self, user_id: str, quantities: Dict[str, int]) -> bool:
+        if not quantities:
+            return True
+        params = {"user_id": user_id, "names": list(quantities), "quantities": list(quantities.values())}
+        with DatabaseConnection() as cursor:
+            # The savepoint lets a shortfall undo what was taken without aborting an
+            # enclosing transaction (a quest claim)
+            cursor.execute("SAVEPOINT take_quest_items")
+            try:
+                # One statement: the oldest matching fish go first, what they leave over comes
+                # out of the inventory (rows that would drop to zero are deleted, the rest
+                # decremented), and the names still short are counted. Any shortfall undoes it all.
+                cursor.execute("""
+                    WITH wanted (name, quantity) AS (
+                        SELECT * FROM unnest(%(names)s::text[], %(quantities)s::int[])
+                    ), ranked AS (
+                        SELECT id, name, ROW_NUMBER() OVER (PARTITION BY name ORDER BY id) AS position
+                        FROM caught_fish
+                        WHERE user_id = %(user_id)s AND name = ANY(%(names)s::text[])
+                    ), taken_fish AS (
+                        DELETE FROM caught_fish
+                        WHERE id IN (
+                            SELECT ranked.id FROM ranked JOIN wanted ON wanted.name = ranked.name
+                            WHERE ranked.position <= wanted.quantity
+                        )
+                        RETURNING name
+                    ), rest AS (
+                        SELECT wanted.name, wanted.quantity - COUNT(taken_fish.name) AS quantity
+                        FROM wanted LEFT JOIN taken_fish ON taken_fish.name = wanted.name
+                        GROUP BY wanted.name, wanted.quantity
+                    ), emptied AS (
+                        DELETE FROM user_inventory USING rest
+                        WHERE user_inventory.user_id = %(user_id)s AND LOWER(user_inventory.item_name) = LOWER(rest.name)
+                          AND rest.quantity > 0 AND user_inventory.quantity = rest.quantity
+                        RETURNING rest.name
+                    ), decremented AS (
+                        UPDATE user_inventory
+                        SET quantity = user_inventory.quantity - rest.quantity
+                        FROM rest
+                        WHERE user_inventory.user_id = %(user_id)s AND LOWER(user_inventory.item_name) = LOWER(rest.name)
+                          AND rest.quantity > 0 AND user_inventory.quantity > rest.quantity
+                        RETURNING rest.name
+                    )
+                    SELECT COUNT(*) FROM rest
+                    WHERE quantity > 0
+                      AND name NOT IN (SELECT name FROM emptied UNION ALL SELECT name FROM decremented)
+                """, params)
+                short = cursor.fetchone()[0]
+            except Exception:
+                cursor.execute("ROLLBACK TO SAVEPOINT take_quest_items")
+                raise
+            if short:
+                cursor.execute("ROLLBACK TO SAVEPOINT take_quest_items")
+            cursor.execute("RELEASE SAVEPOINT take_quest_items")
+        return not short
+
+    # Autosell
+
+    def get_autosell(self, user_id: str) -> List[str]:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                SELECT fish_name FROM autosell_fish
+                WHERE user_id = %s
+                ORDER BY fish_name
+            """, (user_id,))
+            return [row[0] for row in cursor.fetchall()]
+
+    def add_autosell(self, user_id: str, fish_name: str) -> bool:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                INSERT INTO autosell_fish (user_id, fish_name)
+                VALUES (%s, %s)
+                ON CONFLICT (user_id, fish_name) DO NOTHING
+            """, (user_id, fish_name))
+            return cursor.rowcount > 0
+
+    def remove_autosell(self, user_id: str, fish_name: str) -> bool:
+        with DatabaseConnection() as cursor:
+            cursor.execute("""
+                DELETE FROM autosell_fish
+                WHERE user_id = %s AND LOWER(fish_name) = LOWER(%s)
+            """, (user_id, fish_name))
+            return cursor.rowcount > 0
+
+    def clear_autosell(self, user_id: str) -> int:
+        with DatabaseConnection() as cursor:
+            cursor.execute("DELETE FROM autosell_fish WHERE user_id = %s", (user_id,))
+            return cursor.rowcount
@@ -0,0 +1,813 @@
+"""SQLite storage backend for single-machine deployments."""
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from util.config import get_config_path
+from util.storage.base import Storage
+
+# Mirrors db/init.sql; money and weights are REAL and timestamps ISO-8601 text
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_balances (
+    user_id TEXT PRIMARY KEY,
+    balance REAL NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS caught_fish (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    weight REAL NOT NULL,
+    price REAL NOT NULL,
+    bait INTEGER DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_caught_fish_user_id ON caught_fish(user_id);
+
+CREATE TABLE IF NOT EXISTS trophy_fish (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    weight REAL NOT NULL,
+    price REAL NOT NULL,
+    added_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_trophy_fish_user_id ON trophy_fish(user_id);
+
+CREATE TABLE IF NOT EXISTS user_inventory (
+    user_id TEXT NOT NULL,
+    item_name TEXT NOT NULL,
+    item_data TEXT DEFAULT '{}',
+    quantity INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, item_name)
+);
+
+CREATE TABLE IF NOT EXISTS status_effects (
+    user_id TEXT NOT NULL,
+    effect_name TEXT NOT NULL,
+    expiration_time INTEGER NOT NULL,
+    PRIMARY KEY (user_id, effect_name)
+);
+CREATE INDEX IF NOT EXISTS idx_status_effects_expiration ON status_effects(expiration_time);
+
+CREATE TABLE IF NOT EXISTS account_links (
+    account_id INTEGER NOT NULL,
+    platform TEXT NOT NULL,
+    identifier TEXT NOT NULL,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (platform, identifier)
+);
+CREATE INDEX IF NOT EXISTS idx_account_links_account_id ON account_links(account_id);
+
+CREATE TABLE IF NOT EXISTS link_codes (
+    code TEXT PRIMARY KEY,
+    platform TEXT NOT NULL,
+    identifier TEXT NOT NULL,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    expires_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_link_codes_expires_at ON link_codes(expires_at);
+
+CREATE TABLE IF NOT EXISTS daily_quests (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    quest_id TEXT NOT NULL,
+    assigned_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    completed INTEGER DEFAULT 0,
+    completed_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_daily_quests_user_id ON daily_quests(user_id, assigned_at DESC);
+
+CREATE TABLE IF NOT EXISTS quest_completions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    quest_id TEXT NOT NULL,
+    completed_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_quest_completions_user_quest ON quest_completions(user_id, quest_id);
+
+CREATE TABLE IF NOT EXISTS autosell_fish (
+    user_id TEXT NOT NULL,
+    fish_name TEXT NOT NULL,
+    PRIMARY KEY (user_id, fish_name)
+);
+CREATE INDEX IF NOT EXISTS idx_autosell_fish_user_id ON autosell_fish(user_id);
+"""
+
+# Identities resolved per query by get_preferred_identifiers (two parameters each)
+_PREFERRED_CHUNK = 200
+
+
+def default_path() -> str:
+    """Database file next to config.toml."""
+    return os.path.join(os.path.dirname(get_config_path()), "bot.db")
+
+
+def _timestamp(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def _quest_counts(names: Sequence[str], rows) -> Dict[str, int]:
+    """Combine ("fish", name, count) and ("item", lowercase name, quantity) rows into {name: total}."""
+    found = {(source, name): int(count) for source, name, count in rows}
+    return {name: found.get(("fish", name), 0) + found.get(("item", name.lower()), 0) for name in names}
+
+
+def _fish_row(row) -> Optional[Dict]:
+    """Convert an (id, name, weight, price, bait) row to a fish dictionary."""
+    if not row:
+        return None
+    return {"id": row[0], "name": row[1], "weight": float(row[2]), "price": float(row[3]), "bait": row[4]}
+
+
+class _Handoff:
+    """Lends the writer connection to a thread running a transaction() block."""
+
+    def __init__(self) -> None:
+        self.ready = threading.Event()
+        self.done = threading.Event()
+        self._lock = threading.Lock()
+        self._cancelled = False
+
+    def lend(self) -> bool:
+        """Writer side: hand the connection over unless the waiting thread gave up."""
+        with self._lock:
+            if self._cancelled:
+                return False
+            self.ready.set()
+            return True
+
+    def cancel(self) -> bool:
+        """Waiting side: give up unless the connection was already handed over."""
+        with self._lock:
+            if self.ready.is_set():
+                return False
+            self._cancelled = True
+            return True
+
+
+class SQLiteStorage(Storage):
+    """
+    Storage in a local SQLite file, for running the bot without a database server.
+
+    The database runs in WAL mode, so readers never wait for the writer. Every thread
+    reads through its own connection, and all writes go through one writer thread
+    that applies queued writes back to back and commits them together (group
+    commit); a caller returns once its write is committed. Each write runs in a
+    savepoint, so one failing write does not undo the others in its batch.
+
+    A `transaction()` block borrows the writer connection for its whole duration;
+    writes from other threads queue until it commits or rolls back.
+
+    Statements are plain SQL strings with `?` parameters, which sqlite3 prepares
+    once per connection and keeps in its statement cache.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: Optional[str] = None, batch_size: int = 64, timeout: float = 5.0) -> None:
+        """
+        Open (and create if needed) the database.
+
+        :param path: Database file, defaults to bot.db next to config.toml.
+        :param batch_size: Maximum number of writes committed together.
+        :param timeout: Seconds to wait for a lock held by another process, or for
+            the writer connection at the start of a transaction() block.
+        """
+        self.path = path or default_path()
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        self._queue: "queue.Queue" = queue.Queue()
+
+        self._writer_conn = self._connect()
+        self._writer_conn.executescript(SCHEMA)
+        self._writer = threading.Thread(target=self._write_loop, name="sqlite-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode: transactions are started explicitly by the writer
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                               check_same_thread=False, cached_statements=256)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # With WAL, NORMAL only syncs at checkpoints; a power loss may drop the last commits but never corrupts
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        """Connection for reads: the writer connection inside a transaction, otherwise the thread's own."""
+        conn = getattr(self._local, "transaction_conn", None)
+        if conn is not None:
+            return conn
+        conn = getattr(self._local, "reader", None)
+        if conn is None:
+            conn = self._local.reader = self._connect()
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    def _read_one(self, sql: str, params: tuple = ()):
+        return self._reader().execute(sql, params).fetchone()
+
+    def _read_all(self, sql: str, params: tuple = ()) -> list:
+        return self._reader().execute(sql, params).fetchall()
+
+    def _write(self, fn: Callable[[sqlite3.Connection], object]):
+        """Run fn(connection) on the writer and return its result once committed."""
+        conn = getattr(self._local, "transaction_conn", None)
+        if conn is not None:
+            return fn(conn)
+        future = Future()
+        self._queue.put((fn, future))
+        return future.result()
+
+    def _execute(self, sql: str, params: tuple = ()) -> int:
+        """Run one write statement and return the number of rows it changed."""
+        return self._write(lambda conn: conn.execute(sql, params).rowcount)
+
+    def _write_loop(self) -> None:
+        """Writer thread: apply queued writes in batches with one commit per batch."""
+        conn = self._writer_conn
+        while True:
+            jobs = [self._queue.get()]
+            while len(jobs) < self.batch_size:
+                try:
+                    jobs.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            batch = []
+            for job in jobs:
+                if job is None or isinstance(job, _Handoff):
+                    # Commit what came before, in order, then stop or hand the connection over
+                    self._commit_batch(conn, batch)
+                    batch = []
+                    if job is None:
+                        return
+                    if job.lend():
+                        job.done.wait()
+                else:
+                    batch.append(job)
+            self._commit_batch(conn, batch)
+
+    @staticmethod
+    def _commit_batch(conn: sqlite3.Connection, batch: list) -> None:
+        if not batch:
+            return
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, future in batch:
+                conn.execute("SAVEPOINT write")
+                try:
+                    result = fn(conn)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write")
+                    conn.execute("RELEASE write")
+                    outcomes.append((future, None, e))
+                else:
+                    conn.execute("RELEASE write")
+                    outcomes.append((future, result, None))
+            conn.execute("COMMIT")
+        except Exception as e:
+            # Nothing in the batch was committed
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for fn, future in batch:
+                future.set_exception(e)
+            return
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    @contextmanager
+    def transaction(self):
+        with self._transaction_scope(), self._writer_transaction():
+            yield
+
+    @contextmanager
+    def _writer_transaction(self):
+        """Borrow the writer connection for the block and commit it on exit."""
+        if getattr(self._local, "transaction_conn", None) is not None:
+            yield
+            return
+
+        handoff = _Handoff()
+        self._queue.put(handoff)
+        self._wait_for_writer(handoff)
+        conn = self._writer_conn
+        self._local.transaction_conn = conn
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            try:
+                conn.execute("COMMIT")
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+        finally:
+            self._local.transaction_conn = None
+            handoff.done.set()
+
+    def _wait_for_writer(self, handoff: _Handoff) -> None:
+        """Wait until the writer lends its connection; raise if it stopped or stays busy past the timeout."""
+        deadline = time.monotonic() + self.timeout
+        while not handoff.ready.wait(0.05):
+            stopped = not self._writer.is_alive()
+            if (stopped or time.monotonic() >= deadline) and handoff.cancel():
+                if stopped:
+                    raise sqlite3.OperationalError("The SQLite writer thread is not running")
+                raise sqlite3.OperationalError(
+                    f"Timed out after {self.timeout}s waiting for the SQLite writer to start a transaction")
+
+    def close(self) -> None:
+        """Commit queued writes, stop the writer thread and close every connection."""
+        if not self._writer.is_alive():
+            return
+        self._queue.put(None)
+        self._writer.join()
+        self._writer_conn.close()
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+
+    # Balances
+
+    def get_balance(self, user_id: str) -> float:
+        row = self._read_one("SELECT balance FROM user_balances WHERE user_id = ?", (user_id,))
+        return round(float(row[0]), 2) if row else 0.0
+
+    def add_balance(self, user_id: str, amount: float) -> float:
+        row = self._write(lambda conn: conn.execute("""
+            INSERT INTO user_balances (user_id, balance)
+            VALUES (?, ?)
+            ON CONFLICT (user_id) DO UPDATE SET balance = ROUND(user_balances.balance + excluded.balance, 2)
+            RETURNING balance
+        """, (user_id, round(amount, 2))).fetchone())
+        return round(float(row[0]), 2)
+
+    def deduct_balance(self, user_id: str, amount: float) -> Optional[float]:
+        row = self._write(lambda conn: conn.execute("""
+            UPDATE user_balances
+            SET balance = ROUND(balance - ?, 2)
+            WHERE user_id = ? AND balance >= ?
+            RETURNING balance
+        """, (round(amount, 2), user_id, round(amount, 2))).fetchone())
+        return round(float(row[0]), 2) if row else None
+
+    def get_top_balances(self, limit: int) -> List[Tuple[str, float]]:
+        rows = self._read_all("SELECT user_id, balance FROM user_balances ORDER BY balance DESC LIMIT ?", (limit,))
+        return [(user_id, round(float(balance), 2)) for user_id, balance in rows]
+
+    # Caught fish
+
+    def count_fish(self, user_id: str) -> int:
+        return self._read_one("SELECT COUNT(*) FROM caught_fish WHERE user_id = ?", (user_id,))[0]
+
+    def add_fish(self, user_id: str, name: str, weight: float, price: float) -> int:
+        return self._write(lambda conn: conn.execute("""
+            INSERT INTO caught_fish (user_id, name, weight, price)
+            VALUES (?, ?, ?, ?)
+        """, (user_id, name, weight, price)).lastrowid)
+
+    def add_fish_many(self, fish: List[Tuple[str, str, float, float, int]]) -> List[int]:
+        def insert(conn):
+            # One writer job, so the rows share a single commit
+            return [conn.execute("""
+                INSERT INTO caught_fish (user_id, name, weight, price, bait)
+                VALUES (?, ?, ?, ?, ?)
+            """, row).lastrowid for row in fish]
+        return self._write(insert)
+
+    def get_fish(self, user_id: str) -> List[Dict]:
+        rows = self._read_all("""
+            SELECT id, name, weight, price, bait
+            FROM caught_fish
+            WHERE user_id = ?
+            ORDER BY id
+        """, (user_id,))
+        return [_fish_row(row) for row in rows]
+
+    def find_fish(self, user_id: str, name: Optional[str] = None) -> Optional[Dict]:
+        if name:
+            row = self._read_one("""
+                SELECT id, name, weight, price, bait
+                FROM caught_fish
+                WHERE user_id = ? AND LOWER(name) = LOWER(?)
+                ORDER BY id
+                LIMIT 1
+            """, (user_id, name))
+        else:
+            row = self._read_one("""
+                SELECT id, name, weight, price, bait
+                FROM caught_fish
+                WHERE user_id = ?
+                ORDER BY id
+                LIMIT 1
+            """, (user_id,))
+        return _fish_row(row)
+
+    def find_heaviest_fish(self, user_id: str, fragment: str) -> Optional[Dict]:
+        return _fish_row(self._read_one("""
+            SELECT id, name, weight, price, bait
+            FROM caught_fish
+            WHERE user_id = ? AND INSTR(LOWER(name), LOWER(?)) > 0
+            ORDER BY weight DESC
+            LIMIT 1
+        """, (user_id, fragment)))
+
+    def remove_fish(self, user_id: str, fish_id: int) -> bool:
+        return self._execute("DELETE FROM caught_fish WHERE id = ? AND user_id = ?", (fish_id, user_id)) > 0
+
+    def clear_fish(self, user_id: str) -> None:
+        self._execute("DELETE FROM caught_fish WHERE user_id = ?", (user_id,))
+
+    def sell_all_fish(self, user_id: str) -> Tuple[int, float]:
+        rows = self._write(lambda conn: conn.execute("""
+            DELETE FROM caught_fish
+            WHERE user_id = ? AND bait = 0
+            RETURNING price
+        """, (user_id,)).fetchall())
+        return len(rows), sum(float(row[0]) for row in rows)
+
+    def count_fish_by_name(self, user_id: str, name: str) -> int:
+        return self._read_one("SELECT COUNT(*) FROM caught_fish WHERE user_id = ? AND name = ?", (user_id, name))[0]
+
+    def take_fish_by_name(self, user_id: str, name: str, limit: int) -> int:
+        return self._execute("""
+            DELETE FROM caught_fish
+            WHERE id IN (
+                SELECT id FROM caught_fish
+                WHERE user_id = ? AND name = ?
+                ORDER BY id
+                LIMIT ?
+            )
+        """, (user_id, name, limit))
+
+    def get_bait(self, user_id: str) -> Optional[Dict]:
+        return _fish_row(self._read_one("""
+            SELECT id, name, weight, price, bait
+            FROM caught_fish
+            WHERE user_id = ? AND bait = 1
+            LIMIT 1
+        """, (user_id,)))
+
+    def set_bait(self, user_id: str, fish_id: int) -> None:
+        self._execute("""
+            UPDATE caught_fish
+            SET bait = CASE WHEN id = ? THEN 1 ELSE 0 END
+            WHERE user_id = ? AND (bait = 1 OR id = ?)
+        """, (fish_id, user_id, fish_id))
+
+    def clear_bait(self, user_id: str) -> None:
+        self._execute("UPDATE caught_fish SET bait = 0 WHERE user_id = ? AND bait = 1", (user_id,))
+
+    # Trophies
+
+    def count_trophies(self, user_id: str) -> int:
+        return self._read_one("SELECT COUNT(*) FROM trophy_fish WHERE user_id = ?", (user_id,))[0]
+
+    def add_trophy(self, user_id: str, name: str, weight: float, price: float) -> int:
+        return self._write(lambda conn: conn.execute("""
+            INSERT INTO trophy_fish (user_id, name, weight, price)
+            VALUES (?, ?, ?, ?)
+        """, (user_id, name, weight, price)).lastrowid)
+
+    def get_trophies(self, user_id: str) -> List[Dict]:
+        rows = self._read_all("""
+            SELECT id, name, weight, price
+            FROM trophy_fish
+            WHERE user_id = ?
+            ORDER BY added_at ASC, id ASC
+        """, (user_id,))
+        return [{"id": row[0], "name": row[1], "weight": float(row[2]), "price": float(row[3])} for row in rows]
+
+    def remove_trophy(self, user_id: str, trophy_id: int) -> bool:
+        return self._execute("DELETE FROM trophy_fish WHERE id = ? AND user_id = ?", (trophy_id, user_id)) > 0
+
+    # Inventory
+
+    def get_inventory(self, user_id: str) -> List[Tuple[str, int]]:
+        return [tuple(row) for row in self._read_all(
+            "SELECT item_name, quantity FROM user_inventory WHERE user_id = ?", (user_id,))]
+
+    def get_item(self, user_id: str, item_name: str) -> Optional[Tuple[str, int]]:
+        row = self._read_one("""
+            SELECT item_name, quantity FROM user_inventory
+            WHERE user_id = ? AND LOWER(item_name) = LOWER(?)
+            LIMIT 1
+        """, (user_id, item_name))
+        return tuple(row) if row else None
+
+    def add_item(self, user_id: str, item_name: str, quantity: int = 1) -> None:
+        self._execute("""
+            INSERT INTO user_inventory (user_id, item_name, quantity)
+            VALUES (?, ?, ?)
+            ON CONFLICT (user_id, item_name) DO UPDATE SET quantity = user_inventory.quantity + excluded.quantity
+        """, (user_id, item_name, quantity))
+
+    def remove_item(self, user_id: str, item_name: str, quantity: int = 1) -> bool:
+        def write(conn):
+            row = conn.execute("""
+                UPDATE user_inventory
+                SET quantity = quantity - ?
+                WHERE user_id = ? AND LOWER(item_name) = LOWER(?) AND quantity >= ?
+                RETURNING item_name, quantity
+            """, (quantity, user_id, item_name, quantity)).fetchone()
+            if not row:
+                return False
+            if row[1] <= 0:
+                conn.execute("DELETE FROM user_inventory WHERE user_id = ? AND item_name = ?", (user_id, row[0]))
+            return True
+        return self._write(write)
+
+    def purchase(self, user_id: str, item_name: str, cost: float, quantity: int = 1,
+                 replaces: Sequence[str] = (), max_quantity: Optional[int] = None) -> Optional[float]:
+        def write(conn):
+            # One writer job, so the checks and changes commit together and nothing runs in between
+            if max_quantity is not None:
+                # Case-insensitive, like get_item and the other backends
+                row = conn.execute("""
+                    SELECT quantity FROM user_inventory
+                    WHERE user_id = ? AND LOWER(item_name) = LOWER(?)
+                    LIMIT 1
+                """, (user_id, item_name)).fetchone()
+                if (row[0] if row else 0) + quantity > max_quantity:
+                    return None
+            row = conn.execute("""
+                UPDATE user_balances
+                SET balance = ROUND(balance - ?, 2)
+                WHERE user_id = ? AND balance >= ?
+                RETURNING balance
+            """, (round(cost, 2), user_id, round(cost, 2))).fetchone()
+            if not row:
+                return None
+            conn.execute("""
+                INSERT INTO user_inventory (user_id, item_name, quantity)
+                VALUES (?, ?, ?)
+                ON CONFLICT (user_id, item_name) DO UPDATE SET quantity = user_inventory.quantity + excluded.quantity
+            """, (user_id, item_name, quantity))
+            for replaced in replaces:
+                conn.execute("""
+                    UPDATE user_inventory
+                    SET quantity = quantity - ?
+                    WHERE user_id = ? AND LOWER(item_name) = LOWER(?) AND quantity >= ?
+                """, (quantity, user_id, replaced, quantity))
+            if replaces:
+                conn.execute("DELETE FROM user_inventory WHERE user_id = ? AND quantity <= 0", (user_id,))
+            return round(float(row[0]), 2)
+        return self._write(write)
+
+    def redeem_item(self, user_id: str, item_name: str, quantity: int, amount: float) -> Optional[float]:
+        def write(conn):
+            taken = conn.execute("""
+                UPDATE user_inventory
+                SET quantity = quantity - ?
+                WHERE user_id = ? AND LOWER(item_name) = LOWER(?) AND quantity >= ?
+                RETURNING quantity
+            """, (quantity, user_id, item_name, quantity)).fetchall()
+            if not taken:
+                return None
+            if any(row[0] <= 0 for row in taken):
+                conn.execute("DELETE FROM user_inventory WHERE user_id = ? AND quantity <= 0", (user_id,))
+            row = conn.execute("""
+                INSERT INTO user_balances (user_id, balance)
+                VALUES (?, ?)
+                ON CONFLICT (user_id) DO UPDATE SET balance = ROUND(user_balances.balance + excluded.balance, 2)
+                RETURNING balance
+            """, (user_id, round(amount, 2))).fetchone()
+            return round(float(row[0]), 2)
+        return self._write(write)
+
+    # Status effects
+
+    def get_effects(self, user_id: str) -> List[Tuple[str, int]]:
+        return [tuple(row) for row in self._read_all(
+            "SELECT effect_name, expiration_time FROM status_effects WHERE user_id = ?", (user_id,))]
+
+    def set_effect(self, user_id: str, effect_name: str, expiration_time: int) -> None:
+        self._execute("""
+            INSERT INTO status_effects (user_id, effect_name, expiration_time)
+            VALUES (?, ?, ?)
+            ON CONFLICT (user_id, effect_name) DO UPDATE SET expiration_time = excluded.expiration_time
+        """, (user_id, effect_name, int(expiration_time)))
+
+    def remove_effect(self, user_id: str, effect_name: str) -> None:
+        self._execute("DELETE FROM status_effects WHERE user_id = ? AND effect_name = ?", (user_id, effect_name))
+
+    # Account links
+
+    def replace_link_code(self, code: str, platform: str, identifier: str, expires_at: datetime) -> None:
+        def write(conn):
+            conn.execute("DELETE FROM link_codes WHERE platform = ? AND identifier = ?", (platform, identifier))
+            conn.execute("""
+                INSERT INTO link_codes (code, platform, identifier, expires_at)
+                VALUES (?, ?, ?, ?)
+            """, (code, platform, identifier, expires_at.isoformat()))
+        self._write(write)
+
+    def get_link_code(self, code: str) -> Optional[Tuple[str, str, datetime]]:
+        row = self._read_one("SELECT platform, identifier, expires_at FROM link_codes WHERE code = ?", (code,))
+        return (row[0], row[1], _timestamp(row[2])) if row else None
+
+    def delete_link_code(self, code: str) -> None:
+        self._execute("DELETE FROM link_codes WHERE code = ?", (code,))
+
+    def delete_expired_link_codes(self, now: datetime) -> None:
+        self._execute("DELETE FROM link_codes WHERE expires_at < ?", (now.isoformat(),))
+
+    def get_account_id(self, platform: str, identifier: str) -> Optional[int]:
+        row = self._read_one("SELECT account_id FROM account_links WHERE platform = ? AND identifier = ?",
+                             (platform, identifier))
+        return row[0] if row else None
+
+    def get_account_links(self, account_id: int) -> List[Tuple[str, str]]:
+        return [tuple(row) for row in self._read_all(
+            "SELECT platform, identifier FROM account_links WHERE account_id = ?", (account_id,))]
+
+    def add_link(self, account_id: int, platform: str, identifier: str) -> None:
+        self._execute("""
+            INSERT INTO account_links (account_id, platform, identifier)
+            VALUES (?, ?, ?)
+            ON CONFLICT (platform, identifier) DO NOTHING
+        """, (account_id, platform, identifier))
+
+    def next_account_id(self) -> int:
+        return self._read_one("SELECT COALESCE(MAX(account_id), 0) + 1 FROM account_links")[0]
+
+    def get_preferred_identifiers(self, users: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], Optional[str]]:
+        users = list(users)
+        preferred = {}
+        for start in range(0, len(users), _PREFERRED_CHUNK):
+            chunk = users[start:start + _PREFERRED_CHUNK]
+            values = ", ".join(["(?, ?)"] * len(chunk))
+            rows = self._read_all(f"""
+                SELECT src.platform, src.identifier, discord.identifier
+                FROM account_links src
+                LEFT JOIN account_links discord
+                  ON discord.account_id = src.account_id AND discord.platform = 'discord'
+                WHERE (src.platform, src.identifier) IN (VALUES {values})
+            """, tuple(value for user in chunk for value in user))
+            preferred.update({(platform, identifier): discord for platform, identifier, discord in rows})
+        return preferred
+
+    def merge_user(self, source_user: str, target_user: str) -> None:
+        def write(conn):
+            conn.execute("UPDATE caught_fish SET user_id = ? WHERE user_id = ?", (target_user, source_user))
+
+            # Combine quantities for items both users own
+            conn.execute("""
+                INSERT INTO user_inventory (user_id, item_name, item_data, quantity)
+                SELECT ?, item_name, item_data, quantity
+                FROM user_inventory
+                WHERE user_id = ?
+                ON CONFLICT (user_id, item_name) DO UPDATE SET quantity = user_inventory.quantity + excluded.quantity
+            """, (target_user, source_user))
+            conn.execute("DELETE FROM user_inventory WHERE user_id = ?", (source_user,))
+
+            conn.execute("""
+                INSERT INTO user_balances (user_id, balance)
+                SELECT ?, balance
+                FROM user_balances
+                WHERE user_id = ?
+                ON CONFLICT (user_id) DO UPDATE SET balance = ROUND(user_balances.balance + excluded.balance, 2)
+            """, (target_user, source_user))
+            conn.execute("DELETE FROM user_balances WHERE user_id = ?", (source_user,))
+
+            # Keep the longest-lasting version of each effect
+            conn.execute("""
+                INSERT INTO status_effects (user_id, effect_name, expiration_time)
+                SELECT ?, effect_name, expiration_time
+                FROM status_effects
+                WHERE user_id = ?
+                ON CONFLICT (user_id, effect_name)
+                DO UPDATE SET expiration_time = MAX(status_effects.expiration_time, excluded.expiration_time)
+            """, (target_user, source_user))
+            conn.execute("DELETE FROM status_effects WHERE user_id = ?", (source_user,))
+
+            conn.execute("""
+                INSERT INTO autosell_fish (user_id, fish_name)
+                SELECT ?, fish_name
+                FROM autosell_fish
+                WHERE user_id = ?
+                ON CONFLICT (user_id, fish_name) DO NOTHING
+            """, (target_user, source_user))
+            conn.execute("DELETE FROM autosell_fish WHERE user_id = ?", (source_user,))
+        self._write(write)
+
+    # Daily quests
+
+    def get_latest_daily_quest(self, user_id: str) -> Optional[Dict]:
+        row = self._read_one("""
+            SELECT quest_id, assigned_at, completed
+            FROM daily_quests
+            WHERE user_id = ?
+            ORDER BY assigned_at DESC
+            LIMIT 1
+        """, (user_id,))
+        if not row:
+            return None
+        return {"quest_id": row[0], "assigned_at": _timestamp(row[1]), "completed": bool(row[2])}
+
+    def assign_daily_quest(self, user_id: str, quest_id: str, assigned_at: datetime) -> None:
+        self._execute("""
+            INSERT INTO daily_quests (user_id, quest_id, assigned_at, completed)
+            VALUES (?, ?, ?, 0)
+        """, (user_id, quest_id, assigned_at.isoformat()))
+
+    def complete_daily_quest(self, user_id: str, quest_id: str, completed_at: datetime) -> None:
+        self._execute("""
+            UPDATE daily_quests
+            SET completed = 1, completed_at = ?
+            WHERE user_id = ? AND quest_id = ?
+        """, (completed_at.isoformat(), user_id, quest_id))
+
+    def _count_quest_items(self, conn: sqlite3.Connection, user_id: str, names: Sequence[str]) -> Dict[str, int]:
+        placeholders = ", ".join("?" * len(names))
+        return _quest_counts(names, conn.execute(f"""
+            SELECT 'fish', name, COUNT(*)
+            FROM caught_fish
+            WHERE user_id = ? AND name IN ({placeholders})
+            GROUP BY name
+            UNION ALL
+            SELECT 'item', LOWER(item_name), SUM(quantity)
+            FROM user_inventory
+            WHERE user_id = ? AND LOWER(item_name) IN ({placeholders})
+            GROUP BY LOWER(item_name)
+        """, (user_id, *names, user_id, *(name.lower() for name in names))).fetchall())
+
+    def count_quest_items(self, user_id: str, names: Sequence[str]) -> Dict[str, int]:
+        return self._count_quest_items(self._reader(), user_id, names) if names else {}
+
+    def take_quest_items(self, user_id: str, quantities: Dict[str, int]) -> bool:
+        if not quantities:
+            return True
+        names = list(quantities)
+
+        def write(conn):
+            # One writer job: the check, then one set-based statement per table
+            counts = self._count_quest_items(conn, user_id, names)
+            if any(counts[name] < quantity for name, quantity in quantities.items()):
+                return False
+            taken = Counter(row[0] for row in conn.execute(f"""
+                WITH wanted (name, quantity) AS (VALUES {", ".join(["(?, ?)"] * len(names))}),
+                ranked AS (
+                    SELECT id, name, ROW_NUMBER() OVER (PARTITION BY name ORDER BY id) AS position
+                    FROM caught_fish
+                    WHERE user_id = ? AND name IN ({", ".join("?" * len(names))})
+                )
+                DELETE FROM caught_fish
+                WHERE id IN (
+                    SELECT ranked.id FROM ranked JOIN wanted ON wanted.name = ranked.name
+                    WHERE ranked.position <= wanted.quantity
+                )
+                RETURNING name
+            """, (*(value for item in quantities.items() for value in item), user_id, *names)).fetchall())
+            rest = [(name.lower(), quantity - taken[name]) for name, quantity in quantities.items() if quantity > taken[name]]
+            if rest:
+                conn.execute(f"""
+                    WITH rest (name, quantity) AS (VALUES {", ".join(["(?, ?)"] * len(rest))})
+                    UPDATE user_inventory
+                    SET quantity = quantity - (SELECT rest.quantity FROM rest WHERE rest.name = LOWER(user_inventory.item_name))
+                    WHERE user_id = ? AND LOWER(item_name) IN (SELECT name FROM rest)
+                """, (*(value for item in rest for value in item), user_id))
+                conn.execute("DELETE FROM user_inventory WHERE user_id = ? AND quantity <= 0", (user_id,))
+            return True
+        return self._write(write)
+
+    # Autosell
+
+    def get_autosell(self, user_id: str) -> List[str]:
+        return [row[0] for row in self._read_all(
+            "SELECT fish_name FROM autosell_fish WHERE user_id = ? ORDER BY fish_name", (user_id,))]
+
+    def add_autosell(self, user_id: str, fish_name: str) -> bool:
+        return self._execute("""
+            INSERT INTO autosell_fish (user_id, fish_name)
+            VALUES (?, ?)
+            ON CONFLICT (user_id, fish_name) DO NOTHING
+        """, (user_id, fish_name)) > 0
+
+    def remove_autosell(self, user_id: str, fish_name: str) -> bool:
+        return self._execute("DELETE FROM autosell_fish WHERE user_id = ? AND LOWER(fish_name) = LOWER(?)",
+                             (user_id, fish_name)) > 0
+
+    def clear_autosell(self, user_id: str) -> int:
+        return self._execute("DELETE FROM autosell_fish WHERE user_id = ?", (user_id,))
@@ -0,0 +1,372 @@
+"""Write-behind buffer for caught fish."""
+import abc
+import atexit
+import itertools
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from util.storage.base import Storage
+
+logger = logging.getLogger(__name__)
+
+
+class _FlushGate:
+    """
+    Shared/exclusive gate between fish operations and flushes.
+
+    Fish operations and transactions hold it shared and run side by side; a flush holds
+    it exclusively, so nobody ever sees a fish both in the buffer and in the backend.
+    Shared holds are re-entrant per thread and a waiting flush blocks new ones.
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._shared = 0
+        self._flushing = False
+        self._waiting = 0
+
+    @contextmanager
+    def shared(self):
+        depth = getattr(self._local, "depth", 0)
+        if depth == 0:
+            with self._cond:
+                while self._flushing or self._waiting:
+                    self._cond.wait()
+                self._shared += 1
+        self._local.depth = depth + 1
+        try:
+            yield
+        finally:
+            self._local.depth = depth
+            if depth == 0:
+                with self._cond:
+                    self._shared -= 1
+                    if not self._shared:
+                        self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        if getattr(self._local, "depth", 0):
+            raise RuntimeError("Cannot flush caught fish inside a transaction")
+        with self._cond:
+            self._waiting += 1
+            while self._flushing or self._shared:
+                self._cond.wait()
+            self._waiting -= 1
+            self._flushing = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._flushing = False
+                self._cond.notify_all()
+
+
+class WriteBehindStorage(Storage):
+    """
+    Wraps a backend and buffers newly caught fish in memory.
+
+    `add_fish` appends to a per-user pending list and returns a temporary negative ID.
+    Every fish read (sack, sell, bait, quests, trophies) merges the pending list with
+    the backend, so buffered fish behave like stored ones; selling or eating a fish
+    that was never flushed costs no write at all. A background thread inserts the
+    pending fish with one multi-row `add_fish_many` every `flush_interval` seconds, or
+    sooner once `flush_size` fish are waiting. `close()` (run by the server on
+    SIGTERM/SIGINT and at exit) flushes what is left. Each flush is atomic, so a crash
+    loses at most the fish caught since the last flush and never leaves a partial
+    batch behind. While the backend is failing the buffer grows to at most
+    `max_pending` fish; after that `add_fish` writes straight to the backend, so its
+    errors reach the caller instead of memory filling up.
+
+    Everything else is passed straight to the wrapped backend.
+    """
+
+    def __init__(self, inner: Storage, flush_interval: float = 0.5, flush_size: int = 100,
+                 max_pending: Optional[int] = None) -> None:
+        """
+        :param inner: The backend the fish are written to.
+        :param flush_interval: Seconds between flushes.
+        :param flush_size: Number of pending fish that triggers an early flush.
+        :param max_pending: Most fish buffered at once, defaults to 10 * flush_size.
+        """
+        self.inner = inner
+        self.name = inner.name
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.max_pending = max(flush_size, max_pending or 10 * flush_size)
+        self._lock = threading.Lock()
+        self._gate = _FlushGate()
+        self._ids = itertools.count(-1, -1)
+        self._pending: Dict[str, List[Dict]] = {}
+        self._pending_count = 0
+        # Temporary ID -> stored ID for recently flushed fish, for callers that read a
+        # fish before a flush and act on it after
+        self._flushed: "OrderedDict[int, int]" = OrderedDict()
+        self._flushed_limit = max(1024, 16 * flush_size)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._flush_loop, name="fish-write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # Buffer management
+
+    def _flush_loop(self) -> None:
+        """Background thread: flush on the interval or when the size threshold is hit."""
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                # The fish stay pending and the next flush retries them
+                logger.exception("Flushing caught fish failed")
+
+    def flush(self) -> int:
+        """
+        Write every pending fish to the backend in one batch.
+
+        :return: The number of fish written.
+        """
+        with self._gate.exclusive():
+            with self._lock:
+                batch = [(user_id, entry) for user_id, entries in self._pending.items() for entry in entries]
+            if not batch:
+                return 0
+
+            ids = self.inner.add_fish_many([
+                (user_id, entry["name"], entry["weight"], entry["price"], entry["bait"]) for user_id, entry in batch
+            ])
+
+            with self._lock:
+                # Only add_fish runs during a flush and it appends, so the flushed fish
+                # are still at the front of each list
+                flushed_per_user: Dict[str, int] = {}
+                for (user_id, entry), fish_id in zip(batch, ids):
+                    flushed_per_user[user_id] = flushed_per_user.get(user_id, 0) + 1
+                    self._flushed[entry["id"]] = fish_id
+                for user_id, count in flushed_per_user.items():
+                    entries = self._pending[user_id]
+                    del entries[:count]
+                    if not entries:
+                        del self._pending[user_id]
+                self._pending_count -= len(batch)
+                while len(self._flushed) > self._flushed_limit:
+                    self._flushed.popitem(last=False)
+            return len(batch)
+
+    def pending_count(self) -> int:
+        """Return the number of fish waiting to be flushed."""
+        return self._pending_count
+
+    def _pending_copy(self, user_id: str) -> List[Dict]:
+        with self._lock:
+            return [dict(entry) for entry in self._pending.get(user_id, ())]
+
+    def _take_pending(self, user_id: str, predicate) -> List[Dict]:
+        """Remove and return the pending fish of a user that match predicate."""
+        with self._lock:
+            entries = self._pending.get(user_id, [])
+            taken = [entry for entry in entries if predicate(entry)]
+            if taken:
+                entries[:] = [entry for entry in entries if not predicate(entry)]
+                if not entries:
+                    del self._pending[user_id]
+                self._pending_count -= len(taken)
+            return taken
+
+    @contextmanager
+    def session(self):
+        with self.inner.session():
+            yield
+
+    @contextmanager
+    def transaction(self):
+        with self._gate.shared(), self.inner.transaction():
+            yield
+
+    def close(self) -> None:
+        """Flush the remaining fish, stop the background thread and close the backend."""
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self.flush()
+        self.inner.close()
+
+    # Caught fish
+
+    def count_fish(self, user_id: str) -> int:
+        with self._gate.shared():
+            return self.inner.count_fish(user_id) + len(self._pending.get(user_id, ()))
+
+    def add_fish(self, user_id: str, name: str, weight: float, price: float) -> int:
+        if self._pending_count >= self.max_pending:
+            # The flushes are failing or falling behind: stop buffering and write directly
+            self._wake.set()
+            with self._gate.shared():
+                return self.inner.add_fish(user_id, name, weight, price)
+        with self._lock:
+            fish_id = next(self._ids)
+            self._pending.setdefault(user_id, []).append({
+                "id": fish_id, "name": name, "weight": float(weight), "price": float(price), "bait": 0,
+            })
+            self._pending_count += 1
+            if self._pending_count >= self.flush_size:
+                self._wake.set()
+        return fish_id
+
+    def add_fish_many(self, fish: List[Tuple[str, str, float, float, int]]) -> List[int]:
+        return self.inner.add_fish_many(fish)
+
+    def get_fish(self, user_id: str) -> List[Dict]:
+        with self._gate.shared():
+            # Pending fish are always newer than stored ones
+            return self.inner.get_fish(user_id) + self._pending_copy(user_id)
+
+    def find_fish(self, user_id: str, name: Optional[str] = None) -> Optional[Dict]:
+        with self._gate.shared():
+            fish = self.inner.find_fish(user_id, name)
+            if fish:
+                return fish
+            return next((entry for entry in self._pending_copy(user_id)
+                         if not name or entry["name"].lower() == name.lower()), None)
+
+    def find_heaviest_fish(self, user_id: str, fragment: str) -> Optional[Dict]:
+        with self._gate.shared():
+            candidates = [entry for entry in self._pending_copy(user_id) if fragment.lower() in entry["name"].lower()]
+            stored = self.inner.find_heaviest_fish(user_id, fragment)
+            if stored:
+                candidates.insert(0, stored)
+            return max(candidates, key=lambda fish: fish["weight"]) if candidates else None
+
+    def _stored_id(self, fish_id: int) -> Optional[int]:
+        """Return the backend ID of a fish that is not pending, or None if it never reached the backend."""
+        if fish_id > 0:
+            return fish_id
+        with self._lock:
+            return self._flushed.get(fish_id)
+
+    def remove_fish(self, user_id: str, fish_id: int) -> bool:
+        with self._gate.shared():
+            if fish_id < 0 and self._take_pending(user_id, lambda entry: entry["id"] == fish_id):
+                return True
+            stored_id = self._stored_id(fish_id)
+            return stored_id is not None and self.inner.remove_fish(user_id, stored_id)
+
+    def clear_fish(self, user_id: str) -> None:
+        with self._gate.shared():
+            self._take_pending(user_id, lambda entry: True)
+            self.inner.clear_fish(user_id)
+
+    def sell_all_fish(self, user_id: str) -> Tuple[int, float]:
+        with self._gate.shared():
+            sold = self._take_pending(user_id, lambda entry: not entry["bait"])
+            count, total = self.inner.sell_all_fish(user_id)
+            return count + len(sold), round(total + sum(entry["price"] for entry in sold), 2)
+
+    def count_fish_by_name(self, user_id: str, name: str) -> int:
+        with self._gate.shared():
+            pending = sum(1 for entry in self._pending_copy(user_id) if entry["name"] == name)
+            return self.inner.count_fish_by_name(user_id, name) + pending
+
+    def take_fish_by_name(self, user_id: str, name: str, limit: int) -> int:
+        with self._gate.shared():
+            # Stored fish are older, so they go first
+            taken = self.inner.take_fish_by_name(user_id, name, limit)
+            if taken < limit:
+                matches = [entry["id"] for entry in self._pending_copy(user_id) if entry["name"] == name]
+                wanted = set(matches[:limit - taken])
+                taken += len(self._take_pending(user_id, lambda entry: entry["id"] in wanted))
+            return taken
+
+    def get_bait(self, user_id: str) -> Optional[Dict]:
+        with self._gate.shared():
+            bait = self.inner.get_bait(user_id)
+            if bait:
+                return bait
+            return next((entry for entry in self._pending_copy(user_id) if entry["bait"]), None)
+
+    def _mark_pending_bait(self, user_id: str, fish_id: Optional[int]) -> bool:
+        """Make fish_id the only pending bait (None clears it); return whether fish_id is pending."""
+        found = False
+        with self._lock:
+            for entry in self._pending.get(user_id, ()):
+                entry["bait"] = 1 if entry["id"] == fish_id else 0
+                found = found or entry["id"] == fish_id
+        return found
+
+    def set_bait(self, user_id: str, fish_id: int) -> None:
+        with self._gate.shared():
+            if fish_id < 0 and self._mark_pending_bait(user_id, fish_id):
+                self.inner.clear_bait(user_id)
+                return
+            self._mark_pending_bait(user_id, None)
+            stored_id = self._stored_id(fish_id)
+            if stored_id is not None:
+                self.inner.set_bait(user_id, stored_id)
+
+    def clear_bait(self, user_id: str) -> None:
+        with self._gate.shared():
+            self._mark_pending_bait(user_id, None)
+            self.inner.clear_bait(user_id)
+
+    # Daily quests
+
+    def count_quest_items(self, user_id: str, names: Sequence[str]) -> Dict[str, int]:
+        with self._gate.shared():
+            counts = self.inner.count_quest_items(user_id, names)
+            for entry in self._pending_copy(user_id):
+                if entry["name"] in counts:
+                    counts[entry["name"]] += 1
+            return counts
+
+    def take_quest_items(self, user_id: str, quantities: Dict[str, int]) -> bool:
+        with self._gate.shared():
+            if not any(entry["name"] in quantities for entry in self._pending_copy(user_id)):
+                return self.inner.take_quest_items(user_id, quantities)
+            # Some of the fish are still buffered: take them name by name
+            return Storage.take_quest_items(self, user_id, quantities)
+
+    # Account links
+
+    def merge_user(self, source_user: str, target_user: str) -> None:
+        with self._gate.shared():
+            with self._lock:
+                # Pending fish follow the rest of the sack
+                moved = self._pending.pop(source_user, [])
+                if moved:
+                    self._pending.setdefault(target_user, []).extend(moved)
+            self.inner.merge_user(source_user, target_user)
+
+
+def _delegate(name: str):
+    """Build a method that forwards `name` to the wrapped backend."""
+    def method(self, *args, **kwargs):
+        return getattr(self.inner, name)(*args, **kwargs)
+    method.__name__ = name
+    method.__doc__ = getattr(Storage, name).__doc__
+    return method
+
+
+for _name in (
+    "migrate",
+    "get_balance", "add_balance", "deduct_balance", "get_top_balances",
+    "count_trophies", "add_trophy", "get_trophies", "remove_trophy",
+    "get_inventory", "get_item", "add_item", "remove_item", "purchase", "redeem_item",
+    "get_effects", "set_effect", "remove_effect",
+    "replace_link_code", "get_link_code", "delete_link_code", "delete_expired_link_codes",
+    "get_account_id", "get_account_links", "add_link", "next_account_id", "get_preferred_identifiers",
+    "get_latest_daily_quest", "assign_daily_quest", "complete_daily_quest",
+    "get_autosell", "add_autosell", "remove_autosell", "clear_autosell",
+):
+    setattr(WriteBehindStorage, _name, _delegate(_name))
+# The delegates were added after the class was created
+abc.update_abstractmethods(WriteBehindStorage)